@@ -0,0 +1,9 @@
+"""Benchmarks for django-jobs.
+
+Run from the repository root::
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --scale full --compare results.json
+
+See ``python -m benchmarks --help`` and the Benchmarks section of the README.
+"""
@@ -0,0 +1,127 @@
+"""Command line entry point: ``python -m benchmarks``"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+SCALES = {
+    'small': {
+        'schedules': 1000, 'logs': 50_000, 'large_output_logs': 5, 'runner_jobs': 20, 'concurrent_jobs': 4,
+        'output_megabytes': 5, 'repeat': 5,
+    },
+    'full': {
+        'schedules': 10_000, 'logs': 5_000_000, 'large_output_logs': 50, 'runner_jobs': 200, 'concurrent_jobs': 8,
+        'output_megabytes': 50, 'repeat': 10,
+    },
+}
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.strip(), bool(dirty.strip())
+
+
+def compare(previous, current):
+    """Print the change of every figure present in both result sets"""
+    print(f"Compared with {previous['meta'].get('commit') or 'unknown commit'}:", file=sys.stderr)
+    for case, figures in current['results'].items():
+        old_figures = previous['results'].get(case, {})
+        for key, value in figures.items():
+            old = old_figures.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"  {case}.{key}: {old} -> {value} ({change})", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark django-jobs')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='small runs in about a minute; full seeds 10k schedules and 5M logs')
+    parser.add_argument('--only', nargs='+', metavar='CASE', help='Cases to run (default: all)')
+    parser.add_argument('--db', help='SQLite file to use (default: django-jobs-bench.sqlite3 in the temp directory)')
+    parser.add_argument('--reuse-db', action='store_true',
+                        help='Keep the database and its data from a previous run instead of seeding a new one')
+    parser.add_argument('--output', help='Write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare against')
+    options = parser.parse_args(argv)
+
+    if options.db:
+        os.environ['DJANGO_JOBS_BENCH_DB'] = os.path.abspath(options.db)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    from django_jobs.models import CommandLog
+    from . import cases, seed
+
+    scale = SCALES[options.scale]
+    selected = options.only or list(cases.CASES)
+    unknown = set(selected) - set(cases.CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+
+    database = settings.DATABASES['default']
+    if not options.reuse_db and database['ENGINE'].endswith('sqlite3') and os.path.exists(database['NAME']):
+        os.remove(database['NAME'])
+    call_command('migrate', verbosity=0)
+    if not CommandLog.objects.exists():
+        print(f"Seeding {scale['schedules']} schedules and {scale['logs']} logs...", file=sys.stderr)
+        start = time.perf_counter()
+        seed.seed(scale['schedules'], scale['logs'], scale['large_output_logs'],
+                  progress=lambda done, total: print(f"  {done}/{total}", end='\r', file=sys.stderr))
+        print(f"\nSeeded in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    # The runner starts commands with ``python manage.py`` from the working directory
+    os.chdir(cases.project_directory())
+
+    commit, dirty = git_revision()
+    results = {}
+    for name in selected:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = cases.CASES[name](scale)
+        print(f"  {json.dumps(results[name])}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'scale': options.scale,
+            'parameters': scale,
+        },
+        'results': results,
+    }
+
+    if options.compare:
+        with open(options.compare) as previous_file:
+            compare(json.load(previous_file), report)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            output_file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
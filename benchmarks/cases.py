@@ -0,0 +1,187 @@
+"""The benchmark cases
+
+Each case takes the scale settings and returns a flat dict of figures.
+Times are in milliseconds unless the name says otherwise.
+"""
+import os
+import resource
+import statistics
+import time
+from io import StringIO
+from unittest import mock
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from django_jobs import executor, metrics
+from django_jobs.management.commands.run_jobs import Command as RunJobsCommand
+from django_jobs.models import CommandLog, CommandSchedule
+
+from .seed import command_name
+
+
+def timed(function, repeat):
+    """Call ``function`` ``repeat`` times; returns timings and the query count of the last call"""
+    times = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        'median_ms': round(statistics.median(times), 3),
+        'min_ms': round(times[0], 3),
+        'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        'queries': len(queries),
+    }
+
+
+def rss_kb():
+    """Current resident set size of this process in KB"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Peak instead of current outside Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def scheduler_tick(scale):
+    """One ``run_jobs`` pass over every schedule, with 1% of them due
+
+    Starting the due jobs is mocked out, so this measures deciding what to run.
+    """
+    schedules = CommandSchedule.objects.filter(command_name__startswith='bench_command_')
+    idle_minute = str((timezone.now().minute + 30) % 60)
+    schedules.update(schedule_minute=idle_minute)
+    due = max(1, scale['schedules'] // 100)
+    CommandSchedule.objects.filter(
+        command_name__in=[command_name(index) for index in range(due)]).update(schedule_minute='*')
+
+    command = RunJobsCommand(stdout=StringIO())
+    with mock.patch.object(CommandSchedule, 'run_job', return_value=0) as run_job:
+        result = timed(lambda: command.tick(timezone.now()), scale['repeat'])
+    result['schedules'] = scale['schedules']
+    result['due'] = run_job.call_count // scale['repeat']
+    return result
+
+
+def runner_throughput(scale):
+    """Jobs per second of a command that does nothing, through the worker pool"""
+    schedule, _ = CommandSchedule.objects.get_or_create(command_name='bench_noop', defaults={'app_name': 'benchmarks'})
+    jobs = scale['runner_jobs']
+    writes_before = metrics.runner_db_writes_total.value()
+
+    start = time.perf_counter()
+    log_ids = CommandSchedule.enqueue_jobs([schedule] * jobs)
+    executor.wait_idle()
+    elapsed = time.perf_counter() - start
+
+    logs = CommandLog.objects.filter(pk__in=log_ids)
+    durations = sorted(log.duration.total_seconds() * 1000 for log in logs if log.duration is not None)
+    return {
+        'jobs': jobs,
+        'workers': executor.get_max_workers(),
+        'jobs_per_second': round(jobs / elapsed, 3),
+        'succeeded': logs.filter(status=CommandLog.STATUS_SUCCESS).count(),
+        'run_median_ms': round(statistics.median(durations), 3) if durations else None,
+        'db_writes_per_job': round((metrics.runner_db_writes_total.value() - writes_before) / jobs, 2),
+    }
+
+
+def memory_per_job(scale):
+    """Memory of the runner and of each command while several jobs are running"""
+    schedule, _ = CommandSchedule.objects.get_or_create(
+        command_name='bench_sleep', defaults={'app_name': 'benchmarks', 'arguments': {'seconds': 2}})
+    jobs = min(scale['concurrent_jobs'], executor.get_max_workers())
+
+    before = rss_kb()
+    log_ids = CommandSchedule.enqueue_jobs([schedule] * jobs)
+    peak = before
+    while executor.outstanding_jobs():
+        peak = max(peak, rss_kb())
+        time.sleep(0.05)
+    executor.wait_idle()
+
+    child_rss = [rss for rss in CommandLog.objects.filter(pk__in=log_ids).values_list('max_rss_kb', flat=True) if rss]
+    return {
+        'jobs': jobs,
+        'runner_rss_kb_per_job': round((peak - before) / jobs, 1),
+        'command_max_rss_kb_median': statistics.median(child_rss) if child_rss else None,
+    }
+
+
+def large_output(scale):
+    """A run writing a lot of output, which the runner streams into the log"""
+    megabytes = scale['output_megabytes']
+    schedule, _ = CommandSchedule.objects.get_or_create(
+        command_name='bench_output', defaults={'app_name': 'benchmarks'})
+    schedule.arguments = {'megabytes': megabytes}
+    schedule.save()
+
+    start = time.perf_counter()
+    log = CommandLog.objects.get(pk=schedule.run_job())
+    elapsed = time.perf_counter() - start
+    return {
+        'megabytes': megabytes,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'megabytes_per_second': round(megabytes / elapsed, 3),
+        'stored_bytes': len(log.output or ''),
+        'succeeded': log.status == CommandLog.STATUS_SUCCESS,
+    }
+
+
+def _admin_client():
+    client = Client()
+    client.login(username='bench', password='bench')
+    return client
+
+
+def job_status(scale):
+    """The admin's job status endpoint for a run with little and with a lot of output"""
+    client = _admin_client()
+    seeded = CommandLog.objects.filter(command_name__startswith='bench_command_')
+    small = seeded.order_by('pk').values_list('pk', flat=True).first()
+    large = seeded.order_by('-pk').values_list('pk', flat=True).first()
+
+    result = {}
+    for name, log_id in (('small_output', small), ('large_output', large)):
+        url = reverse('admin:job_status', args=[log_id])
+        for key, value in timed(lambda: client.get(url), scale['repeat'] * 4).items():
+            result[f'{name}_{key}'] = value
+    return result
+
+
+def admin_changelists(scale):
+    """Render time of the command log and schedule changelists"""
+    client = _admin_client()
+    result = {}
+    for name, url in (('commandlog', reverse('admin:django_jobs_commandlog_changelist')),
+                      ('commandschedule', reverse('admin:django_jobs_commandschedule_changelist'))):
+        response = client.get(url)
+        assert response.status_code == 200, f"{url} returned {response.status_code}"
+        for key, value in timed(lambda: client.get(url), scale['repeat']).items():
+            result[f'{name}_{key}'] = value
+    return result
+
+
+CASES = {
+    'scheduler_tick': scheduler_tick,
+    'runner_throughput': runner_throughput,
+    'memory_per_job': memory_per_job,
+    'large_output': large_output,
+    'job_status': job_status,
+    'admin_changelists': admin_changelists,
+}
+
+
+def project_directory():
+    """Directory of the benchmark ``manage.py``, which the runner starts commands with"""
+    return os.path.dirname(os.path.abspath(__file__))
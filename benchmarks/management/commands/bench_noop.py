@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Does nothing; measures the fixed cost of a run'
+
+    def handle(self, *args, **options):
+        pass
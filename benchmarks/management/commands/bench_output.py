@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Writes a given amount of output in lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megabytes', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        line = 'x' * 99
+        for _ in range(int(options['megabytes'] * 1024 * 1024 / 100)):
+            self.stdout.write(line)
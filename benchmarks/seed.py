@@ -0,0 +1,74 @@
+"""Synthetic data for the benchmarks"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from django_jobs.models import CommandLog, CommandSchedule
+
+BATCH_SIZE = 5000
+STATUS_WEIGHTS = (
+    (CommandLog.STATUS_SUCCESS, 90),
+    (CommandLog.STATUS_FAILURE, 6),
+    (CommandLog.STATUS_TIMEOUT, 1),
+    (CommandLog.STATUS_SKIPPED, 3),
+)
+
+
+def command_name(index):
+    return f'bench_command_{index}'
+
+
+def seed(schedules, logs, large_output_logs, large_output_bytes=1024 * 1024, days=90, progress=None):
+    """Create ``schedules`` schedules and ``logs`` finished logs spread over ``days``
+
+    ``large_output_logs`` of the logs get ``large_output_bytes`` of output.
+    Every schedule has a cron minute that is not due now, so a scheduler
+    tick only evaluates them. The logs with a large output are the most
+    recent ones.
+    """
+    rng = random.Random(42)
+    now = timezone.now()
+    idle_minute = str((now.minute + 30) % 60)
+
+    CommandSchedule.objects.bulk_create([
+        CommandSchedule(
+            command_name=command_name(index),
+            active=True,
+            schedule_minute=idle_minute,
+            schedule_hour='*',
+            schedule_day='*',
+            arguments={'batch': index % 10} if index % 3 == 0 else {},
+        )
+        for index in range(schedules)
+    ], batch_size=BATCH_SIZE)
+
+    statuses, weights = zip(*STATUS_WEIGHTS)
+    small_output = 'STDOUT:\n' + 'Processed 1000 records\n' * 8 + '\n\nSTDERR:\n'
+    large_output = 'STDOUT:\n' + ('x' * 99 + '\n') * (large_output_bytes // 100) + '\n\nSTDERR:\n'
+    span = days * 86400
+    created = 0
+    while created < logs:
+        batch = []
+        for index in range(created, min(created + BATCH_SIZE, logs)):
+            started_at = now - timedelta(seconds=span * (logs - index) / logs)
+            duration = timedelta(seconds=rng.lognormvariate(2, 1))
+            status = rng.choices(statuses, weights)[0]
+            batch.append(CommandLog(
+                command_name=command_name(rng.randrange(max(schedules, 1))),
+                status=status,
+                trigger=CommandLog.TRIGGER_CRON,
+                scheduled_for=started_at.replace(second=0, microsecond=0),
+                started_at=started_at,
+                ended_at=started_at + duration,
+                duration=duration,
+                exit_code=0 if status == CommandLog.STATUS_SUCCESS else 1,
+                output=large_output if index >= logs - large_output_logs else small_output,
+            ))
+        CommandLog.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created, logs)
+
+    get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
@@ -0,0 +1,73 @@
+"""Settings of the benchmark project
+
+The database is a SQLite file, ``DJANGO_JOBS_BENCH_DB`` (set by
+``python -m benchmarks --db``). To benchmark another database, point
+``DJANGO_SETTINGS_MODULE`` at settings of your own that include the
+``benchmarks`` app and ``benchmarks.urls``.
+"""
+import os
+import tempfile
+
+import django
+
+SECRET_KEY = 'django-jobs-benchmarks'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django_jobs',
+    'benchmarks',
+]
+
+MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+ROOT_URLCONF = 'benchmarks.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DJANGO_JOBS_BENCH_DB', os.path.join(tempfile.gettempdir(), 'django-jobs-bench.sqlite3')),
+        'OPTIONS': {'timeout': 30},
+    }
+}
+if django.VERSION >= (5, 1):
+    # Runner threads write concurrently; without these SQLite fails them with "database is locked"
+    DATABASES['default']['OPTIONS'].update({
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': 'PRAGMA journal_mode=WAL;',
+    })
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+USE_TZ = True
+TIME_ZONE = 'UTC'
+STATIC_URL = 'static/'
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+DJANGO_JOBS_MAX_WORKERS = 8
@@ -1,15 +1,23 @@
 import json
-import threading
+import math
+from datetime import timedelta
 
 from django import forms
 from django.contrib import admin, messages
 from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, render
-from django.urls import path, reverse
+from django.urls import NoReverseMatch, path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 
-from .models import CommandLog, CommandSchedule
+from .models import Checkpoint, CommandLog, CommandSchedule, ConcurrencyLimit, DurationBaseline, JobTrigger
+from . import stats
+from .routers import pin_to_primary, read_from_replica
+from .planning import forecast, hourly_summary, median_durations
 
 
 class CommandArgsForm(forms.Form):
@@ -21,21 +29,80 @@ class CommandArgsForm(forms.Form):
     )
 
 
+class CommandScheduleForm(forms.ModelForm):
+    class Meta:
+        model = CommandSchedule
+        fields = '__all__'
+
+    def clean_depends_on(self):
+        """Reject dependencies that would turn the workflow into a cycle"""
+        upstreams = self.cleaned_data.get('depends_on')
+        if upstreams and self.instance.would_create_cycle(upstreams):
+            raise forms.ValidationError('These dependencies would create a cycle in the workflow')
+        return upstreams
+
+
+class JobTriggerInline(admin.StackedInline):
+    model = JobTrigger
+    extra = 0
+    fields = ('kind', 'active', 'debounce_seconds', 'model', 'path', 'pattern', 'ping_url')
+    readonly_fields = ('ping_url',)
+
+    def ping_url(self, obj):
+        """URL that fires an HTTP trigger when POSTed to"""
+        if obj.kind != JobTrigger.KIND_HTTP or not obj.pk:
+            return "-"
+        try:
+            url = reverse('django_jobs:trigger_job', args=[obj.pk, obj.token])
+        except NoReverseMatch:
+            return "Include django_jobs.urls in your URLconf to enable HTTP triggers"
+        return format_html('<code>POST {}</code>', url)
+    ping_url.short_description = "Ping URL"
+
+
 class CommandScheduleAdmin(admin.ModelAdmin):
+    form = CommandScheduleForm
+    inlines = [JobTriggerInline]
     list_display = ('command_name', 'app_name', 'schedule_hour',
                     'schedule_minute', 'schedule_day', 'active', 'view_arguments_btn', 'run_job_btn')
     list_filter = ('app_name', 'active')
     search_fields = ('command_name', 'app_name')
     list_editable = ('active', 'schedule_hour',
                      'schedule_minute', 'schedule_day')
-    actions = ['run_selected_jobs', 'view_command_args', 'sync_jobs']
+    actions = ['run_selected_jobs', 'view_command_args', 'sync_jobs', 'profile_next_run']
     readonly_fields = ('display_available_arguments',)
+    filter_horizontal = ('depends_on',)
     fieldsets = (
         (None, {
-            'fields': ('command_name', 'app_name', 'active')
+            'fields': ('command_name', 'app_name', 'active', 'cron_enabled')
         }),
         ('Schedule', {
-            'fields': ('schedule_hour', 'schedule_minute', 'schedule_day')
+            'fields': ('schedule_hour', 'schedule_minute', 'schedule_day', 'schedule_month',
+                       'schedule_day_of_week', 'schedule_second', 'interval_seconds', 'jitter_seconds')
+        }),
+        ('Limits', {
+            'fields': ('timeout', 'kill_grace_period', 'memory_limit_mb', 'cpu_time_limit'),
+            'classes': ('collapse',)
+        }),
+        ('Concurrency', {
+            'fields': ('max_instances', 'concurrency_limit', 'on_limit'),
+            'classes': ('collapse',)
+        }),
+        ('Workflow', {
+            'fields': ('depends_on', 'shard_count'),
+            'classes': ('collapse',)
+        }),
+        ('Retries', {
+            'fields': ('max_retries', 'retry_delay', 'retry_backoff', 'retry_jitter', 'retry_on_exit_codes'),
+            'classes': ('collapse',)
+        }),
+        ('Skip If Unchanged', {
+            'fields': ('skip_if_unchanged', 'fingerprint', 'unchanged_ttl'),
+            'classes': ('collapse',)
+        }),
+        ('Debugging', {
+            'fields': ('profile_next_run',),
+            'classes': ('collapse',)
         }),
         ('Arguments', {
             'fields': ('arguments', 'display_available_arguments')
@@ -93,6 +160,11 @@ class CommandScheduleAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.job_status),
                 name='job_status',
             ),
+            path(
+                'forecast/',
+                self.admin_site.admin_view(self.forecast_view),
+                name='django_jobs_commandschedule_forecast',
+            ),
         ]
         return custom_urls + urls
 
@@ -108,6 +180,12 @@ class CommandScheduleAdmin(admin.ModelAdmin):
         return HttpResponseRedirect(url)
     run_selected_jobs.short_description = 'Run selected jobs manually'
 
+    def profile_next_run(self, request, queryset):
+        """Run the next run of each selected command under cProfile"""
+        count = queryset.update(profile_next_run=True)
+        self.message_user(request, f"The next run of {count} command(s) will be profiled.", messages.SUCCESS)
+    profile_next_run.short_description = 'Profile the next run'
+
     def run_with_args(self, request):
         """View for providing arguments before running jobs"""
         # Get command IDs from either POST or GET
@@ -127,40 +205,14 @@ class CommandScheduleAdmin(admin.ModelAdmin):
             # Process the form submission
             form = CommandArgsForm(request.POST)
             if form.is_valid():
-                # If arguments provided, temporarily update the command objects
+                # Custom arguments (if any) override the schedule's own arguments.
+                # All logs are created in one query and the jobs are queued on
+                # the bounded worker pool, so this returns immediately.
                 args = form.cleaned_data.get('arguments')
-                log_ids = []
-
-                # Run the commands with provided args asynchronously
-                for command in commands:
-                    if args:
-                        # Create log with custom arguments
-                        log = CommandLog(
-                            command_name=command.command_name,
-                            app_name=command.app_name,
-                            arguments=args,
-                        )
-                        log.save()
-                        
-                        # Build command with custom args
-                        temp_command = CommandSchedule(
-                            command_name=command.command_name,
-                            app_name=command.app_name,
-                            arguments=args,
-                        )
-                        # Execute in thread
-                        command_str = CommandSchedule.build_command_string(command.command_name, args)
-                        
-                        thread = threading.Thread(
-                            target=command._execute_command,
-                            args=(command_str, log.pk)
-                        )
-                        thread.daemon = True
-                        thread.start()
-                        log_ids.append(log.pk)
-                    else:
-                        log_id = command.run_job_async()
-                        log_ids.append(log_id)
+                commands = list(commands)
+                log_ids = CommandSchedule.enqueue_jobs(commands, arguments=args)
+                # The status page and log list must find the new logs even if the replica lags
+                pin_to_primary(request)
 
                 # Redirect to job status page or logs list
                 if len(log_ids) == 1:
@@ -176,8 +228,9 @@ class CommandScheduleAdmin(admin.ModelAdmin):
                         request, f"Started {len(log_ids)} jobs. Check job logs for status.")
                     return HttpResponseRedirect(reverse('admin:django_jobs_commandlog_changelist'))
         else:
-            # Display the form for entering arguments
-            form = CommandArgsForm()
+            # Display the form for entering arguments, pre-filled when re-running a log
+            log = CommandLog.objects.filter(pk=request.GET.get('log') or None).only('arguments').first()
+            form = CommandArgsForm(initial={'arguments': log.arguments} if log and log.arguments else None)
 
         command_args = {}
         # Get available arguments for all selected commands
@@ -210,26 +263,66 @@ class CommandScheduleAdmin(admin.ModelAdmin):
             }
         )
 
+    def forecast_view(self, request):
+        """View projecting upcoming runs and concurrency of the active schedules"""
+        try:
+            hours = min(max(int(request.GET.get('hours', 24)), 1), 24 * 7)
+        except ValueError:
+            hours = 24
+
+        schedules = list(CommandSchedule.cron_scheduled())
+        durations = median_durations([schedule.command_name for schedule in schedules])
+        result = forecast(schedules, timezone.now(), hours, durations)
+        hourly = hourly_summary(result)
+        highest = max([peak for _, peak, _ in hourly] + [1])
+
+        return render(
+            request,
+            'admin/jobs_forecast.html',
+            {
+                'title': f'Forecast for the next {hours} hours',
+                'hours': hours,
+                'result': result,
+                'hourly': [
+                    {'hour': hour, 'peak': peak, 'average': average, 'width': round(peak * 100 / highest)}
+                    for hour, peak, average in hourly
+                ],
+            }
+        )
+
     def run_single_job(self, request, job_id):
         """Run a single job directly"""
         job = get_object_or_404(CommandSchedule, pk=job_id)
         log_id = job.run_job_async()
+        pin_to_primary(request)
 
         return HttpResponseRedirect(
             reverse('admin:job_status', args=[log_id])
         )
 
+    @read_from_replica
     def job_status(self, request, log_id):
         """AJAX endpoint to check job status"""
         try:
-            log = CommandLog.objects.get(pk=log_id)
+            # A log started from another session may not have reached the replica yet
+            log = (CommandLog.objects.filter(pk=log_id).first()
+                   or CommandLog.objects.using(DEFAULT_DB_ALIAS).get(pk=log_id))
+            eta = log.estimate_remaining()
             status_data = {
                 'status': log.get_status_display(),
                 'status_code': log.status,
                 'started_at': log.started_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'ended_at': log.ended_at.strftime('%Y-%m-%d %H:%M:%S') if log.ended_at else None,
                 'duration': str(log.duration) if log.duration else None,
+                'trigger': log.trigger,
+                'scheduled_for': log.scheduled_for.strftime('%Y-%m-%d %H:%M:%S') if log.scheduled_for else None,
+                'lag': log.lag.total_seconds() if log.lag is not None else None,
+                'progress_done': log.progress_done,
+                'progress_total': log.progress_total,
+                'progress_message': log.progress_message,
+                'eta': eta.total_seconds() if eta is not None else None,
                 'has_output': bool(log.output),
+                'finished': log.is_finished,
             }
 
             # Only include a preview of the output to keep the response small
@@ -323,31 +416,135 @@ class CommandScheduleAdmin(admin.ModelAdmin):
 
 class CommandLogAdmin(admin.ModelAdmin):
     list_display = ('command_name', 'app_name',
-                    'status', 'started_at', 'ended_at', 'duration', 'has_arguments')
-    list_filter = ('started_at', 'app_name', 'status',)
-    readonly_fields = ('command_name', 'app_name', 'status',
-                       'started_at', 'ended_at', 'duration', 'display_arguments', 'display_run_again_button', 'output')
+                    'status', 'trigger', 'started_at', 'lag_display', 'ended_at', 'duration', 'duration_flag',
+                    'progress_display', 'eta_display', 'has_arguments')
+    list_filter = ('started_at', 'app_name', 'status', 'trigger', 'duration_anomaly')
+    readonly_fields = ('command_name', 'app_name', 'status', 'trigger', 'exit_code', 'attempt', 'retry_of',
+                       'pipeline_root', 'parent', 'shard_index', 'scheduled_for', 'lag_display', 'triggered_by',
+                       'progress_display', 'eta_display', 'started_at', 'ended_at', 'duration', 'duration_anomaly', 'duration_score', 'display_arguments', 'display_run_again_button', 'output',
+                       'cpu_user_time', 'cpu_system_time', 'max_rss_kb', 'io_read_blocks', 'io_write_blocks',
+                       'voluntary_ctx_switches', 'involuntary_ctx_switches', 'resource_samples',
+                       'hostname', 'pid', 'heartbeat_at', 'profile', 'memo_key')
     search_fields = ('command_name', 'app_name', 'output')
-    actions = ['run_jobs_manually']
+    actions = ['run_jobs_manually', 'dump_stacks']
     
     fieldsets = (
         (None, {
-            'fields': ('command_name', 'app_name', 'status')
+            'fields': ('command_name', 'app_name', 'status', 'trigger', 'exit_code')
+        }),
+        ('Related Runs', {
+            'fields': ('attempt', 'retry_of', 'pipeline_root', 'parent', 'shard_index', 'triggered_by'),
+            'classes': ('collapse',)
         }),
         ('Execution Details', {
-            'fields': ('started_at', 'ended_at', 'duration', 'display_arguments', 'display_run_again_button')
+            'fields': ('scheduled_for', 'started_at', 'lag_display', 'ended_at', 'duration',
+                       'progress_display', 'eta_display', 'duration_anomaly', 'duration_score', 'hostname', 'pid', 'heartbeat_at',
+                       'display_arguments', 'memo_key', 'display_run_again_button')
+        }),
+        ('Resource Usage', {
+            'fields': ('cpu_user_time', 'cpu_system_time', 'max_rss_kb', 'io_read_blocks', 'io_write_blocks',
+                       'voluntary_ctx_switches', 'involuntary_ctx_switches', 'resource_samples'),
+            'classes': ('collapse',)
         }),
         ('Output', {
             'fields': ('output',),
             'classes': ('collapse',)
         }),
+        ('Profile', {
+            'fields': ('profile',),
+            'classes': ('collapse',)
+        }),
     )
     
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                'stats/',
+                self.admin_site.admin_view(self.stats_view),
+                name='django_jobs_commandlog_stats',
+            ),
+        ]
+        return custom_urls + urls
+
+    def get_queryset(self, request):
+        # The duration baseline of each row, for the time left without a query per row
+        baselines = DurationBaseline.objects.filter(command_name=OuterRef('command_name'))
+        return super().get_queryset(request).annotate(
+            baseline_mean=Subquery(baselines.values('mean')[:1]),
+            baseline_runs=Subquery(baselines.values('runs')[:1]),
+        )
+
+    @read_from_replica
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    @read_from_replica
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    @read_from_replica
+    def stats_view(self, request):
+        """Per-command statistics, read from the hourly rollup only"""
+        periods = {'24': '24 hours', '168': '7 days', '720': '30 days', '2160': '90 days'}
+        hours = request.GET.get('hours', '24')
+        if hours not in periods:
+            hours = '24'
+
+        return render(
+            request,
+            'admin/jobs_stats.html',
+            {
+                'title': f'Command statistics for the last {periods[hours]}',
+                'hours': hours,
+                'periods': periods.items(),
+                'summaries': stats.summarize(timezone.now() - timedelta(hours=int(hours))),
+            }
+        )
+
     def has_arguments(self, obj):
         """Show if command had arguments"""
         return bool(obj.arguments)
     has_arguments.boolean = True
     has_arguments.short_description = "Args"
+
+    def lag_display(self, obj):
+        """How late the run started compared to when it was due"""
+        if obj.lag is None:
+            return "-"
+        return f"{obj.lag.total_seconds():.1f}s"
+    lag_display.short_description = "Start delay"
+
+    def progress_display(self, obj):
+        """Latest progress reported by the command"""
+        if obj.progress_done is None:
+            return "-"
+        text = f"{obj.progress_done}/{obj.progress_total}" if obj.progress_total else str(obj.progress_done)
+        if obj.progress_percent is not None:
+            text += f" ({obj.progress_percent}%)"
+        if obj.progress_message:
+            text += f" {obj.progress_message}"
+        return text
+    progress_display.short_description = "Progress"
+
+    def eta_display(self, obj):
+        """Estimated time left for a running run"""
+        # Same as DurationBaseline.typical_duration, from the annotation of get_queryset
+        typical_duration = math.exp(obj.baseline_mean) if obj.baseline_runs else 0
+        remaining = obj.estimate_remaining(typical_duration)
+        if remaining is None:
+            return "-"
+        return f"{remaining.total_seconds():.0f}s"
+    eta_display.short_description = "Time left"
+
+    def duration_flag(self, obj):
+        """Highlight runs far slower or faster than the command's baseline"""
+        if not obj.duration_anomaly:
+            return ""
+        color = "#dc3545" if obj.duration_anomaly == 'slow' else "#17a2b8"
+        return format_html('<span style="color: {}; font-weight: bold;">{}</span>',
+                           color, obj.get_duration_anomaly_display())
+    duration_flag.short_description = "Duration check"
     
     def display_arguments(self, obj):
         """Display arguments in a readable format"""
@@ -369,28 +566,18 @@ class CommandLogAdmin(admin.ModelAdmin):
             return ""
         
         # Find or create a CommandSchedule for this command
-        try:
-            schedule = CommandSchedule.objects.get(command_name=obj.command_name)
-        except CommandSchedule.DoesNotExist:
-            # Create a temporary schedule
-            schedule, created = CommandSchedule.objects.get_or_create(
-                command_name=obj.command_name,
-                defaults={
-                    'app_name': obj.app_name,
-                    'active': False,
-                }
-            )
+        schedule, created = CommandSchedule.objects.get_or_create(
+            command_name=obj.command_name,
+            defaults={
+                'app_name': obj.app_name,
+                'active': False,
+            }
+        )
         
-        # Build URL with pre-filled arguments
+        # The run form is pre-filled with the arguments of this log,
+        # leaving the arguments stored on the schedule alone
         base_url = reverse('admin:django_jobs_commandschedule_run_with_args')
-        url = f"{base_url}?id={schedule.pk}"
-        
-        # If there are arguments, we need to pass them via session or encode them
-        # For now, we'll create a temporary schedule with the arguments
-        if obj.arguments:
-            # Store the arguments temporarily in the schedule
-            schedule.arguments = obj.arguments
-            schedule.save()
+        url = f"{base_url}?id={schedule.pk}&log={obj.pk}"
         
         return format_html(
             '<a href="{}" class="button" style="background-color: #417690; color: white; padding: 10px 20px; '
@@ -401,28 +588,19 @@ class CommandLogAdmin(admin.ModelAdmin):
     
     def run_jobs_manually(self, request, queryset):
         """Run commands manually with arguments"""
-        # Get unique command names from the selected logs
-        command_names = list(queryset.values_list('command_name', flat=True).distinct())
-        
-        # Find or create temporary CommandSchedule objects for the run_with_args view
-        schedule_ids = []
-        for command_name in command_names:
-            try:
-                # Try to find existing schedule
-                schedule = CommandSchedule.objects.get(command_name=command_name)
-                schedule_ids.append(str(schedule.pk))
-            except CommandSchedule.DoesNotExist:
-                # Create a temporary schedule for commands that don't have one
-                # We'll use get_or_create to avoid duplicates
-                schedule, created = CommandSchedule.objects.get_or_create(
-                    command_name=command_name,
-                    defaults={
-                        'app_name': queryset.filter(command_name=command_name).first().app_name,
-                        'active': False,  # Keep it inactive
-                    }
-                )
-                schedule_ids.append(str(schedule.pk))
-        
+        # Get unique commands (and an app name for each) from the selected logs
+        app_names = dict(queryset.order_by().values_list('command_name', 'app_name').distinct())
+
+        # Commands without a schedule get an inactive one, so run_with_args can run them
+        existing = set(CommandSchedule.objects.filter(
+            command_name__in=app_names).values_list('command_name', flat=True))
+        CommandSchedule.objects.bulk_create([
+            CommandSchedule(command_name=command_name, app_name=app_name, active=False)
+            for command_name, app_name in app_names.items() if command_name not in existing
+        ], ignore_conflicts=True)
+        schedule_ids = CommandSchedule.objects.filter(
+            command_name__in=app_names).order_by('command_name').values_list('pk', flat=True)
+
         # Redirect to the run_with_args view with the schedule IDs
         base_url = reverse('admin:django_jobs_commandschedule_run_with_args')
         id_params = '&'.join([f'id={pk}' for pk in schedule_ids])
@@ -432,6 +610,82 @@ class CommandLogAdmin(admin.ModelAdmin):
     
     run_jobs_manually.short_description = "Run selected commands manually"
 
+    def dump_stacks(self, request, queryset):
+        """Ask the runners of the selected running jobs for a dump of all thread stacks"""
+        running = list(queryset.filter(status=CommandLog.STATUS_RUNNING).values_list('pk', flat=True))
+        # A sharded run has no process of its own, so its running shards are asked instead
+        count = CommandLog.objects.filter(
+            Q(pk__in=running) | Q(parent_id__in=running), status=CommandLog.STATUS_RUNNING,
+        ).update(stack_dump_requested=True)
+        self.message_user(
+            request,
+            f"Requested a stack dump from {count} running job(s). It appears in the output within a few seconds.",
+            messages.SUCCESS if count else messages.WARNING,
+        )
+    dump_stacks.short_description = "Dump stacks of running jobs"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ConcurrencyLimitAdmin(admin.ModelAdmin):
+    list_display = ('key', 'max_concurrent', 'running_count')
+    search_fields = ('key',)
+
+    def get_queryset(self, request):
+        # Logs refer to limits by key, so the count is a grouped subquery rather than a join
+        running = CommandLog.objects.filter(
+            status=CommandLog.STATUS_RUNNING, concurrency_key=OuterRef('key'),
+        ).order_by().values('concurrency_key').annotate(count=Count('pk')).values('count')
+        return super().get_queryset(request).annotate(running=Coalesce(Subquery(running), 0))
+
+    def running_count(self, obj):
+        """Number of running jobs currently holding this key"""
+        return obj.running
+    running_count.short_description = "Running"
+    running_count.admin_order_field = 'running'
+
+
+class DurationBaselineAdmin(admin.ModelAdmin):
+    list_display = ('command_name', 'typical_display', 'spread_display', 'trend_display', 'regressed', 'runs',
+                    'updated_at')
+    search_fields = ('command_name',)
+
+    def typical_display(self, obj):
+        return f"{obj.typical_duration:.1f}s" if obj.runs else "-"
+    typical_display.short_description = "Typical duration"
+
+    def spread_display(self, obj):
+        """Typical relative deviation from the typical duration"""
+        return f"x{math.exp(math.sqrt(obj.variance)):.2f}" if obj.runs else "-"
+    spread_display.short_description = "Spread"
+
+    def trend_display(self, obj):
+        return f"x{obj.trend:.2f}" if obj.runs else "-"
+    trend_display.short_description = "Trend"
+
+    def regressed(self, obj):
+        return obj.regressed
+    regressed.boolean = True
+    regressed.short_description = "Getting slower"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class CheckpointAdmin(admin.ModelAdmin):
+    list_display = ('schedule', 'key', 'run', 'updated_at')
+    list_filter = ('schedule',)
+    search_fields = ('schedule__command_name', 'key')
+    readonly_fields = ('schedule', 'key', 'value', 'run', 'updated_at')
+    list_select_related = ('schedule', 'run')
+
     def has_add_permission(self, request):
         return False
 
@@ -440,4 +694,7 @@ class CommandLogAdmin(admin.ModelAdmin):
 
 
 admin.site.register(CommandSchedule, CommandScheduleAdmin)
-admin.site.register(CommandLog, CommandLogAdmin)
\ No newline at end of file
+admin.site.register(CommandLog, CommandLogAdmin)
+admin.site.register(ConcurrencyLimit, ConcurrencyLimitAdmin)
+admin.site.register(DurationBaseline, DurationBaselineAdmin)
+admin.site.register(Checkpoint, CheckpointAdmin)
@@ -1,7 +1,24 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class DjangoJobsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_jobs"
-    verbose_name = "Django Jobs"
\ No newline at end of file
+    verbose_name = "Django Jobs"
+
+    def ready(self):
+        from . import debugging, tracing, triggers
+        from .models import JobTrigger
+
+        # Only do something in commands started by the job runner
+        debugging.install_child_hooks()
+        tracing.install_child_hooks()
+
+        # Model triggers connect their own receivers to the models they watch
+        connection_created.connect(triggers.load_triggers, dispatch_uid='django_jobs_load_triggers')
+        request_started.connect(triggers.refresh_triggers, dispatch_uid='django_jobs_refresh_triggers')
+        post_save.connect(triggers.reload_triggers, sender=JobTrigger, dispatch_uid='django_jobs_trigger_changed')
+        post_delete.connect(triggers.reload_triggers, sender=JobTrigger, dispatch_uid='django_jobs_trigger_deleted')
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Checkpoints that let a long command resume where a failed attempt stopped.
+
+A command saves its position from time to time and reads it back when it
+starts. Checkpoints are stored per schedule and key in the ``Checkpoint``
+table, together with the run that wrote them. A retry of a failed run sees
+the checkpoints of the earlier attempts; a new run starts from scratch.
+
+Usage in a management command::
+
+    from django_jobs.checkpoints import load_checkpoint, resuming, save_checkpoint
+
+    start = load_checkpoint('last_id', 0)
+    if resuming():
+        self.stdout.write(f"Resuming after id {start}")
+    for item in Item.objects.filter(pk__gt=start).order_by('pk'):
+        process(item)
+        save_checkpoint('last_id', item.pk)
+
+The runner tells the command which schedule and run it belongs to in
+``DJANGO_JOBS_CHECKPOINT``, and sets ``DJANGO_JOBS_RESUME`` for retries.
+Shards share the checkpoints of their schedule, so they should put their
+shard index in the key. Outside of django-jobs (e.g. when the command is run
+by hand) checkpoints are not saved and ``load_checkpoint`` returns the default.
+"""
+import os
+
+ENV_VAR = 'DJANGO_JOBS_CHECKPOINT'
+RESUME_ENV_VAR = 'DJANGO_JOBS_RESUME'
+
+_scope = None
+
+
+def _get_scope():
+    """Return ``(schedule_id, run_id, resuming)``, or None outside of a run"""
+    global _scope
+    if _scope is None:
+        # Removed so processes started by the command do not write to the same checkpoints
+        value = os.environ.pop(ENV_VAR, None)
+        resume = os.environ.pop(RESUME_ENV_VAR, None) == '1'
+        try:
+            schedule_id, run_id = (int(part) for part in value.split(':'))
+            _scope = (schedule_id, run_id, resume)
+        except (AttributeError, ValueError):
+            _scope = ()
+    return _scope or None
+
+
+def child_env(schedule, log):
+    """Environment variables that give the command of ``log`` its checkpoints
+
+    Attempts of a run share the checkpoints of the first attempt. Shards use
+    those of their parent run, so ``log.parent`` is read for them.
+    """
+    if not schedule.pk:
+        return {}
+    run = log.parent if log.parent_id else log
+    env = {ENV_VAR: f'{schedule.pk}:{run.retry_of_id or run.pk}'}
+    if run.attempt > 1:
+        env[RESUME_ENV_VAR] = '1'
+    return env
+
+
+def resuming():
+    """Whether this run is a retry, which may find checkpoints of the failed attempt"""
+    scope = _get_scope()
+    return bool(scope and scope[2])
+
+
+def save_checkpoint(key, value):
+    """Store ``value`` (anything JSON serializable) under ``key``
+
+    Returns True if it was saved, False outside of a run.
+    """
+    from .models import Checkpoint
+
+    scope = _get_scope()
+    if scope is None:
+        return False
+    schedule_id, run_id, _ = scope
+    Checkpoint.objects.update_or_create(
+        schedule_id=schedule_id, key=key, defaults={'value': value, 'run_id': run_id})
+    return True
+
+
+def load_checkpoint(key, default=None):
+    """Return the value saved under ``key`` by this run or an earlier attempt of it"""
+    from .models import Checkpoint
+
+    scope = _get_scope()
+    if scope is None:
+        return default
+    schedule_id, run_id, _ = scope
+    checkpoint = Checkpoint.objects.filter(schedule_id=schedule_id, key=key, run_id=run_id).first()
+    return checkpoint.value if checkpoint is not None else default
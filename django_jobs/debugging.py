@@ -0,0 +1,79 @@
+"""Stack dumps and profiles of running commands.
+
+Commands started by the runner find the progress channel in their
+environment (see ``progress.ProgressReader.child_env``). When Django loads
+django_jobs in such a process, ``install_child_hooks`` (called from
+``AppConfig.ready``) registers ``faulthandler`` for ``STACK_DUMP_SIGNAL``,
+so the admin can ask for a dump of all thread stacks at any time. The dump
+goes to stderr and so ends up in the log output. The handler announces
+itself over the channel; the runner does not send the signal before that,
+because its default action would kill the process.
+
+When ``DJANGO_JOBS_PROFILE_FILE`` is set, the rest of the process runs under
+``cProfile`` and the stats are written to that file at exit. The exit code
+of the command is unchanged. The runner attaches the stats to the log with
+``format_profile``.
+"""
+import atexit
+import cProfile
+import faulthandler
+import io
+import os
+import pstats
+import signal
+import sys
+
+from django.conf import settings
+
+from . import progress
+
+PROFILE_ENV_VAR = 'DJANGO_JOBS_PROFILE_FILE'
+STACK_DUMP_SIGNAL = getattr(signal, 'SIGUSR1', None)
+
+
+def install_child_hooks():
+    """Install the stack dump handler and start profiling if the runner asked for it"""
+    if not progress.connected():
+        return
+
+    if STACK_DUMP_SIGNAL is not None:
+        faulthandler.register(STACK_DUMP_SIGNAL, file=sys.stderr, all_threads=True)
+        progress.send({'stack_dumps': True})
+
+    # Removed so processes started by the command do not overwrite the profile
+    profile_path = os.environ.pop(PROFILE_ENV_VAR, None)
+    if profile_path:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(_write_profile, profiler, profile_path)
+
+
+def _write_profile(profiler, path):
+    profiler.disable()
+    profiler.dump_stats(path)
+
+
+def request_stack_dump(process, reader):
+    """Signal ``process`` to dump its stacks; returns the note to add to its stderr"""
+    if STACK_DUMP_SIGNAL is None or not reader.stack_dumps:
+        return "\n--- Stack dump not available: the command has not loaded django_jobs ---\n"
+    try:
+        os.kill(process.pid, STACK_DUMP_SIGNAL)
+    except ProcessLookupError:
+        return ""
+    return "\n--- Stack dump requested ---\n"
+
+
+def format_profile(path, limit=None):
+    """Return the stats written to ``path`` sorted by cumulative time, or '' if there are none"""
+    if limit is None:
+        limit = getattr(settings, 'DJANGO_JOBS_PROFILE_LIMIT', 50)
+    try:
+        if not os.path.getsize(path):
+            return ''
+    except OSError:
+        return ''
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
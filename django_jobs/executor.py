@@ -0,0 +1,135 @@
+"""Bounded worker pool used to run jobs in the background.
+
+Jobs started from the admin (or any other in-process caller) are handed to a
+single shared ``ThreadPoolExecutor`` instead of getting a thread each, so the
+number of concurrently running subprocesses per Django process is capped by
+``DJANGO_JOBS_MAX_WORKERS`` (default: 4). Extra jobs wait in the executor
+queue until a worker is free.
+
+Each job runs inside ``_run_in_worker``, which discards stale connections
+before the job and closes every connection the worker opened once it is
+done. Worker threads therefore never hold a database connection between
+jobs, and the number of connections held by the runner is bounded by the
+pool size. ``held_connections()`` reports the current figure.
+
+``wait_idle()`` blocks until every submitted job (including jobs submitted
+by other jobs, such as downstream steps of a workflow) has finished; short
+lived processes like ``run_jobs`` call it before exiting.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_MAX_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_held_connections = 0
+_held_connections_lock = threading.Lock()
+_worker_state = threading.local()
+
+_outstanding = 0
+_idle = threading.Condition()
+
+
+def get_max_workers():
+    """Return the configured concurrency cap for background jobs"""
+    return max(1, int(getattr(settings, 'DJANGO_JOBS_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+
+
+def get_executor():
+    """Return the shared executor, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_max_workers(),
+                thread_name_prefix='django-jobs',
+            )
+        return _executor
+
+
+def held_connections():
+    """Return the number of database connections currently held by job workers"""
+    return _held_connections
+
+
+def outstanding_jobs():
+    """Return the number of submitted jobs that are queued or running"""
+    return _outstanding
+
+
+def _adjust_held_connections(delta):
+    global _held_connections
+    with _held_connections_lock:
+        _held_connections += delta
+
+
+@receiver(connection_created)
+def _track_worker_connection(sender, connection, **kwargs):
+    """Count connections opened from inside a job worker"""
+    if getattr(_worker_state, 'active', False):
+        _worker_state.opened += 1
+        _adjust_held_connections(1)
+
+
+def _run_in_worker(fn, args, kwargs):
+    """Run a job with explicit database connection lifecycle management"""
+    close_old_connections()
+    _worker_state.active = True
+    _worker_state.opened = 0
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _worker_state.active = False
+        try:
+            connections.close_all()
+        finally:
+            _adjust_held_connections(-_worker_state.opened)
+            _worker_state.opened = 0
+
+
+def _job_done(future):
+    global _outstanding
+    with _idle:
+        _outstanding -= 1
+        _idle.notify_all()
+
+
+def submit(fn, *args, **kwargs):
+    """Queue ``fn`` on the shared executor and return its future"""
+    global _outstanding
+    with _idle:
+        _outstanding += 1
+    try:
+        future = get_executor().submit(_run_in_worker, fn, args, kwargs)
+    except BaseException:
+        with _idle:
+            _outstanding -= 1
+            _idle.notify_all()
+        raise
+    future.add_done_callback(_job_done)
+    return future
+
+
+def wait_idle(timeout=None):
+    """Wait until no submitted jobs are queued or running
+
+    Returns False if the timeout expired first.
+    """
+    with _idle:
+        return _idle.wait_for(lambda: _outstanding == 0, timeout)
+
+
+def shutdown(wait=True):
+    """Shut down the shared executor; a new one is created on next submit"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
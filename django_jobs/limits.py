@@ -0,0 +1,125 @@
+"""Wall-clock timeouts and resource limits for job subprocesses.
+
+Jobs are started in their own session, so the child and everything it
+spawns share one process group. When a schedule's timeout is exceeded the
+whole group is sent SIGTERM, and SIGKILL if it is still alive after the
+grace period. Memory (``RLIMIT_AS``) and CPU time (``RLIMIT_CPU``) limits are
+set by a small Python wrapper that then execs the command. A ``preexec_fn``
+is not safe here because the runner has threads (the worker pool).
+"""
+import os
+import signal
+import sys
+import time
+
+# Sets the rlimits given in argv, then replaces itself with the command.
+# The soft CPU limit raises SIGXCPU, the hard limit one second later SIGKILL.
+_LIMIT_WRAPPER = '''\
+import os, resource, sys
+memory, cpu = int(sys.argv[1]), int(sys.argv[2])
+if memory:
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+if cpu:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+try:
+    os.execvp(sys.argv[3], sys.argv[3:])
+except OSError as error:
+    sys.exit(f"{sys.argv[3]}: {error.strerror}")
+'''
+
+
+def limit_command(args, memory_limit_mb=None, cpu_time_limit=None):
+    """Return ``args`` wrapped to run with the given rlimits, or unchanged if unlimited
+
+    The wrapper keeps the pid, session and file descriptors of the process.
+    """
+    if not memory_limit_mb and not cpu_time_limit:
+        return args
+    memory = (memory_limit_mb or 0) * 1024 * 1024
+    # -I -S: no environment variables, user site or site-packages, for a quick start
+    return [sys.executable, '-I', '-S', '-c', _LIMIT_WRAPPER, str(memory), str(cpu_time_limit or 0), *args]
+
+
+def process_start_time(pid):
+    """Return when process ``pid`` started as a Unix timestamp, or None if unknown
+
+    Read from ``/proc``, so only known on Linux.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as stat_file:
+            stat = stat_file.read()
+        with open('/proc/stat') as boot_file:
+            boot_time = next(int(line.split()[1]) for line in boot_file if line.startswith('btime '))
+        # The command name in parentheses may contain spaces; starttime is field 22
+        start_ticks = int(stat.rsplit(')', 1)[1].split()[19])
+    except (OSError, StopIteration, ValueError, IndexError):
+        return None
+    return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+
+
+def is_job_process(pid, started_at, tolerance=30):
+    """Whether ``pid`` is still the process a run started at ``started_at`` spawned
+
+    The runner spawns the command right after marking the run as started.
+    A process that started at another time has reused the pid of one that
+    is gone. Unknown start times count as a different process.
+    """
+    started = process_start_time(pid)
+    if started is None:
+        return False
+    # The boot time only has a resolution of a second
+    return started_at.timestamp() - 2 <= started <= started_at.timestamp() + tolerance
+
+
+def kill_group(pid, sig):
+    """Send ``sig`` to the process group led by ``pid``; ignore if it is gone"""
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Deadline:
+    """Enforce a wall-clock timeout on a process group
+
+    ``check()`` is meant to be called from the runner's polling loop.
+    ``cancel()`` starts the same SIGTERM/SIGKILL sequence right away, for
+    runs that are cancelled rather than timed out.
+    """
+
+    def __init__(self, process, timeout, grace_period=10):
+        self.process = process
+        self.timeout = timeout
+        self.grace_period = grace_period
+        self.started = time.monotonic()
+        self.terminated_at = None
+        self.killed = False
+        self.cancelled = False
+
+    @property
+    def timed_out(self):
+        return self.terminated_at is not None and not self.cancelled
+
+    def cancel(self):
+        if self.terminated_at is None:
+            self.cancelled = True
+            self.terminated_at = time.monotonic()
+            kill_group(self.process.pid, signal.SIGTERM)
+
+    def check(self):
+        if self.killed:
+            return
+
+        now = time.monotonic()
+        if self.terminated_at is None:
+            if self.timeout and now - self.started >= self.timeout:
+                self.terminated_at = now
+                kill_group(self.process.pid, signal.SIGTERM)
+        elif now - self.terminated_at >= self.grace_period:
+            self.killed = True
+            kill_group(self.process.pid, signal.SIGKILL)
+
+    def cleanup(self):
+        """Kill anything left in the group after a terminated child has exited"""
+        if self.terminated_at is not None:
+            kill_group(self.process.pid, signal.SIGKILL)
@@ -1,7 +1,59 @@
 from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.db.models import Q
 from django.utils import timezone
-from django_jobs.models import CommandLog
+from django_jobs.models import Checkpoint, CommandLog
+
+
+def _doomed(cutoff_date, prefix=''):
+    """Condition for logs deleted at ``cutoff_date``: old runs and the shards of old runs
+
+    ``prefix`` applies it to the log behind a relation, e.g. ``'retry_of__'``.
+    """
+    return (Q(**{f'{prefix}started_at__lt': cutoff_date})
+            | Q(**{f'{prefix}parent__started_at__lt': cutoff_date}))
+
+
+def logs_to_delete(cutoff_date):
+    return CommandLog.objects.filter(_doomed(cutoff_date))
+
+
+def delete_logs(cutoff_date):
+    """Delete logs started before ``cutoff_date`` with a fixed number of queries
+
+    ``QuerySet.delete()`` loads every log to follow the self-references in
+    Python, one batch at a time. Instead the references are handled here in
+    SQL: kept runs and checkpoints lose their link to deleted retries,
+    workflow roots and runs (SET_NULL), then the shards of old runs
+    (CASCADE) and the old runs are deleted with plain DELETE statements.
+    No ``pre_delete``/``post_delete`` signals are sent. Returns the number
+    of deleted logs.
+    """
+    with transaction.atomic():
+        # Unlinked with the same condition, so references to deleted shards go too
+        CommandLog.objects.filter(_doomed(cutoff_date, 'retry_of__')).update(retry_of=None)
+        CommandLog.objects.filter(_doomed(cutoff_date, 'pipeline_root__')).update(pipeline_root=None)
+        Checkpoint.objects.filter(_doomed(cutoff_date, 'run__')).update(run=None)
+
+        connection = connections[router.db_for_write(CommandLog)]
+        quote = connection.ops.quote_name
+        table = quote(CommandLog._meta.db_table)
+        pk = quote(CommandLog._meta.pk.column)
+        started_at = quote(CommandLog._meta.get_field('started_at').column)
+        parent = quote(CommandLog._meta.get_field('parent').column)
+        cutoff = connection.ops.adapt_datetimefield_value(cutoff_date)
+        with connection.cursor() as cursor:
+            # Shards first, as databases that check foreign keys per row
+            # reject deleting a parent before its shards. The derived table
+            # lets MySQL read the table it deletes from.
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {parent} IN '
+                f'(SELECT {pk} FROM (SELECT {pk} FROM {table} WHERE {started_at} < %s) old_runs)',
+                [cutoff])
+            deleted = cursor.rowcount
+            cursor.execute(f'DELETE FROM {table} WHERE {started_at} < %s', [cutoff])
+            return deleted + cursor.rowcount
 
 
 class Command(BaseCommand):
@@ -26,8 +78,8 @@ class Command(BaseCommand):
         
         cutoff_date = timezone.now() - timedelta(days=days)
         
-        logs_to_delete = CommandLog.objects.filter(started_at__lt=cutoff_date)
-        count = logs_to_delete.count()
+        logs = logs_to_delete(cutoff_date)
+        count = logs.count()
         
         if count == 0:
             self.stdout.write(self.style.SUCCESS(f"No logs older than {days} days found."))
@@ -35,10 +87,10 @@ class Command(BaseCommand):
         
         if dry_run:
             self.stdout.write(self.style.WARNING(f"DRY RUN: Would delete {count} logs older than {days} days"))
-            for log in logs_to_delete[:10]:  # Show first 10
+            for log in logs[:10]:  # Show first 10
                 self.stdout.write(f"  - {log.command_name} ({log.started_at})")
             if count > 10:
                 self.stdout.write(f"  ... and {count - 10} more")
         else:
-            logs_to_delete.delete()
+            count = delete_logs(cutoff_date)
             self.stdout.write(self.style.SUCCESS(f"Deleted {count} logs older than {days} days"))
\ No newline at end of file
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_jobs.models import CommandSchedule
+from django_jobs.planning import forecast, hourly_summary, median_durations
+
+
+class Command(BaseCommand):
+    help = 'Show upcoming runs and the projected number of concurrent jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Length of the forecast window in hours (default: 24)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=14,
+            help='Use run durations from this many days of history (default: 14)',
+        )
+        parser.add_argument(
+            '--default-duration',
+            type=int,
+            default=60,
+            help='Duration in seconds assumed for commands without history (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        schedules = list(CommandSchedule.cron_scheduled())
+        durations = median_durations([schedule.command_name for schedule in schedules], options['days'])
+        result = forecast(schedules, timezone.now(), options['hours'], durations, options['default_duration'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast for {len(schedules)} schedule(s) from {result['start']:%Y-%m-%d %H:%M} "
+            f"over {options['hours']}h"))
+
+        self.stdout.write("\nRuns per command:")
+        for item in result['commands']:
+            first_run = f"{item['first_run']:%Y-%m-%d %H:%M}" if item['first_run'] else 'never'
+            self.stdout.write(
+                f"  {item['command_name']}: {item['runs']} run(s), ~{item['duration']:.0f}s each, "
+                f"next at {first_run}")
+
+        self.stdout.write("\nConcurrency per hour (peak / average):")
+        for hour, peak, average in hourly_summary(result):
+            self.stdout.write(f"  {hour:%Y-%m-%d %H:00}  {peak:>4} / {average:.1f}")
+
+        if result['peaks']:
+            self.stdout.write("\nBusiest minutes:")
+            for peak in result['peaks']:
+                self.stdout.write(
+                    f"  {peak['time']:%Y-%m-%d %H:%M}  {peak['load']} job(s): {', '.join(peak['commands'])}")
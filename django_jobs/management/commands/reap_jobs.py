@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_jobs.models import CommandLog
+
+
+class Command(BaseCommand):
+    help = 'Mark running jobs whose runner stopped sending heartbeats as lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=getattr(settings, 'DJANGO_JOBS_HEARTBEAT_TIMEOUT', 60),
+            help='Seconds without a heartbeat after which a run is considered lost (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        reaped = CommandLog.reap_stale(options['stale_after'])
+
+        if not reaped:
+            self.stdout.write(self.style.SUCCESS("No stale running jobs found."))
+            return
+
+        for log in reaped:
+            where = f" on {log.hostname} (pid {log.pid})" if log.hostname else ""
+            self.stdout.write(f"  - {log.command_name} started at {log.started_at}{where}")
+        self.stdout.write(self.style.WARNING(f"Marked {len(reaped)} stale job(s) as lost"))
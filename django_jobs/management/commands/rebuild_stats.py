@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_jobs import stats
+from django_jobs.models import DurationBaseline
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-command statistics and duration baselines from the command logs that are still kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only recompute the last this many days (default: all logs)',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        rows = stats.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} hourly statistics row(s)"))
+        baselines = DurationBaseline.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {baselines} duration baseline(s)"))
@@ -1,33 +1,138 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Max
 from django.utils import timezone
-from croniter import croniter
+from django_jobs import metrics
+from django_jobs.executor import submit, wait_idle
 from django_jobs.models import CommandSchedule, CommandLog
+from django_jobs.triggers import poll_file_triggers
 
 
 class Command(BaseCommand):
     help = 'Runs all scheduled management commands'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a resident scheduler instead of doing a single pass. '
+                 'Needed for schedules with a seconds field or an interval below a minute',
+        )
+        parser.add_argument(
+            '--tick',
+            type=float,
+            default=1.0,
+            help='Seconds between scheduler passes in --loop mode (default: 1)',
+        )
+        parser.add_argument(
+            '--reap-interval',
+            type=float,
+            default=30.0,
+            help='Seconds between checks for lost runs in --loop mode (default: 30)',
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            help='In --loop mode, serve Prometheus metrics of the jobs this scheduler runs on this port',
+        )
+        parser.add_argument(
+            '--metrics-address',
+            default='127.0.0.1',
+            help='Address the metrics server listens on (default: 127.0.0.1; use 0.0.0.0 for all interfaces)',
+        )
+
     def handle(self, *args, **options):
-        now = timezone.now()
-        
-        for command_schedule in CommandSchedule.objects.filter(active=True):
-            command_name = command_schedule.command_name
-            
-            # Build cron expression from individual fields
-            cron_expression = f"{command_schedule.schedule_minute} {command_schedule.schedule_hour} {command_schedule.schedule_day} * *"
-            
+        if not options['loop']:
+            self.reap()
+            self.tick(timezone.now())
+            # Let downstream workflow steps started on the worker pool finish
+            wait_idle()
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Scheduler started, checking every {options['tick']}s"))
+        if options['metrics_port']:
+            metrics.serve(options['metrics_port'], options['metrics_address'])
+            self.stdout.write(f"Serving metrics on {options['metrics_address']}:{options['metrics_port']}")
+        # Pending logs handed to the worker pool that have not finished yet
+        self.in_flight = {}
+        last_reap = None
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                if last_reap is None or started - last_reap >= options['reap_interval']:
+                    self.reap()
+                    last_reap = started
+                self.tick(timezone.now(), background=True)
+                time.sleep(max(0.0, options['tick'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped, waiting for running jobs to finish")
+            wait_idle()
+
+    def reap(self):
+        # Runs whose runner died would otherwise stay "running" forever
+        for log in CommandLog.reap_stale():
+            self.stdout.write(self.style.WARNING(f"Marked stale run of '{log.command_name}' (log ID {log.pk}) as lost"))
+
+    def tick(self, now, background=False):
+        """Start every job that is due at ``now``
+
+        In the background (``--loop``) mode jobs are handed to the worker pool
+        so a slow job never delays the next pass; otherwise they run one after
+        the other in this process.
+        """
+        due = []
+        for command_schedule in CommandSchedule.cron_scheduled():
             # Get when this job should have last run (using current time)
-            cron = croniter(cron_expression, now)
-            should_run_at = cron.get_prev(ret_type=timezone.datetime)
-            
+            should_run_at = command_schedule.get_prev_fire_time(now)
+            # Only start jobs within 60 seconds of their scheduled time
+            if (now - should_run_at).total_seconds() < 60:
+                due.append((command_schedule, should_run_at))
+
+        # When each command last started, looked up for all due jobs at once
+        last_started = {}
+        if due:
+            last_started = dict(CommandLog.objects.filter(
+                started_at__gte=min(should_run_at for _, should_run_at in due),
+            ).values_list('command_name').annotate(Max('started_at')).order_by())
+
+        for command_schedule, should_run_at in due:
+            command_name = command_schedule.command_name
+
             # Check if we already ran this job for the scheduled time
-            already_ran = CommandLog.objects.filter(
-                command_name=command_name,
-                started_at__gte=should_run_at
-            ).exists()
-            
-            # If not already run and within 60 seconds of scheduled time, execute
-            if not already_ran and (now - should_run_at).total_seconds() < 60:
+            already_ran = last_started.get(command_name) is not None and last_started[command_name] >= should_run_at
+
+            if not already_ran:
+                if command_schedule.jitter_seconds:
+                    # Started by the pending pass below (or a later tick) once the jitter has passed
+                    log_id = command_schedule.defer_job(should_run_at)
+                    self.stdout.write(f"Deferred command '{command_name}' by up to {command_schedule.jitter_seconds}s, log ID: {log_id}")
+                    continue
+
                 self.stdout.write(self.style.SUCCESS(f"Running command '{command_name}' at {now} (scheduled for {should_run_at})"))
-                log_id = command_schedule.run_job()
-                self.stdout.write(f"Job started with log ID: {log_id}")
\ No newline at end of file
+                if background:
+                    log_id = command_schedule.run_job_async(CommandLog.TRIGGER_CRON, should_run_at)
+                else:
+                    log_id = command_schedule.run_job(CommandLog.TRIGGER_CRON, should_run_at)
+                self.stdout.write(f"Job started with log ID: {log_id}")
+
+        for trigger in poll_file_triggers():
+            self.stdout.write(f"New files in {trigger.path}, triggered '{trigger.schedule.command_name}'")
+
+        # Pick up pending runs that are due: runs queued behind a concurrency
+        # limit, retries, workflow steps and triggered runs whose debounce has passed
+        if not background:
+            picked_up = CommandSchedule.run_pending_jobs(timezone.now())
+            if picked_up:
+                self.stdout.write(f"Picked up {picked_up} pending job(s)")
+            return
+
+        self.in_flight = {log_id: future for log_id, future in self.in_flight.items() if not future.done()}
+        for schedule, log in CommandSchedule.get_due_pending(timezone.now()):
+            if log.pk in self.in_flight:
+                continue
+            command = schedule.build_command_string(schedule.command_name, log.arguments)
+            self.in_flight[log.pk] = submit(
+                schedule._execute_command, command, log.pk, shard=log.parent_id is not None)
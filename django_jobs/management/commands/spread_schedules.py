@@ -0,0 +1,115 @@
+from croniter import croniter
+from django.core.management.base import BaseCommand
+from django_jobs.models import CommandSchedule
+from django_jobs.planning import (
+    HOURS_PER_DAY, MINUTES_PER_DAY, MINUTES_PER_HOUR, median_durations, minutes_occupied, spread_minutes,
+)
+
+
+class Command(BaseCommand):
+    help = 'Spread fixed-minute schedules over the hour to flatten peak concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=14,
+            help='Use run durations from this many days of history (default: 14)',
+        )
+        parser.add_argument(
+            '--default-duration',
+            type=int,
+            default=60,
+            help='Duration in seconds assumed for commands without history (default: 60)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Save the new minutes; without this flag the plan is only shown',
+        )
+
+    def handle(self, *args, **options):
+        schedules = list(CommandSchedule.cron_scheduled())
+        durations = median_durations([schedule.command_name for schedule in schedules], options['days'])
+
+        def duration_of(schedule):
+            return durations.get(schedule.command_name, options['default_duration'])
+
+        # Only schedules pinned to a single minute are moved; the rest is fixed load.
+        # Load is counted per minute of the day, so jobs in different hours do not compete.
+        movable = []
+        fixed_load = [0] * MINUTES_PER_DAY
+        before = [0] * MINUTES_PER_DAY
+        for schedule in schedules:
+            span = minutes_occupied(duration_of(schedule))
+            is_movable = self.is_movable(schedule)
+            hours = self.fire_hours(schedule)
+            if is_movable:
+                minutes = [int(schedule.schedule_minute)]
+                movable.append((schedule.pk, minutes[0], duration_of(schedule), hours))
+            else:
+                minutes = self.fire_minutes(schedule)
+            for hour in (range(HOURS_PER_DAY) if hours is None else hours):
+                for minute in minutes:
+                    for offset in range(span):
+                        index = (hour * MINUTES_PER_HOUR + minute + offset) % MINUTES_PER_DAY
+                        before[index] += 1
+                        if not is_movable:
+                            fixed_load[index] += 1
+
+        if not movable:
+            self.stdout.write(self.style.SUCCESS("No schedules with a fixed minute to spread."))
+            return
+
+        assignments, after = spread_minutes(movable, fixed_load)
+
+        by_pk = {schedule.pk: schedule for schedule in schedules}
+        changed = []
+        for pk, minute in sorted(assignments.items(), key=lambda item: item[1]):
+            schedule = by_pk[pk]
+            old_minute = int(schedule.schedule_minute)
+            marker = '' if minute == old_minute else '  (moved)'
+            self.stdout.write(
+                f"  {schedule.command_name}: minute {old_minute} -> {minute} "
+                f"(~{duration_of(schedule):.0f}s){marker}")
+            if minute != old_minute:
+                schedule.schedule_minute = str(minute)
+                changed.append(schedule)
+
+        self.stdout.write(f"Peak concurrency: {max(before)} before, {max(after)} after")
+
+        if not options['apply']:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: Would move {len(changed)} schedule(s). Use --apply to save."))
+            return
+
+        CommandSchedule.objects.bulk_update(changed, ['schedule_minute'])
+        self.stdout.write(self.style.SUCCESS(f"Moved {len(changed)} schedule(s)"))
+
+    @staticmethod
+    def is_movable(schedule):
+        return (schedule.schedule_minute.isdigit() and not schedule.schedule_second
+                and not schedule.interval_seconds)
+
+    @staticmethod
+    def fire_hours(schedule):
+        """Hours of the day in which a schedule starts runs, or None for every hour"""
+        if schedule.interval_seconds:
+            return None
+        hours = croniter(schedule.get_cron_expression()).expanded[1]
+        if hours == ['*']:
+            return None
+        return sorted({int(hour) for hour in hours})
+
+    @staticmethod
+    def fire_minutes(schedule):
+        """Minutes of the hour in which a schedule starts runs"""
+        if schedule.schedule_second or (schedule.interval_seconds and schedule.interval_seconds < 60):
+            return list(range(MINUTES_PER_HOUR))
+        if schedule.interval_seconds:
+            step = max(1, schedule.interval_seconds // 60)
+            return list(range(0, MINUTES_PER_HOUR, step))
+
+        minutes = croniter(schedule.get_cron_expression()).expanded[0]
+        if minutes == ['*']:
+            return list(range(MINUTES_PER_HOUR))
+        return [int(minute) for minute in minutes]
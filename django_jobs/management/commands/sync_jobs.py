@@ -54,14 +54,14 @@ class Command(BaseCommand):
                 self.stdout.write(f"  - {cmd} (from {all_commands[cmd]})")
                 
             if create_missing:
-                created_count = 0
-                for cmd in missing_commands:
-                    CommandSchedule.objects.create(
+                created_count = len(CommandSchedule.objects.bulk_create([
+                    CommandSchedule(
                         command_name=cmd,
                         app_name=filtered_commands[cmd],
                         active=False  # Create inactive by default
                     )
-                    created_count += 1
+                    for cmd in sorted(missing_commands)
+                ]))
                 self.stdout.write(self.style.SUCCESS(f"Created {created_count} new CommandSchedule entries"))
             else:
                 created_count = 0
@@ -0,0 +1,220 @@
+"""Runner and scheduler metrics in the Prometheus text format.
+
+Counters and histograms are kept in memory by the process that runs the
+jobs, the same way ``prometheus_client`` does without its multiprocess mode.
+A web process therefore reports the jobs started from its admin, and
+``run_jobs --loop --metrics-port`` reports the jobs the scheduler runs. The
+queue depth, running count and scheduling lag are read from the database, so
+they are the same wherever they are scraped.
+
+The view in ``django_jobs.views`` serves ``render()`` when
+``DJANGO_JOBS_METRICS_ENABLED`` is set.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import connections
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600)
+LAG_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # {label values: [count per bucket..., count above the last bucket, sum]}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts = self._values.setdefault(label_values, [0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def count(self, *label_values):
+        counts = self._values.get(label_values)
+        return sum(counts[:-1]) if counts else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labels, label_values, [('le', bound)])
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {counts[-1]}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+runs_total = Counter(
+    'django_jobs_runs_total', 'Finished runs by command and final status', ('command', 'status'))
+run_duration_seconds = Histogram(
+    'django_jobs_run_duration_seconds', 'Duration of finished runs', ('command',))
+schedule_lag_seconds = Histogram(
+    'django_jobs_schedule_lag_seconds', 'Delay between when a run was due and when it started',
+    ('command',), buckets=LAG_BUCKETS)
+output_bytes_total = Counter(
+    'django_jobs_output_bytes_total', 'Bytes of output read from job processes', ('command',))
+runner_db_writes_total = Counter(
+    'django_jobs_runner_db_writes_total', 'INSERT, UPDATE and DELETE statements issued by the job runner')
+
+duration_anomalies_total = Counter(
+    'django_jobs_duration_anomalies_total', 'Runs far slower or faster than their command\'s baseline',
+    ('command', 'direction'))
+
+REGISTRY = [runs_total, run_duration_seconds, schedule_lag_seconds, output_bytes_total, runner_db_writes_total,
+            duration_anomalies_total]
+
+
+def record_finished_run(log):
+    """Count a run that reached a final status"""
+    runs_total.inc(log.command_name, log.get_status_display().lower().replace(' ', '_'))
+    if log.duration is not None:
+        run_duration_seconds.observe(log.duration.total_seconds(), log.command_name)
+    if log.lag is not None:
+        schedule_lag_seconds.observe(log.lag.total_seconds(), log.command_name)
+
+
+def count_db_writes(execute, sql, params, many, context):
+    """Database ``execute_wrapper`` counting the writes issued by the runner"""
+    if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+        runner_db_writes_total.inc()
+    return execute(sql, params, many, context)
+
+
+def _gauge(name, help_text, samples):
+    """Render a gauge from ``[(labels dict, value)]``"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    for labels, value in samples:
+        lines.append(f'{name}{_format_labels(list(labels), list(labels.values()))} {value}')
+    return lines
+
+
+def collect_database_gauges():
+    """Gauges read from the database: queue depth, running runs, the oldest due run and duration trends"""
+    from .models import CommandLog, DurationBaseline
+
+    now = timezone.now()
+    due = Q(scheduled_for__isnull=True) | Q(scheduled_for__lte=now)
+    pending = CommandLog.objects.filter(status=CommandLog.STATUS_PENDING).aggregate(
+        due=Count('pk', filter=due),
+        waiting=Count('pk', filter=~due),
+        oldest_due=Min('scheduled_for', filter=Q(scheduled_for__lte=now)),
+    )
+    running = CommandLog.objects.filter(status=CommandLog.STATUS_RUNNING).values_list(
+        'command_name').annotate(count=Count('pk')).order_by('command_name')
+
+    oldest = (now - pending['oldest_due']).total_seconds() if pending['oldest_due'] else 0
+    return (
+        _gauge('django_jobs_pending_runs', 'Pending runs that are due (queue depth) or waiting for their time',
+               [({'state': 'due'}, pending['due']), ({'state': 'waiting'}, pending['waiting'])])
+        + _gauge('django_jobs_running_runs', 'Runs currently running by command',
+                 [({'command': name}, count) for name, count in running])
+        + _gauge('django_jobs_oldest_due_run_age_seconds',
+                 'How long the oldest due pending run has been waiting to start', [({}, oldest)])
+        + _gauge('django_jobs_duration_trend_ratio',
+                 'Recent typical duration of a command divided by its long-term typical duration',
+                 [({'command': baseline.command_name}, round(baseline.trend, 4))
+                  for baseline in DurationBaseline.objects.filter(runs__gt=0)])
+    )
+
+
+def collect_worker_gauges():
+    """Gauges of the worker pool in this process"""
+    from .executor import get_max_workers, held_connections, outstanding_jobs
+
+    return (
+        _gauge('django_jobs_worker_max', 'Size of the worker pool in this process', [({}, get_max_workers())])
+        + _gauge('django_jobs_worker_outstanding_jobs', 'Jobs queued or running on the worker pool',
+                 [({}, outstanding_jobs())])
+        + _gauge('django_jobs_worker_held_connections', 'Database connections held by job workers',
+                 [({}, held_connections())])
+    )
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(collect_worker_gauges())
+    lines.extend(collect_database_gauges())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            body = render().encode('utf-8')
+        finally:
+            connections.close_all()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, address='127.0.0.1'):
+    """Serve ``render()`` on ``port`` from a daemon thread; returns the server
+
+    Only reachable from this host unless another ``address`` is given
+    (``''`` or ``'0.0.0.0'`` for all interfaces).
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='django-jobs-metrics', daemon=True).start()
+    return server
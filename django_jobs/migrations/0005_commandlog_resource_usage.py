@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0004_alter_commandschedule_arguments_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='cpu_system_time',
+            field=models.FloatField(blank=True, help_text='System CPU time in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='cpu_user_time',
+            field=models.FloatField(blank=True, help_text='User CPU time in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='involuntary_ctx_switches',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='io_read_blocks',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='io_write_blocks',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='max_rss_kb',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Peak resident set size in KB', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='resource_samples',
+            field=models.JSONField(blank=True, default=list, help_text='Samples taken while running as [elapsed seconds, RSS KB, CPU seconds]'),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='voluntary_ctx_switches',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0005_commandlog_resource_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandschedule',
+            name='cpu_time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='CPU time limit (RLIMIT_CPU) for the command process in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='kill_grace_period',
+            field=models.PositiveIntegerField(default=10, help_text='Seconds to wait after SIGTERM before sending SIGKILL'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='memory_limit_mb',
+            field=models.PositiveIntegerField(blank=True, help_text='Address space limit (RLIMIT_AS) for the command process in MB', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Wall-clock limit in seconds. The process group gets SIGTERM when it is exceeded', null=True),
+        ),
+        migrations.AlterField(
+            model_name='commandlog',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('S', 'Success'), ('F', 'Failure'), ('T', 'Timed out')], default='P', max_length=1),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0006_schedule_limits_and_timeout_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConcurrencyLimit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('max_concurrent', models.PositiveIntegerField(default=1, help_text='Maximum number of jobs holding this key that may run at the same time')),
+            ],
+            options={
+                'verbose_name': 'Concurrency Limit',
+                'verbose_name_plural': 'Concurrency Limits',
+            },
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='concurrency_key',
+            field=models.CharField(blank=True, default='', help_text='Shared concurrency limit held by this run', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='scheduled_for',
+            field=models.DateTimeField(blank=True, help_text='When a pending run becomes due; run_jobs picks up pending runs that are due', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='max_instances',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of runs of this command at the same time. Empty for unlimited', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='on_limit',
+            field=models.CharField(choices=[('skip', 'Skip the new run'), ('queue', 'Queue the new run until a slot is free'), ('replace', 'Cancel the oldest running instance')], default='skip', help_text='What to do with a new run when a limit is reached', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='commandlog',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('S', 'Success'), ('F', 'Failure'), ('T', 'Timed out'), ('K', 'Skipped'), ('C', 'Cancelled')], default='P', max_length=1),
+        ),
+        migrations.AddIndex(
+            model_name='commandlog',
+            index=models.Index(fields=['status', 'command_name'], name='django_jobs_status_cmd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commandlog',
+            index=models.Index(fields=['status', 'concurrency_key'], name='django_jobs_status_key_idx'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='concurrency_limit',
+            field=models.ForeignKey(blank=True, help_text='Shared limit for commands that must not run too many at once (e.g. they use the same API)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='django_jobs.concurrencylimit'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0007_concurrency_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='hostname',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='pid',
+            field=models.PositiveIntegerField(blank=True, help_text='Process id of the command on the runner host', null=True),
+        ),
+        migrations.AlterField(
+            model_name='commandlog',
+            name='status',
+            field=models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('S', 'Success'), ('F', 'Failure'), ('T', 'Timed out'), ('K', 'Skipped'), ('C', 'Cancelled'), ('L', 'Lost')], default='P', max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='commandschedule',
+            name='command_name',
+            field=models.CharField(choices=[('changepassword', 'changepassword'), ('check', 'check'), ('cleanup_old_data', 'cleanup_old_data'), ('clearsessions', 'clearsessions'), ('collectstatic', 'collectstatic'), ('compilemessages', 'compilemessages'), ('createcachetable', 'createcachetable'), ('createsuperuser', 'createsuperuser'), ('dbshell', 'dbshell'), ('delete_logs', 'delete_logs'), ('diffsettings', 'diffsettings'), ('dumpdata', 'dumpdata'), ('findstatic', 'findstatic'), ('flush', 'flush'), ('generate_report', 'generate_report'), ('hello_world', 'hello_world'), ('inspectdb', 'inspectdb'), ('loaddata', 'loaddata'), ('makemessages', 'makemessages'), ('makemigrations', 'makemigrations'), ('migrate', 'migrate'), ('optimizemigration', 'optimizemigration'), ('reap_jobs', 'reap_jobs'), ('remove_stale_contenttypes', 'remove_stale_contenttypes'), ('run_jobs', 'run_jobs'), ('runserver', 'runserver'), ('sendtestemail', 'sendtestemail'), ('shell', 'shell'), ('showmigrations', 'showmigrations'), ('sqlflush', 'sqlflush'), ('sqlmigrate', 'sqlmigrate'), ('sqlsequencereset', 'sqlsequencereset'), ('squashmigrations', 'squashmigrations'), ('startapp', 'startapp'), ('startproject', 'startproject'), ('sync_jobs', 'sync_jobs'), ('test', 'test'), ('testserver', 'testserver')], max_length=255, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='commandlog',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='django_jobs_status_hb_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0008_commandlog_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='attempt',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='exit_code',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='retry_of',
+            field=models.ForeignKey(blank=True, help_text='First attempt of the run this log retries', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retries', to='django_jobs.commandlog'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='max_retries',
+            field=models.PositiveIntegerField(default=0, help_text='Number of times a failed or timed out run is retried'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='retry_backoff',
+            field=models.FloatField(default=2.0, help_text='Factor the delay is multiplied by for each further retry'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='retry_delay',
+            field=models.PositiveIntegerField(default=60, help_text='Seconds to wait before the first retry'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='retry_jitter',
+            field=models.FloatField(default=0.2, help_text='Random spread of each delay as a fraction of it, e.g. 0.2 for +/-20%'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='retry_on_exit_codes',
+            field=models.CharField(blank=True, default='', help_text='Comma separated exit codes to retry on, e.g. "1,75". Empty to retry on any failure or timeout', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='commandlog',
+            index=models.Index(fields=['status', 'scheduled_for'], name='django_jobs_status_sched_idx'),
+        ),
+    ]
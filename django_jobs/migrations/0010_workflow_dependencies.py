@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0009_retry_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='pipeline_root',
+            field=models.ForeignKey(blank=True, help_text='Run that started the workflow this run is part of', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pipeline_runs', to='django_jobs.commandlog'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='depends_on',
+            field=models.ManyToManyField(blank=True, help_text='Run this command as soon as all of these commands have succeeded in the same workflow run. Commands with dependencies are not started by their cron schedule', related_name='dependents', to='django_jobs.commandschedule'),
+        ),
+    ]
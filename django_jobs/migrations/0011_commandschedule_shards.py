@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0010_workflow_dependencies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Run this shard belongs to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='django_jobs.commandlog'),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='shard_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='shard_count',
+            field=models.PositiveIntegerField(default=1, help_text='Run the command as this many parallel shards. Each shard gets --shard-index and --shard-count arguments'),
+        ),
+    ]
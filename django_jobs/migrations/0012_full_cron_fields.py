@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0011_commandschedule_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandschedule',
+            name='interval_seconds',
+            field=models.PositiveIntegerField(blank=True, help_text='Run every this many seconds instead of following the cron fields. Needs run_jobs --loop for intervals below a minute', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='schedule_day_of_week',
+            field=models.CharField(default='*', help_text='Cron expression for day of week: * for every day, 0-6 (0 is Sunday) or mon-fri for a range', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='schedule_month',
+            field=models.CharField(default='*', help_text='Cron expression for month: * for every month, 1-12 for specific month, */3 for every quarter', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='schedule_second',
+            field=models.CharField(blank=True, default='', help_text='Optional cron expression for second, e.g. */15 for every 15 seconds. Needs run_jobs --loop', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0012_full_cron_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandschedule',
+            name='jitter_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Delay each run by a random number of seconds up to this value, to avoid many jobs starting at once'),
+        ),
+        migrations.AlterField(
+            model_name='commandschedule',
+            name='command_name',
+            field=models.CharField(choices=[('changepassword', 'changepassword'), ('check', 'check'), ('cleanup_old_data', 'cleanup_old_data'), ('clearsessions', 'clearsessions'), ('collectstatic', 'collectstatic'), ('compilemessages', 'compilemessages'), ('createcachetable', 'createcachetable'), ('createsuperuser', 'createsuperuser'), ('dbshell', 'dbshell'), ('delete_logs', 'delete_logs'), ('diffsettings', 'diffsettings'), ('dumpdata', 'dumpdata'), ('findstatic', 'findstatic'), ('flush', 'flush'), ('generate_report', 'generate_report'), ('hello_world', 'hello_world'), ('inspectdb', 'inspectdb'), ('loaddata', 'loaddata'), ('makemessages', 'makemessages'), ('makemigrations', 'makemigrations'), ('migrate', 'migrate'), ('optimizemigration', 'optimizemigration'), ('reap_jobs', 'reap_jobs'), ('remove_stale_contenttypes', 'remove_stale_contenttypes'), ('run_jobs', 'run_jobs'), ('runserver', 'runserver'), ('sendtestemail', 'sendtestemail'), ('shell', 'shell'), ('showmigrations', 'showmigrations'), ('spread_schedules', 'spread_schedules'), ('sqlflush', 'sqlflush'), ('sqlmigrate', 'sqlmigrate'), ('sqlsequencereset', 'sqlsequencereset'), ('squashmigrations', 'squashmigrations'), ('startapp', 'startapp'), ('startproject', 'startproject'), ('sync_jobs', 'sync_jobs'), ('test', 'test'), ('testserver', 'testserver')], max_length=255, unique=True),
+        ),
+    ]
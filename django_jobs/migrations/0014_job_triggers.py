@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0013_commandschedule_jitter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandschedule',
+            name='cron_enabled',
+            field=models.BooleanField(default=True, help_text='Start runs from the cron fields. Turn off for commands that only run on triggers'),
+        ),
+        migrations.AlterField(
+            model_name='commandschedule',
+            name='command_name',
+            field=models.CharField(choices=[('changepassword', 'changepassword'), ('check', 'check'), ('cleanup_old_data', 'cleanup_old_data'), ('clearsessions', 'clearsessions'), ('collectstatic', 'collectstatic'), ('compilemessages', 'compilemessages'), ('createcachetable', 'createcachetable'), ('createsuperuser', 'createsuperuser'), ('dbshell', 'dbshell'), ('delete_logs', 'delete_logs'), ('diffsettings', 'diffsettings'), ('dumpdata', 'dumpdata'), ('findstatic', 'findstatic'), ('flush', 'flush'), ('generate_report', 'generate_report'), ('hello_world', 'hello_world'), ('inspectdb', 'inspectdb'), ('jobs_forecast', 'jobs_forecast'), ('loaddata', 'loaddata'), ('makemessages', 'makemessages'), ('makemigrations', 'makemigrations'), ('migrate', 'migrate'), ('optimizemigration', 'optimizemigration'), ('reap_jobs', 'reap_jobs'), ('remove_stale_contenttypes', 'remove_stale_contenttypes'), ('run_jobs', 'run_jobs'), ('runserver', 'runserver'), ('sendtestemail', 'sendtestemail'), ('shell', 'shell'), ('showmigrations', 'showmigrations'), ('spread_schedules', 'spread_schedules'), ('sqlflush', 'sqlflush'), ('sqlmigrate', 'sqlmigrate'), ('sqlsequencereset', 'sqlsequencereset'), ('squashmigrations', 'squashmigrations'), ('startapp', 'startapp'), ('startproject', 'startproject'), ('sync_jobs', 'sync_jobs'), ('test', 'test'), ('testserver', 'testserver')], max_length=255, unique=True),
+        ),
+        migrations.CreateModel(
+            name='JobTrigger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('model', 'Model saved or deleted'), ('file', 'File appears in a directory'), ('http', 'HTTP ping')], max_length=10)),
+                ('active', models.BooleanField(default=True)),
+                ('debounce_seconds', models.PositiveIntegerField(default=10, help_text='Wait this long after the first event before running, folding later events into the same run')),
+                ('model', models.CharField(blank=True, default='', help_text='Model as "app_label.ModelName"; runs when an instance is saved or deleted', max_length=255)),
+                ('path', models.CharField(blank=True, default='', help_text='Directory watched by run_jobs for new or changed files', max_length=1024)),
+                ('pattern', models.CharField(blank=True, default='*', help_text='Only files matching this pattern count, e.g. *.csv', max_length=255)),
+                ('last_seen_mtime', models.FloatField(blank=True, help_text='Modification time of the newest file already handled', null=True)),
+                ('token', models.CharField(blank=True, default='', editable=False, help_text='Secret part of the HTTP ping URL', max_length=64)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='triggers', to='django_jobs.commandschedule')),
+            ],
+            options={
+                'verbose_name': 'Job Trigger',
+                'verbose_name_plural': 'Job Triggers',
+            },
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='triggered_by',
+            field=models.ForeignKey(blank=True, help_text='Trigger whose events started this run', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='django_jobs.jobtrigger'),
+        ),
+    ]
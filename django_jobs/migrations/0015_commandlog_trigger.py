@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0014_job_triggers'),
+    ]
+
+    operations = [
+        # Runs recorded before the trigger was tracked keep an empty value
+        migrations.AddField(
+            model_name='commandlog',
+            name='trigger',
+            field=models.CharField(blank=True, choices=[('cron', 'Cron schedule'), ('manual', 'Manual'), ('retry', 'Retry'), ('event', 'Event trigger'), ('workflow', 'Workflow step')], default='', help_text='What started the run (empty for runs recorded before this was tracked)', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='commandlog',
+            name='trigger',
+            field=models.CharField(blank=True, choices=[('cron', 'Cron schedule'), ('manual', 'Manual'), ('retry', 'Retry'), ('event', 'Event trigger'), ('workflow', 'Workflow step')], default='manual', help_text='What started the run (empty for runs recorded before this was tracked)', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='commandlog',
+            name='scheduled_for',
+            field=models.DateTimeField(blank=True, help_text='When the run was due to start; run_jobs picks up pending runs that are due', null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0015_commandlog_trigger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commandschedule',
+            name='command_name',
+            field=models.CharField(choices=[('changepassword', 'changepassword'), ('check', 'check'), ('cleanup_old_data', 'cleanup_old_data'), ('clearsessions', 'clearsessions'), ('collectstatic', 'collectstatic'), ('compilemessages', 'compilemessages'), ('createcachetable', 'createcachetable'), ('createsuperuser', 'createsuperuser'), ('dbshell', 'dbshell'), ('delete_logs', 'delete_logs'), ('diffsettings', 'diffsettings'), ('dumpdata', 'dumpdata'), ('findstatic', 'findstatic'), ('flush', 'flush'), ('generate_report', 'generate_report'), ('hello_world', 'hello_world'), ('inspectdb', 'inspectdb'), ('jobs_forecast', 'jobs_forecast'), ('loaddata', 'loaddata'), ('makemessages', 'makemessages'), ('makemigrations', 'makemigrations'), ('migrate', 'migrate'), ('optimizemigration', 'optimizemigration'), ('reap_jobs', 'reap_jobs'), ('rebuild_stats', 'rebuild_stats'), ('remove_stale_contenttypes', 'remove_stale_contenttypes'), ('run_jobs', 'run_jobs'), ('runserver', 'runserver'), ('sendtestemail', 'sendtestemail'), ('shell', 'shell'), ('showmigrations', 'showmigrations'), ('spread_schedules', 'spread_schedules'), ('sqlflush', 'sqlflush'), ('sqlmigrate', 'sqlmigrate'), ('sqlsequencereset', 'sqlsequencereset'), ('squashmigrations', 'squashmigrations'), ('startapp', 'startapp'), ('startproject', 'startproject'), ('sync_jobs', 'sync_jobs'), ('test', 'test'), ('testserver', 'testserver')], max_length=255, unique=True),
+        ),
+        migrations.CreateModel(
+            name='CommandStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command_name', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField(help_text='Start of the hour the runs started in')),
+                ('success_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('timeout_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('lost_count', models.PositiveIntegerField(default=0)),
+                ('duration_count', models.PositiveIntegerField(default=0, help_text='Runs included in the duration figures')),
+                ('duration_sum', models.FloatField(default=0, help_text='Seconds')),
+                ('duration_min', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('duration_max', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('duration_sketch', models.JSONField(blank=True, default=dict, help_text='Duration histogram for percentiles')),
+                ('lag_count', models.PositiveIntegerField(default=0)),
+                ('lag_sum', models.FloatField(default=0, help_text='Seconds')),
+                ('lag_max', models.FloatField(blank=True, help_text='Seconds', null=True)),
+            ],
+            options={
+                'verbose_name': 'Command Statistics',
+                'verbose_name_plural': 'Command Statistics',
+                'ordering': ['-hour', 'command_name'],
+                'indexes': [models.Index(fields=['hour'], name='django_jobs_stats_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('command_name', 'hour'), name='django_jobs_stats_cmd_hour_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0016_command_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DurationBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command_name', models.CharField(max_length=255, unique=True)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0, help_text='Weighted mean of the log duration in seconds')),
+                ('variance', models.FloatField(default=0, help_text='Weighted variance of the log duration')),
+                ('long_mean', models.FloatField(default=0, help_text='Slow moving mean of the log duration')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Duration Baseline',
+                'verbose_name_plural': 'Duration Baselines',
+                'ordering': ['command_name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='duration_anomaly',
+            field=models.CharField(blank=True, choices=[('slow', 'Slower than usual'), ('fast', 'Faster than usual')], default='', help_text="Set when the duration is far outside the command's baseline", max_length=4),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='duration_score',
+            field=models.FloatField(blank=True, help_text='Standard deviations of the (log) duration from the baseline', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0017_duration_baselines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='progress_done',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Units of work done', null=True),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='progress_message',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='progress_total',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Units of work in total', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0018_run_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='profile',
+            field=models.TextField(blank=True, default='', help_text='cProfile stats of a profiled run'),
+        ),
+        migrations.AddField(
+            model_name='commandlog',
+            name='stack_dump_requested',
+            field=models.BooleanField(default=False, help_text='Set from the admin; the runner signals the command to dump its stacks to stderr'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='profile_next_run',
+            field=models.BooleanField(default=False, help_text='Run the command under cProfile the next time it runs and attach the stats to its log. Turned off again by that run'),
+        ),
+    ]
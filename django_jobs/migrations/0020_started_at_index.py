@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0019_debugging_hooks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commandlog',
+            index=models.Index(fields=['started_at'], name='django_jobs_started_idx'),
+        ),
+    ]
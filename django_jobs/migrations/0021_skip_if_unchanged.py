@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0020_started_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commandlog',
+            name='memo_key',
+            field=models.CharField(blank=True, default='', help_text='Hash of the command, arguments and fingerprint of a run of a "skip if unchanged" schedule', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', help_text='Dotted path of a function(schedule, arguments) returning the version of the data the command reads, e.g. the latest updated_at of a table', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='skip_if_unchanged',
+            field=models.BooleanField(default=False, help_text='Skip a run when the command, its arguments and the fingerprint are the same as for the last successful run. Manual runs always run'),
+        ),
+        migrations.AddField(
+            model_name='commandschedule',
+            name='unchanged_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds a successful run stays valid for skipping. Empty for no limit', null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0021_skip_if_unchanged'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('value', models.JSONField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(blank=True, help_text='First attempt of the run that saved the checkpoint', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='django_jobs.commandlog')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='django_jobs.commandschedule')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint',
+                'verbose_name_plural': 'Checkpoints',
+                'ordering': ['schedule', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('schedule', 'key'), name='django_jobs_checkpoint_uniq')],
+            },
+        ),
+    ]
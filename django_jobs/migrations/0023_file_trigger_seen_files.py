@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:08
+
+import fnmatch
+import os
+
+from django.db import migrations, models
+
+
+def seed_seen_files(apps, schema_editor):
+    """Mark the files a trigger already handled as seen, so they do not fire again"""
+    JobTrigger = apps.get_model('django_jobs', 'JobTrigger')
+    for trigger in JobTrigger.objects.filter(kind='file', last_seen_mtime__isnull=False):
+        files = {}
+        try:
+            with os.scandir(trigger.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and fnmatch.fnmatch(entry.name, trigger.pattern or '*'):
+                        mtime = entry.stat().st_mtime
+                        if mtime <= trigger.last_seen_mtime:
+                            files[entry.name] = mtime
+        except OSError:
+            continue
+        trigger.seen_files = files
+        trigger.save(update_fields=['seen_files'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_jobs', '0022_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobtrigger',
+            name='seen_files',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Modification time of each matching file already handled, by name'),
+        ),
+        migrations.RunPython(seed_seen_files, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='jobtrigger',
+            name='last_seen_mtime',
+        ),
+    ]
@@ -1,26 +1,111 @@
 import argparse
+import hashlib
 import json
+import math
 import os
+import random
+import secrets
 import shlex
+import signal
+import socket
 import subprocess
+import tempfile
 import threading
 import time
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta
 from io import StringIO
 
 from django.core.management import get_commands, load_command_class
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import connection, models
+from django.db import connection, connections, models, router, transaction
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.module_loading import import_string
 from croniter import croniter
 
+from . import checkpoints, debugging, metrics, stats, tracing
+from .limits import Deadline, is_job_process, kill_group, limit_command
+from .progress import ProgressReader
+from .resources import ResourceMonitor
+
 # Extract the available management commands
 COMMAND_CHOICES = sorted([(command, command)
                          for command in get_commands().keys()])
 
+# Pending logs waiting in this process's worker pool. Their heartbeat_at tells
+# run_jobs that a live pool holds them (see CommandSchedule.get_due_pending).
+_pooled_logs = set()
+_pooled_lock = threading.Lock()
+_pooled_refreshed_at = 0.0
+
+
+def _submit_to_pool(execute, command, log_id, **kwargs):
+    """Queue a run on the worker pool; its log must be created with ``heartbeat_at`` set"""
+    from .executor import submit
+
+    with _pooled_lock:
+        _pooled_logs.add(log_id)
+    try:
+        return submit(execute, command, log_id, **kwargs)
+    except BaseException:
+        with _pooled_lock:
+            _pooled_logs.discard(log_id)
+        raise
+
+
+def _leave_pool(log_id):
+    with _pooled_lock:
+        _pooled_logs.discard(log_id)
+
+
+def _refresh_pooled_logs():
+    """Renew ``heartbeat_at`` of the logs waiting in this process's pool
+
+    Runs are only waiting while every worker is busy, so the running jobs
+    call this from their update loop.
+    """
+    global _pooled_refreshed_at
+    now = time.monotonic()
+    with _pooled_lock:
+        if not _pooled_logs or now - _pooled_refreshed_at < getattr(settings, 'DJANGO_JOBS_HEARTBEAT_TIMEOUT', 60) / 3:
+            return
+        _pooled_refreshed_at = now
+        log_ids = list(_pooled_logs)
+    CommandLog.objects.filter(pk__in=log_ids, status=CommandLog.STATUS_PENDING).update(heartbeat_at=timezone.now())
+
+
+class ConcurrencyLimit(models.Model):
+    """A named limit shared by every schedule that refers to it
+
+    The number of running jobs holding the key is counted in the database
+    while the limit row is locked, so the limit holds across nodes.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    max_concurrent = models.PositiveIntegerField(
+        default=1, help_text='Maximum number of jobs holding this key that may run at the same time')
+
+    class Meta:
+        verbose_name = "Concurrency Limit"
+        verbose_name_plural = "Concurrency Limits"
+
+    def __str__(self):
+        return f"{self.key} (max {self.max_concurrent})"
+
 
 class CommandSchedule(models.Model):
+    ON_LIMIT_SKIP = 'skip'
+    ON_LIMIT_QUEUE = 'queue'
+    ON_LIMIT_REPLACE = 'replace'
+
+    ON_LIMIT_CHOICES = (
+        (ON_LIMIT_SKIP, 'Skip the new run'),
+        (ON_LIMIT_QUEUE, 'Queue the new run until a slot is free'),
+        (ON_LIMIT_REPLACE, 'Cancel the oldest running instance'),
+    )
+
     command_name = models.CharField(
         max_length=255,
         unique=True,
@@ -33,9 +118,67 @@ class CommandSchedule(models.Model):
         max_length=20, default='*', help_text='Cron expression for minute: * for every minute, */15 for every 15 minutes, 0-59 for specific minute, 0,30 for multiple values')
     schedule_day = models.CharField(
         max_length=20, default='*', help_text='Cron expression for day: * for every day, */7 for every 7 days, 1-31 for specific day, 1,15 for multiple values')
+    schedule_month = models.CharField(
+        max_length=20, default='*', help_text='Cron expression for month: * for every month, 1-12 for specific month, */3 for every quarter')
+    schedule_day_of_week = models.CharField(
+        max_length=20, default='*', help_text='Cron expression for day of week: * for every day, 0-6 (0 is Sunday) or mon-fri for a range')
+    schedule_second = models.CharField(
+        max_length=20, blank=True, default='', help_text='Optional cron expression for second, e.g. */15 for every 15 seconds. Needs run_jobs --loop')
+    interval_seconds = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Run every this many seconds instead of following the cron fields. Needs run_jobs --loop for intervals below a minute')
+    jitter_seconds = models.PositiveIntegerField(
+        default=0, help_text='Delay each run by a random number of seconds up to this value, to avoid many jobs starting at once')
     active = models.BooleanField(default=False)
+    cron_enabled = models.BooleanField(
+        default=True, help_text='Start runs from the cron fields. Turn off for commands that only run on triggers')
     arguments = models.JSONField(default=dict, blank=True,
                                  help_text='JSON dictionary of arguments. Use "_positional": ["arg1", "arg2"] for positional args')
+    timeout = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Wall-clock limit in seconds. The process group gets SIGTERM when it is exceeded')
+    kill_grace_period = models.PositiveIntegerField(
+        default=10, help_text='Seconds to wait after SIGTERM before sending SIGKILL')
+    memory_limit_mb = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Address space limit (RLIMIT_AS) for the command process in MB')
+    cpu_time_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text='CPU time limit (RLIMIT_CPU) for the command process in seconds')
+    max_instances = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Maximum number of runs of this command at the same time. Empty for unlimited')
+    concurrency_limit = models.ForeignKey(
+        ConcurrencyLimit, null=True, blank=True, on_delete=models.SET_NULL, related_name='schedules',
+        help_text='Shared limit for commands that must not run too many at once (e.g. they use the same API)')
+    on_limit = models.CharField(
+        max_length=10, choices=ON_LIMIT_CHOICES, default=ON_LIMIT_SKIP,
+        help_text='What to do with a new run when a limit is reached')
+    max_retries = models.PositiveIntegerField(
+        default=0, help_text='Number of times a failed or timed out run is retried')
+    retry_delay = models.PositiveIntegerField(
+        default=60, help_text='Seconds to wait before the first retry')
+    retry_backoff = models.FloatField(
+        default=2.0, help_text='Factor the delay is multiplied by for each further retry')
+    retry_jitter = models.FloatField(
+        default=0.2, help_text='Random spread of each delay as a fraction of it, e.g. 0.2 for +/-20%')
+    retry_on_exit_codes = models.CharField(
+        max_length=100, blank=True, default='',
+        help_text='Comma separated exit codes to retry on, e.g. "1,75". Empty to retry on any failure or timeout')
+    shard_count = models.PositiveIntegerField(
+        default=1, help_text='Run the command as this many parallel shards. Each shard gets '
+                             '--shard-index and --shard-count arguments')
+    profile_next_run = models.BooleanField(
+        default=False, help_text='Run the command under cProfile the next time it runs and attach the stats '
+                                 'to its log. Turned off again by that run')
+    skip_if_unchanged = models.BooleanField(
+        default=False, help_text='Skip a run when the command, its arguments and the fingerprint are the same as '
+                                 'for the last successful run. Manual runs always run')
+    fingerprint = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text='Dotted path of a function(schedule, arguments) returning the version of the data the command '
+                  'reads, e.g. the latest updated_at of a table')
+    unchanged_ttl = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Seconds a successful run stays valid for skipping. Empty for no limit')
+    depends_on = models.ManyToManyField(
+        'self', symmetrical=False, blank=True, related_name='dependents',
+        help_text='Run this command as soon as all of these commands have succeeded in the same workflow run. '
+                  'Commands with dependencies are not started by their cron schedule')
 
     class Meta:
         verbose_name = "Command Schedule"
@@ -46,10 +189,159 @@ class CommandSchedule(models.Model):
         super().clean()
         try:
             # Build full cron expression to validate
-            cron_expression = f"{self.schedule_minute} {self.schedule_hour} {self.schedule_day} * *"
-            croniter(cron_expression)
+            croniter(self.get_cron_expression())
         except Exception as e:
             raise ValidationError(f"Invalid cron expression: {e}")
+        try:
+            self.get_retry_exit_codes()
+        except ValueError:
+            raise ValidationError({'retry_on_exit_codes': 'Enter a comma separated list of integers'})
+        if self.fingerprint:
+            try:
+                import_string(self.fingerprint)
+            except ImportError:
+                raise ValidationError({'fingerprint': 'Enter the dotted path of an importable function'})
+
+    def get_cron_expression(self):
+        """Build the cron expression from the individual fields
+
+        Five fields, or six with the seconds field last when it is set.
+        """
+        expression = (f"{self.schedule_minute} {self.schedule_hour} {self.schedule_day} "
+                      f"{self.schedule_month} {self.schedule_day_of_week}")
+        if self.schedule_second:
+            expression += f" {self.schedule_second}"
+        return expression
+
+    def get_prev_fire_time(self, now):
+        """Return the most recent time at or before ``now`` this job was due"""
+        if self.interval_seconds:
+            # Intervals are aligned to the epoch so every node agrees on them
+            timestamp = now.timestamp()
+            return datetime.fromtimestamp(
+                timestamp - timestamp % self.interval_seconds, tz=now.tzinfo)
+
+        cron = croniter(self.get_cron_expression(), now)
+        return cron.get_prev(ret_type=datetime)
+
+    def get_retry_exit_codes(self):
+        """Return the exit codes that trigger a retry as a set (empty means any)"""
+        return {int(code) for code in self.retry_on_exit_codes.split(',') if code.strip()}
+
+    def get_retry_delay(self, attempt):
+        """Return the delay in seconds before retrying after the given attempt
+
+        The delay grows exponentially with the attempt number and is spread
+        randomly by ``retry_jitter``, so runs that failed together (e.g. during
+        an outage of a shared dependency) do not all retry at the same moment.
+        """
+        delay = self.retry_delay * self.retry_backoff ** (attempt - 1)
+        jitter = min(max(self.retry_jitter, 0), 1)
+        return max(0.0, delay * random.uniform(1 - jitter, 1 + jitter))
+
+    def would_create_cycle(self, upstreams):
+        """Return True if depending on ``upstreams`` would make the workflow cyclic"""
+        if not self.pk:
+            return False
+
+        # Walk upstream from the new dependencies; reaching self means a cycle
+        edges = {}
+        for schedule_id, upstream_id in CommandSchedule.depends_on.through.objects.values_list(
+                'from_commandschedule_id', 'to_commandschedule_id'):
+            edges.setdefault(schedule_id, []).append(upstream_id)
+
+        stack = [upstream.pk for upstream in upstreams]
+        seen = set()
+        while stack:
+            schedule_id = stack.pop()
+            if schedule_id == self.pk:
+                return True
+            if schedule_id in seen:
+                continue
+            seen.add(schedule_id)
+            stack.extend(edges.get(schedule_id, []))
+        return False
+
+    def _trigger_dependents(self, log):
+        """Start downstream commands whose upstreams have all succeeded
+
+        All runs of one workflow share ``pipeline_root``, the run that started
+        it. A dependent is started once every one of its upstreams has a
+        successful run in the same workflow. The dependent's row is locked while
+        checking, so when several upstreams finish at the same time it is still
+        started only once. Independent dependents run in parallel on the worker
+        pool. Inactive dependents are not started, which ends that branch of the
+        workflow. Returns the list of created logs.
+        """
+        if not self.pk:
+            return []
+
+        root_id = log.pipeline_root_id or log.pk
+        pipeline = CommandLog.objects.filter(Q(pk=root_id) | Q(pipeline_root_id=root_id))
+
+        started = []
+        for dependent in self.dependents.filter(active=True).prefetch_related('depends_on'):
+            upstream_names = {upstream.command_name for upstream in dependent.depends_on.all()}
+            with transaction.atomic():
+                list(CommandSchedule.objects.select_for_update().filter(pk=dependent.pk))
+                succeeded = set(pipeline.filter(
+                    command_name__in=upstream_names,
+                    status=CommandLog.STATUS_SUCCESS,
+                ).values_list('command_name', flat=True))
+                if succeeded != upstream_names:
+                    continue
+                if pipeline.filter(command_name=dependent.command_name).exists():
+                    continue
+                started.append((dependent, CommandLog.objects.create(
+                    command_name=dependent.command_name,
+                    app_name=dependent.app_name,
+                    arguments=dependent.arguments,
+                    pipeline_root_id=root_id,
+                    # Due right away, so run_jobs picks it up if this process dies
+                    scheduled_for=timezone.now(),
+                    heartbeat_at=timezone.now(),
+                    trigger=CommandLog.TRIGGER_WORKFLOW,
+                )))
+
+        for dependent, dependent_log in started:
+            command = dependent.build_command_string(dependent.command_name, dependent_log.arguments)
+            try:
+                _submit_to_pool(dependent._execute_command, command, dependent_log.pk)
+            except RuntimeError:
+                # Interpreter is shutting down; the next run_jobs tick starts it
+                pass
+
+        return [dependent_log for dependent, dependent_log in started]
+
+    def _schedule_retry(self, log):
+        """Create a pending retry for a failed run if the retry policy allows it
+
+        Retries are linked to the first attempt through ``retry_of`` and are
+        started by ``run_jobs`` once their ``scheduled_for`` time has passed.
+        Returns the new log, or None.
+        """
+        if log.attempt > self.max_retries:
+            return None
+        if log.status == CommandLog.STATUS_TIMEOUT:
+            if self.get_retry_exit_codes():
+                return None
+        elif log.status != CommandLog.STATUS_FAILURE:
+            return None
+        else:
+            exit_codes = self.get_retry_exit_codes()
+            if exit_codes and log.exit_code not in exit_codes:
+                return None
+
+        return CommandLog.objects.create(
+            command_name=log.command_name,
+            app_name=log.app_name,
+            arguments=log.arguments,
+            attempt=log.attempt + 1,
+            retry_of_id=log.retry_of_id or log.pk,
+            pipeline_root_id=log.pipeline_root_id or log.pk,
+            scheduled_for=timezone.now() + timedelta(seconds=self.get_retry_delay(log.attempt)),
+            trigger=CommandLog.TRIGGER_RETRY,
+        )
     
     def save(self, *args, **kwargs):
         """Run validation before saving"""
@@ -118,15 +410,167 @@ class CommandSchedule(models.Model):
         
         return command
 
+    @staticmethod
+    def cron_scheduled():
+        """Schedules whose runs are started by their cron fields
+
+        Commands with dependencies are started by their upstreams and
+        trigger-only commands by their triggers.
+        """
+        return CommandSchedule.objects.filter(active=True, cron_enabled=True, depends_on__isnull=True)
+
     @staticmethod
     def run_jobs(queryset):
         """Run multiple jobs asynchronously"""
-        for schedule in queryset:
-            schedule.run_job_async()
-        return len(queryset)
+        return len(CommandSchedule.enqueue_jobs(queryset))
+
+    @staticmethod
+    def enqueue_jobs(schedules, arguments=None, trigger=None, scheduled_for=None):
+        """Create logs for all schedules at once and queue them on the worker pool
+
+        All ``CommandLog`` rows are inserted at once (see ``CommandLog.create_all``) and
+        the jobs are handed to the bounded executor, so the caller returns
+        immediately no matter how many schedules were selected. If
+        ``arguments`` is given it overrides the arguments of every schedule.
+        ``trigger`` and ``scheduled_for`` default to a manual run due now.
+
+        Returns the list of created log ids, in the order of ``schedules``.
+        """
+        schedules = list(schedules)
+        now = timezone.now()
+        scheduled_for = scheduled_for or now
+        logs = CommandLog.create_all([
+            CommandLog(
+                command_name=schedule.command_name,
+                app_name=schedule.app_name,
+                arguments=arguments if arguments else schedule.arguments,
+                trigger=trigger or CommandLog.TRIGGER_MANUAL,
+                scheduled_for=scheduled_for,
+                # Held by the pool, so run_jobs leaves it alone
+                heartbeat_at=now,
+            )
+            for schedule in schedules
+        ])
+
+        for schedule, log in zip(schedules, logs):
+            command = schedule.build_command_string(schedule.command_name, log.arguments)
+            _submit_to_pool(schedule._execute_command, command, log.pk)
+
+        return [log.pk for log in logs]
+
+    @staticmethod
+    def run_pending_jobs(now=None):
+        """Run pending logs that are due: queued runs, retries and workflow steps
+
+        Runs synchronously in the calling thread, oldest first. Returns the
+        number of pending logs that were picked up.
+        """
+        pending = CommandSchedule.get_due_pending(now)
+        for schedule, log in pending:
+            command = schedule.build_command_string(schedule.command_name, log.arguments)
+            schedule._execute_command(command, log.pk, shard=log.parent_id is not None)
+
+        return len(pending)
+
+    @staticmethod
+    def get_due_pending(now=None):
+        """Return ``(schedule, log)`` pairs for pending logs that are due, oldest first
+
+        Logs without a schedule get an unsaved one with default settings.
+        Logs waiting in a worker pool are left to it, unless the pool stopped
+        renewing their ``heartbeat_at`` for ``DJANGO_JOBS_HEARTBEAT_TIMEOUT``
+        (its process died).
+        """
+        now = now or timezone.now()
+        pool_cutoff = now - timedelta(seconds=getattr(settings, 'DJANGO_JOBS_HEARTBEAT_TIMEOUT', 60))
+        pending = list(CommandLog.objects.filter(
+            Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=pool_cutoff),
+            status=CommandLog.STATUS_PENDING,
+            scheduled_for__lte=now,
+        ).order_by('scheduled_for', 'pk'))
+        if not pending:
+            return []
+
+        schedules = CommandSchedule.objects.in_bulk(
+            {log.command_name for log in pending}, field_name='command_name')
+        return [
+            (schedules.get(log.command_name) or CommandSchedule(
+                command_name=log.command_name, app_name=log.app_name), log)
+            for log in pending
+        ]
+
+    def _claim_run(self, log_id, enforce_limits=True):
+        """Move a pending log to running if the concurrency limits allow it
+
+        The schedule row and the shared limit row are locked while the running
+        jobs are counted, so concurrent claims (also from other nodes) are
+        serialized. The status change is conditional on the log still being
+        pending, so a log can only be claimed once.
+
+        Returns True if the run was claimed and should start now.
+        """
+        # Shards count as part of their parent run
+        running = CommandLog.objects.filter(
+            status=CommandLog.STATUS_RUNNING, cancel_requested=False, parent__isnull=True)
+
+        with transaction.atomic():
+            blocking = []
+            if enforce_limits and self.pk and self.max_instances:
+                list(CommandSchedule.objects.select_for_update().filter(pk=self.pk))
+                same_command = running.filter(command_name=self.command_name)
+                if same_command.count() >= self.max_instances:
+                    blocking.append(same_command)
+
+            key = ''
+            if enforce_limits and self.concurrency_limit_id:
+                limit = ConcurrencyLimit.objects.select_for_update().get(pk=self.concurrency_limit_id)
+                key = limit.key
+                same_key = running.filter(concurrency_key=key)
+                if same_key.count() >= limit.max_concurrent:
+                    blocking.append(same_key)
+
+            pending = CommandLog.objects.filter(pk=log_id, status=CommandLog.STATUS_PENDING)
+
+            if blocking and self.on_limit == self.ON_LIMIT_QUEUE:
+                # Leave it pending; run_jobs picks it up again once a slot is free.
+                # It is no longer waiting in a worker pool.
+                pending.update(scheduled_for=Coalesce('scheduled_for', Value(timezone.now())), heartbeat_at=None)
+                return False
+
+            if blocking and self.on_limit == self.ON_LIMIT_SKIP:
+                log = pending.first()
+                if log is not None:
+                    log.set_skipped("Skipped: concurrency limit reached")
+                return False
+
+            # Replace: ask the oldest run in each full group to stop. The runner
+            # that owns it sees the flag on its next update, on whichever node.
+            for group in blocking:
+                oldest = group.order_by('started_at').values_list('pk', flat=True)[:1]
+                CommandLog.objects.filter(pk__in=list(oldest)).update(cancel_requested=True)
+
+            now = timezone.now()
+            claimed = pending.update(
+                status=CommandLog.STATUS_RUNNING,
+                started_at=now,
+                heartbeat_at=now,
+                hostname=socket.gethostname(),
+                concurrency_key=key,
+            )
+            return claimed == 1
+
+    def _stream_output(self, process, log_id, monitor=None, deadline=None, progress=None, trace=None):
+        """Stream and capture output from a running process in real-time
+
+        If a ``ResourceMonitor`` is given it is used to reap the process so
+        its resource usage is collected while it runs. If a ``Deadline`` is
+        given it is checked on every iteration to enforce the timeout. If a
+        ``progress.ProgressReader`` is given, the latest progress update is
+        saved along with the output. If a ``tracing.Trace`` is given, the
+        final read after the process exits is added to it as ``output_flush``.
+        """
+        poll = monitor.poll if monitor is not None else process.poll
 
-    def _stream_output(self, process, log_id):
-        """Stream and capture output from a running process in real-time"""
         # Buffers for stdout and stderr
         stdout_buffer = StringIO()
         stderr_buffer = StringIO()
@@ -152,11 +596,12 @@ class CommandSchedule(models.Model):
                             flags_stderr | os.O_NONBLOCK)
 
                 # While the process is still running
-                while process.poll() is None:
+                while poll() is None:
                     # Try to read from stdout
                     try:
                         stdout_chunk = stdout.read()
                         if stdout_chunk:
+                            metrics.output_bytes_total.inc(self.command_name, amount=len(stdout_chunk))
                             decoded = stdout_chunk.decode('utf-8')
                             stdout_buffer.write(decoded)
                     except (IOError, BlockingIOError):
@@ -166,6 +611,7 @@ class CommandSchedule(models.Model):
                     try:
                         stderr_chunk = stderr.read()
                         if stderr_chunk:
+                            metrics.output_bytes_total.inc(self.command_name, amount=len(stderr_chunk))
                             decoded = stderr_chunk.decode('utf-8')
                             stderr_buffer.write(decoded)
                     except (IOError, BlockingIOError):
@@ -175,23 +621,45 @@ class CommandSchedule(models.Model):
                     current_time = time.time()
                     if current_time - last_update > 1.0:  # Update at most once per second
                         try:
-                            log = CommandLog.objects.get(pk=log_id)
                             # Update the output in the database
                             stdout_content = stdout_buffer.getvalue()
                             stderr_content = stderr_buffer.getvalue()
                             output = f"STDOUT (in progress):\n{stdout_content}\n\nSTDERR (in progress):\n{stderr_content}"
-                            log.output = output
-                            log.save(update_fields=['output'])
+                            progress_fields = progress.fields() if progress is not None and progress.poll() else {}
+                            CommandLog.objects.filter(pk=log_id).update(
+                                output=output, heartbeat_at=timezone.now(), **progress_fields)
                             last_update = current_time
+                            _refresh_pooled_logs()
+
+                            # Pick up cancellation and stack dump requests, which may come from another node
+                            cancel_requested, dump_requested = CommandLog.objects.filter(pk=log_id).values_list(
+                                'cancel_requested', 'stack_dump_requested').first() or (False, False)
+                            if cancel_requested and deadline is not None:
+                                deadline.cancel()
+                            if dump_requested and progress is not None:
+                                CommandLog.objects.filter(pk=log_id).update(stack_dump_requested=False)
+                                stderr_buffer.write(debugging.request_stack_dump(process, progress))
                         except Exception as e:
                             print(f"Error updating log: {str(e)}")
 
+                    if deadline is not None:
+                        deadline.check()
+
                     # Don't hog the CPU
                     time.sleep(0.1)
 
                 # Final read after process completes
-                stdout_content = stdout_buffer.getvalue() + stdout.read().decode('utf-8')
-                stderr_content = stderr_buffer.getvalue() + stderr.read().decode('utf-8')
+                # (read() returns None if a leftover grandchild still holds the pipe)
+                flush_start = time.time_ns()
+                stdout_tail = stdout.read() or b''
+                stderr_tail = stderr.read() or b''
+                if progress is not None:
+                    progress.poll()
+                metrics.output_bytes_total.inc(self.command_name, amount=len(stdout_tail) + len(stderr_tail))
+                stdout_content = stdout_buffer.getvalue() + stdout_tail.decode('utf-8')
+                stderr_content = stderr_buffer.getvalue() + stderr_tail.decode('utf-8')
+                if trace is not None:
+                    trace.add('output_flush', flush_start, time.time_ns())
 
                 return stdout_content, stderr_content
 
@@ -200,27 +668,219 @@ class CommandSchedule(models.Model):
             print(error_text)
             return stdout_buffer.getvalue(), stderr_buffer.getvalue() + f"\n{error_text}"
 
-    def _execute_command(self, command, log_id):
-        """Execute the command in a separate thread with real-time output"""
+    def memo_key(self, arguments):
+        """Hash of the command, ``arguments`` and the schedule's fingerprint
+
+        Exceptions raised by the fingerprint function are passed on.
+        """
+        fingerprint = import_string(self.fingerprint)(self, arguments) if self.fingerprint else None
+        payload = json.dumps([self.command_name, arguments, fingerprint], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _skip_if_unchanged(self, log_id):
+        """Skip a pending run whose memo key matches the last successful run
+
+        Checked before the run is claimed, so a skipped run never counts
+        towards or acts on concurrency limits. The key is stored on the run,
+        so a successful run becomes the one the next runs compare against.
+        Returns the log if the run was skipped.
+        """
+        log = CommandLog.objects.filter(pk=log_id, status=CommandLog.STATUS_PENDING).first()
+        # Already picked up by another runner, which the claim will notice
+        if log is None or log.trigger == CommandLog.TRIGGER_MANUAL:
+            return None
         try:
-            # Get a fresh log object
-            log = CommandLog.objects.get(pk=log_id)
-            log.set_running()
+            key = self.memo_key(log.arguments)
+        except Exception as e:
+            # Without a fingerprint nothing is known to be unchanged, so the command runs
+            print(f"Error computing the fingerprint of {self.command_name}: {str(e)}")
+            return None
+
+        last = CommandLog.objects.filter(
+            command_name=self.command_name, status=CommandLog.STATUS_SUCCESS, parent__isnull=True,
+        ).order_by('-started_at').only('pk', 'memo_key', 'started_at').first()
+        fresh = last is not None and (
+            not self.unchanged_ttl or last.started_at >= timezone.now() - timedelta(seconds=self.unchanged_ttl))
+        log.memo_key = key
+        if not (fresh and last.memo_key == key):
+            log.save(update_fields=['memo_key'])
+            return None
+        with transaction.atomic():
+            # Conditional like the claim, so a run is never both skipped and started
+            if not CommandLog.objects.filter(pk=log_id, status=CommandLog.STATUS_PENDING).update(
+                    status=CommandLog.STATUS_SKIPPED, memo_key=key):
+                return None
+            log.set_skipped(f"Skipped: inputs unchanged since run {last.pk} at {last.started_at:%Y-%m-%d %H:%M:%S}\n")
+        return log
+
+    def _take_profile_request(self):
+        """Turn off ``profile_next_run`` and return a file for the profile if this run takes it"""
+        if not self.profile_next_run or not self.pk:
+            return None
+        # Only one run takes the request, even if several start at once
+        if not CommandSchedule.objects.filter(pk=self.pk, profile_next_run=True).update(profile_next_run=False):
+            return None
+        fd, path = tempfile.mkstemp(prefix='django-jobs-', suffix='.prof')
+        os.close(fd)
+        return path
+
+    def _collect_profile(self, path):
+        try:
+            return debugging.format_profile(path)
+        except Exception as e:
+            print(f"Error reading profile {path}: {str(e)}")
+            return ''
+        finally:
+            os.unlink(path)
+
+    def _after_run(self, log):
+        """Follow-up once a run has finished: complete the parent, start dependents or retry"""
+        if log.parent_id:
+            self._finish_shard(log)
+        elif log.status == CommandLog.STATUS_SUCCESS:
+            self._trigger_dependents(log)
+        else:
+            self._schedule_retry(log)
+
+    def _fan_out(self, log_id):
+        """Split a claimed run into ``shard_count`` child runs on the worker pool
+
+        Each shard gets ``shard_index`` and ``shard_count`` added to its
+        arguments, which ``build_command_string`` turns into ``--shard-index``
+        and ``--shard-count``. The parent run stays running until the last
+        shard finishes (see ``_finish_shard``).
+        """
+        parent = CommandLog.objects.get(pk=log_id)
+        parent.output = f"Running as {self.shard_count} shards\n"
+        parent.save(update_fields=['output'])
+
+        now = timezone.now()
+        shards = CommandLog.create_all([
+            CommandLog(
+                command_name=parent.command_name,
+                app_name=parent.app_name,
+                arguments={**parent.arguments, 'shard_index': index, 'shard_count': self.shard_count},
+                parent=parent,
+                shard_index=index,
+                pipeline_root_id=parent.pipeline_root_id,
+                # Due right away, so run_jobs picks them up if this process dies
+                scheduled_for=now,
+                heartbeat_at=now,
+                trigger=parent.trigger,
+            )
+            for index in range(self.shard_count)
+        ])
+
+        for shard in shards:
+            command = self.build_command_string(self.command_name, shard.arguments)
+            try:
+                _submit_to_pool(self._execute_command, command, shard.pk, shard=True)
+            except RuntimeError:
+                # Interpreter is shutting down; the next run_jobs tick starts it
+                pass
+
+    def _finish_shard(self, shard):
+        """Complete the parent run once all of its shards have finished"""
+        with transaction.atomic():
+            parent = CommandLog.objects.select_for_update().get(pk=shard.parent_id)
+            if parent.is_finished:
+                return
+            statuses = dict(parent.shards.values_list('shard_index', 'status'))
+            if any(status not in CommandLog.FINISHED_STATUSES for status in statuses.values()):
+                return
+
+            failed = sorted(index for index, status in statuses.items() if status != CommandLog.STATUS_SUCCESS)
+            output = (parent.output or '') + f"{len(statuses) - len(failed)}/{len(statuses)} shards succeeded\n"
+            if failed:
+                parent.set_failure(output + f"Failed shards: {', '.join(map(str, failed))}\n")
+            else:
+                parent.set_success(output)
+
+        self._after_run(parent)
+
+    def _execute_command(self, command, log_id, shard=False):
+        """Execute the command in a separate thread with real-time output
+
+        ``shard`` is set for the per-shard child runs of a fanned-out run.
+        """
+        # Count the database writes the runner issues for the metrics endpoint
+        with connection.execute_wrapper(metrics.count_db_writes):
+            self._run_command(command, log_id, shard)
+
+    def _run_command(self, command, log_id, shard):
+        trace = tracing.Trace(**{'django_jobs.command': self.command_name, 'django_jobs.log_id': log_id})
+        claimed = False
+        log = None
+        _leave_pool(log_id)
+        try:
+            # A run whose inputs have not changed is skipped before it takes a slot
+            if self.skip_if_unchanged and not shard:
+                with trace.span('memo_check'):
+                    log = self._skip_if_unchanged(log_id)
+                if log is not None:
+                    return
+
+            # Claim the run; it may be skipped or queued by a concurrency limit,
+            # or already have been picked up by another runner. Shards were
+            # admitted together with their parent run.
+            with trace.span('claim') as claim_span:
+                claimed = self._claim_run(log_id, enforce_limits=not shard)
+            if not claimed:
+                return
+
+            if self.shard_count > 1 and not shard:
+                with trace.span('fan_out'):
+                    self._fan_out(log_id)
+                return
+
+            # Get a fresh log object, with the parent run whose checkpoints a shard uses
+            log = CommandLog.objects.select_related('parent').get(pk=log_id)
+            if log.scheduled_for is not None:
+                due = int(log.scheduled_for.timestamp() * 1e9)
+                trace.add('queue_wait', min(due, claim_span.start), claim_span.start)
             log.output = f"Starting command: {command}\n"
             log.save()
 
             try:
-                # Start process with pipe for stdout and stderr
-                process = subprocess.Popen(
-                    shlex.split(command),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    bufsize=1,  # Line buffered
-                    universal_newlines=False  # Binary mode
-                )
+                # The command sends structured progress over its own pipe
+                progress = ProgressReader()
+                env = progress.child_env()
+                # Tells the command where its checkpoints are and whether it is a retry
+                env.update(checkpoints.child_env(self, log))
+                profile_path = self._take_profile_request()
+                if profile_path:
+                    env[debugging.PROFILE_ENV_VAR] = profile_path
+                try:
+                    # Start process with pipe for stdout and stderr
+                    # The child gets its own session (and process group) so a
+                    # timeout can take down everything it spawned
+                    with trace.span('spawn') as spawn_span:
+                        process = subprocess.Popen(
+                            limit_command(shlex.split(command), self.memory_limit_mb, self.cpu_time_limit),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=False,  # Binary mode (line buffering is not supported)
+                            start_new_session=True,
+                            pass_fds=(progress.write_fd,),
+                            env=env,
+                        )
+                except BaseException:
+                    progress.close()
+                    raise
+                finally:
+                    progress.started()
+                CommandLog.objects.filter(pk=log_id).update(pid=process.pid, heartbeat_at=timezone.now())
 
-                # Stream and capture output
-                stdout_content, stderr_content = self._stream_output(process, log_id)
+                # Stream and capture output, collecting resource usage as we go
+                monitor = ResourceMonitor(process)
+                deadline = Deadline(process, self.timeout, self.kill_grace_period)
+                try:
+                    stdout_content, stderr_content = self._stream_output(
+                        process, log_id, monitor, deadline, progress, trace)
+                finally:
+                    progress.close()
+                deadline.cleanup()
+                self._trace_process(trace, spawn_span, progress, process.pid)
 
                 # Get the final exit code
                 return_code = process.poll()
@@ -229,16 +889,31 @@ class CommandSchedule(models.Model):
                 output = f"STDOUT:\n{stdout_content}\n\nSTDERR:\n{stderr_content}"
 
                 # Update the log with final results
-                log = CommandLog.objects.get(pk=log_id)
+                with trace.span('final_db_write'):
+                    log = CommandLog.objects.get(pk=log_id)
+                    log.record_usage(monitor.usage_fields())
+                    for field, value in progress.fields().items():
+                        setattr(log, field, value)
+                    if profile_path:
+                        log.profile = self._collect_profile(profile_path)
+                    log.exit_code = return_code
 
-                if return_code == 0:
-                    log.set_success(output)
-                else:
-                    log.set_failure(output)
+                    if deadline.cancelled:
+                        log.set_cancelled(output + "\n\nCancelled")
+                    elif deadline.timed_out:
+                        log.set_timeout(output + f"\n\nTerminated after exceeding timeout of {self.timeout}s")
+                    elif return_code == 0:
+                        log.set_success(output)
+                    else:
+                        log.set_failure(output)
+
+                with trace.span('follow_up'):
+                    self._after_run(log)
 
             except Exception as e:
                 error_text = f"Error running command: {str(e)}\n{traceback.format_exc()}"
                 log.set_failure(error_text)
+                self._after_run(log)
 
         except Exception as e:
             # Handle any exceptions
@@ -251,59 +926,73 @@ class CommandSchedule(models.Model):
                 print(f"CRITICAL ERROR: Could not update log {log_id}: {str(inner_e)}")
                 print(error_text)
 
-    def run_job(self):
-        """Create log entry and run job synchronously"""
-        log = CommandLog(
-            command_name=self.command_name,
-            app_name=self.app_name,
-            arguments=self.arguments,
-        )
-        log.save()
-
-        try:
-            # Build the command string using the utility method
-            command = self.build_command_string(self.command_name, self.arguments)
+        finally:
+            # Skipped runs are traced too; their log is set without a claim
+            if claimed or log is not None:
+                self._export_trace(trace, log)
 
-            result = subprocess.run(
-                shlex.split(command),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            output = result.stdout.decode('utf-8') + result.stderr.decode('utf-8')
+    def _trace_process(self, trace, spawn_span, progress, pid):
+        """Add the spans of the command's process, including those it timed itself"""
+        flush_span = trace.get('output_flush')
+        process_span = trace.add('process', spawn_span.end, flush_span.start if flush_span else time.time_ns(),
+                                 **{'process.pid': pid})
+        handle = progress.spans.get('handle')
+        if handle:
+            trace.add('django_setup', spawn_span.end, handle[0], parent=process_span)
+            trace.add('handle', handle[0], handle[1], parent=process_span)
 
-            if result.returncode == 0:
-                log.set_success(output)
-            else:
-                log.set_failure(output)
-        except Exception as e:
-            output = str(e)
-            log.set_failure(output)
+    def _export_trace(self, trace, log):
+        if log is not None:
+            trace.finish(**{
+                'django_jobs.status': log.get_status_display(),
+                'django_jobs.trigger': log.trigger,
+                'django_jobs.exit_code': log.exit_code,
+                'django_jobs.shard_index': log.shard_index,
+                'django_jobs.attempt': log.attempt,
+            })
+        else:
+            trace.finish()
+        tracing.export(trace)
 
-        return log.pk
+    def run_job(self, trigger=None, scheduled_for=None):
+        """Create log entry and run job synchronously
 
-    def run_job_async(self):
-        """Run the job asynchronously in a separate thread"""
-        # Create the log entry first
+        ``trigger`` and ``scheduled_for`` default to a manual run due now.
+        """
         log = CommandLog(
             command_name=self.command_name,
             app_name=self.app_name,
             arguments=self.arguments,
+            trigger=trigger or CommandLog.TRIGGER_MANUAL,
+            scheduled_for=scheduled_for or timezone.now(),
         )
         log.save()
 
         # Build the command string using the utility method
         command = self.build_command_string(self.command_name, self.arguments)
+        self._execute_command(command, log.pk)
 
-        # Start a new thread to execute the command
-        thread = threading.Thread(
-            target=self._execute_command,
-            args=(command, log.pk)
-        )
-        thread.daemon = True  # Make the thread a daemon so it doesn't block program exit
-        thread.start()
+        return log.pk
 
+    def defer_job(self, fire_time):
+        """Create a pending run due at ``fire_time`` plus a random jitter
+
+        ``run_jobs`` starts it once it is due. Returns the log id.
+        """
+        delay = random.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0
+        log = CommandLog.objects.create(
+            command_name=self.command_name,
+            app_name=self.app_name,
+            arguments=self.arguments,
+            scheduled_for=fire_time + timedelta(seconds=delay),
+            trigger=CommandLog.TRIGGER_CRON,
+        )
         return log.pk
 
+    def run_job_async(self, trigger=None, scheduled_for=None):
+        """Run the job asynchronously on the shared worker pool"""
+        return self.enqueue_jobs([self], trigger=trigger, scheduled_for=scheduled_for)[0]
+
     def get_available_arguments(self):
         """
         Introspect the command to get available arguments
@@ -355,14 +1044,42 @@ class CommandLog(models.Model):
     STATUS_RUNNING = 'R'
     STATUS_SUCCESS = 'S'
     STATUS_FAILURE = 'F'
+    STATUS_TIMEOUT = 'T'
+    STATUS_SKIPPED = 'K'
+    STATUS_CANCELLED = 'C'
+    STATUS_LOST = 'L'
 
     STATUS_CHOICES = (
         (STATUS_PENDING, 'Pending'),
         (STATUS_RUNNING, 'Running'),
         (STATUS_SUCCESS, 'Success'),
         (STATUS_FAILURE, 'Failure'),
+        (STATUS_TIMEOUT, 'Timed out'),
+        (STATUS_SKIPPED, 'Skipped'),
+        (STATUS_CANCELLED, 'Cancelled'),
+        (STATUS_LOST, 'Lost'),
+    )
+
+    TRIGGER_CRON = 'cron'
+    TRIGGER_MANUAL = 'manual'
+    TRIGGER_RETRY = 'retry'
+    TRIGGER_EVENT = 'event'
+    TRIGGER_WORKFLOW = 'workflow'
+
+    TRIGGER_CHOICES = (
+        (TRIGGER_CRON, 'Cron schedule'),
+        (TRIGGER_MANUAL, 'Manual'),
+        (TRIGGER_RETRY, 'Retry'),
+        (TRIGGER_EVENT, 'Event trigger'),
+        (TRIGGER_WORKFLOW, 'Workflow step'),
     )
 
+    # Statuses after which the run will not change anymore
+    FINISHED_STATUSES = (STATUS_SUCCESS, STATUS_FAILURE, STATUS_TIMEOUT, STATUS_SKIPPED, STATUS_CANCELLED,
+                         STATUS_LOST)
+    # Finished statuses whose duration is the real run time of the command
+    TIMED_STATUSES = (STATUS_SUCCESS, STATUS_FAILURE, STATUS_TIMEOUT, STATUS_CANCELLED)
+
     command_name = models.CharField(max_length=255)
     app_name = models.CharField(max_length=255, null=True, blank=True)
     arguments = models.JSONField(default=dict, blank=True, 
@@ -374,15 +1091,150 @@ class CommandLog(models.Model):
     output = models.TextField(null=True, blank=True)
     status = models.CharField(
         max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    exit_code = models.IntegerField(null=True, blank=True)
+    attempt = models.PositiveIntegerField(default=1)
+    retry_of = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='retries',
+        help_text='First attempt of the run this log retries')
+    parent = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.CASCADE, related_name='shards',
+        help_text='Run this shard belongs to')
+    shard_index = models.PositiveIntegerField(null=True, blank=True)
+    pipeline_root = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='pipeline_runs',
+        help_text='Run that started the workflow this run is part of')
+    scheduled_for = models.DateTimeField(
+        null=True, blank=True, help_text='When the run was due to start; run_jobs picks up pending runs that are due')
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, default=TRIGGER_MANUAL, blank=True,
+                               help_text='What started the run (empty for runs recorded before this was tracked)')
+    concurrency_key = models.CharField(max_length=100, blank=True, default='',
+                                       help_text='Shared concurrency limit held by this run')
+    cancel_requested = models.BooleanField(default=False)
+    stack_dump_requested = models.BooleanField(
+        default=False, help_text='Set from the admin; the runner signals the command to dump its stacks to stderr')
+    profile = models.TextField(blank=True, default='', help_text='cProfile stats of a profiled run')
+    memo_key = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text='Hash of the command, arguments and fingerprint of a run of a "skip if unchanged" schedule')
+    triggered_by = models.ForeignKey(
+        'JobTrigger', null=True, blank=True, on_delete=models.SET_NULL, related_name='runs',
+        help_text='Trigger whose events started this run')
+
+    duration_anomaly = models.CharField(
+        max_length=4, blank=True, default='', choices=(('slow', 'Slower than usual'), ('fast', 'Faster than usual')),
+        help_text='Set when the duration is far outside the command\'s baseline')
+    duration_score = models.FloatField(
+        null=True, blank=True, help_text='Standard deviations of the (log) duration from the baseline')
+
+    # Latest update sent by the command with django_jobs.progress.report_progress
+    progress_done = models.PositiveBigIntegerField(null=True, blank=True, help_text='Units of work done')
+    progress_total = models.PositiveBigIntegerField(null=True, blank=True, help_text='Units of work in total')
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+
+    # Heartbeat written by the runner that owns the run
+    hostname = models.CharField(max_length=255, blank=True, default='')
+    pid = models.PositiveIntegerField(null=True, blank=True, help_text='Process id of the command on the runner host')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    # Resource usage of the command's process, as reported by os.wait4()
+    cpu_user_time = models.FloatField(null=True, blank=True, help_text='User CPU time in seconds')
+    cpu_system_time = models.FloatField(null=True, blank=True, help_text='System CPU time in seconds')
+    max_rss_kb = models.PositiveBigIntegerField(null=True, blank=True, help_text='Peak resident set size in KB')
+    io_read_blocks = models.PositiveBigIntegerField(null=True, blank=True)
+    io_write_blocks = models.PositiveBigIntegerField(null=True, blank=True)
+    voluntary_ctx_switches = models.PositiveBigIntegerField(null=True, blank=True)
+    involuntary_ctx_switches = models.PositiveBigIntegerField(null=True, blank=True)
+    resource_samples = models.JSONField(
+        default=list, blank=True,
+        help_text='Samples taken while running as [elapsed seconds, RSS KB, CPU seconds]')
 
     class Meta:
         verbose_name = "Command Log"
         verbose_name_plural = "Command Logs"
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['status', 'command_name'], name='django_jobs_status_cmd_idx'),
+            models.Index(fields=['status', 'concurrency_key'], name='django_jobs_status_key_idx'),
+            models.Index(fields=['status', 'heartbeat_at'], name='django_jobs_status_hb_idx'),
+            models.Index(fields=['status', 'scheduled_for'], name='django_jobs_status_sched_idx'),
+            # run_jobs looks up the runs started since the earliest due time
+            models.Index(fields=['started_at'], name='django_jobs_started_idx'),
+        ]
 
     def __str__(self):
         return f"{self.command_name} ({self.started_at})"
 
+    @classmethod
+    def create_all(cls, logs):
+        """Insert ``logs`` and return them with their primary keys set
+
+        Uses one ``bulk_create`` where the database returns the keys of bulk
+        inserted rows. Elsewhere (MySQL, or SQLite before Django 4.0) the
+        logs are created one by one in a single transaction.
+        """
+        using = router.db_for_write(cls)
+        if connections[using].features.can_return_rows_from_bulk_insert:
+            return cls.objects.using(using).bulk_create(logs)
+        with transaction.atomic(using=using):
+            for log in logs:
+                log.save(using=using, force_insert=True)
+        return logs
+
+    @classmethod
+    def reap_stale(cls, stale_after=None):
+        """Mark running logs whose runner stopped sending heartbeats as lost
+
+        Stale runs are found with one query over the (status, heartbeat_at)
+        index and marked with one conditional update. Process groups of the
+        marked runs that were started on this host are killed if their
+        process is still the one the run started. Returns the list of reaped
+        logs.
+        """
+        if stale_after is None:
+            stale_after = getattr(settings, 'DJANGO_JOBS_HEARTBEAT_TIMEOUT', 60)
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=stale_after)
+
+        no_heartbeat = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        stale = cls.objects.filter(no_heartbeat, status=cls.STATUS_RUNNING).exclude(
+            # A fanned-out parent has no process of its own; it is alive while its shards are
+            pk__in=cls.objects.filter(
+                parent__isnull=False,
+                status__in=[cls.STATUS_PENDING, cls.STATUS_RUNNING],
+            ).values('parent_id'))
+        candidates = list(stale.values_list('pk', flat=True))
+        if not candidates:
+            return []
+
+        # Re-check staleness in the update so a runner that just came back wins,
+        # and only act on the runs that this update marked
+        cls.objects.filter(no_heartbeat, status=cls.STATUS_RUNNING, pk__in=candidates).update(
+            status=cls.STATUS_LOST,
+            ended_at=now,
+            duration=ExpressionWrapper(
+                Value(now, output_field=DateTimeField()) - F('started_at'), output_field=DurationField()),
+        )
+        reaped = list(cls.objects.filter(pk__in=candidates, status=cls.STATUS_LOST, ended_at=now))
+
+        hostname = socket.gethostname()
+        for log in reaped:
+            # The pid may have been reused since the runner died (or the host rebooted)
+            if log.pid and log.hostname == hostname and is_job_process(log.pid, log.started_at):
+                try:
+                    is_group_leader = os.getpgid(log.pid) == log.pid
+                except ProcessLookupError:
+                    is_group_leader = False
+                if is_group_leader:
+                    kill_group(log.pid, signal.SIGKILL)
+            metrics.runs_total.inc(log.command_name, 'lost')
+        stats.record_runs(reaped)
+        return reaped
+
+    def record_usage(self, usage):
+        """Store resource usage figures (see ``ResourceMonitor.usage_fields``)"""
+        for field, value in usage.items():
+            setattr(self, field, value)
+
     def set_running(self):
         self.status = self.STATUS_RUNNING
         self.save()
@@ -390,7 +1242,18 @@ class CommandLog(models.Model):
     def end(self):
         self.ended_at = timezone.now()
         self.duration = self.ended_at - self.started_at
+        try:
+            # Flags the run before it is saved
+            DurationBaseline.observe(self)
+        except Exception as e:
+            print(f"Error updating duration baseline for log {self.pk}: {str(e)}")
         self.save()
+        metrics.record_finished_run(self)
+        try:
+            stats.record_run(self)
+        except Exception as e:
+            # Statistics must never turn a finished run into a failed one
+            print(f"Error updating statistics for log {self.pk}: {str(e)}")
 
     def set_success(self, output):
         self.status = self.STATUS_SUCCESS
@@ -400,4 +1263,364 @@ class CommandLog(models.Model):
     def set_failure(self, output):
         self.status = self.STATUS_FAILURE
         self.output = output
-        self.end()
\ No newline at end of file
+        self.end()
+
+    def set_timeout(self, output):
+        self.status = self.STATUS_TIMEOUT
+        self.output = output
+        self.end()
+
+    def set_skipped(self, output):
+        self.status = self.STATUS_SKIPPED
+        self.output = output
+        self.end()
+
+    def set_cancelled(self, output):
+        self.status = self.STATUS_CANCELLED
+        self.output = output
+        self.end()
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def lag(self):
+        """How late the run started compared to when it was due, or None"""
+        if self.scheduled_for is None or self.status in (self.STATUS_PENDING, self.STATUS_SKIPPED):
+            return None
+        return max(self.started_at - self.scheduled_for, timedelta(0))
+
+    @property
+    def progress_percent(self):
+        """Reported progress in percent, or None if the command reports no total"""
+        if not self.progress_total or self.progress_done is None:
+            return None
+        return min(100, round(100 * self.progress_done / self.progress_total))
+
+    def estimate_remaining(self, typical_duration=None, now=None):
+        """Estimated time left for a running run as a timedelta, or None
+
+        Once the command has reported some progress towards a total, the rate
+        so far is extrapolated. Before that the command's typical duration
+        from its ``DurationBaseline`` is used; it is looked up unless given
+        (in seconds, 0 for a command without a baseline). None once a run has
+        outlasted its typical duration.
+        """
+        if self.status != self.STATUS_RUNNING:
+            return None
+        elapsed = ((now or timezone.now()) - self.started_at).total_seconds()
+
+        if self.progress_done and self.progress_total:
+            remaining = max(self.progress_total - self.progress_done, 0)
+            return timedelta(seconds=elapsed * remaining / self.progress_done)
+
+        if typical_duration is None:
+            baseline = DurationBaseline.objects.filter(command_name=self.command_name).first()
+            typical_duration = baseline.typical_duration if baseline else None
+        if not typical_duration or elapsed > typical_duration:
+            return None
+        return timedelta(seconds=typical_duration - elapsed)
+
+
+class CommandStats(models.Model):
+    """Finished runs of one command in one hour, maintained by ``stats.record_run``"""
+    # Counter field for each final status
+    STATUS_FIELDS = {
+        'S': 'success_count',
+        'F': 'failure_count',
+        'T': 'timeout_count',
+        'K': 'skipped_count',
+        'C': 'cancelled_count',
+        'L': 'lost_count',
+    }
+    # Fields summed when hours are combined
+    COUNTER_FIELDS = tuple(STATUS_FIELDS.values()) + ('duration_count', 'duration_sum', 'lag_count', 'lag_sum')
+
+    command_name = models.CharField(max_length=255)
+    hour = models.DateTimeField(help_text='Start of the hour the runs started in')
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    timeout_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    lost_count = models.PositiveIntegerField(default=0)
+    duration_count = models.PositiveIntegerField(default=0, help_text='Runs included in the duration figures')
+    duration_sum = models.FloatField(default=0, help_text='Seconds')
+    duration_min = models.FloatField(null=True, blank=True, help_text='Seconds')
+    duration_max = models.FloatField(null=True, blank=True, help_text='Seconds')
+    duration_sketch = models.JSONField(default=dict, blank=True, help_text='Duration histogram for percentiles')
+    lag_count = models.PositiveIntegerField(default=0)
+    lag_sum = models.FloatField(default=0, help_text='Seconds')
+    lag_max = models.FloatField(null=True, blank=True, help_text='Seconds')
+
+    class Meta:
+        verbose_name = "Command Statistics"
+        verbose_name_plural = "Command Statistics"
+        ordering = ['-hour', 'command_name']
+        constraints = [
+            models.UniqueConstraint(fields=['command_name', 'hour'], name='django_jobs_stats_cmd_hour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='django_jobs_stats_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.command_name} ({self.hour})"
+
+    def add_run(self, status, duration=None, lag=None):
+        """Count a run with the given final status, duration and start delay (timedeltas)"""
+        field = self.STATUS_FIELDS[status]
+        setattr(self, field, getattr(self, field) + 1)
+
+        if duration is not None:
+            seconds = duration.total_seconds()
+            self.duration_count += 1
+            self.duration_sum += seconds
+            self.duration_min = seconds if self.duration_min is None else min(self.duration_min, seconds)
+            self.duration_max = seconds if self.duration_max is None else max(self.duration_max, seconds)
+            sketch = stats.DurationSketch(self.duration_sketch)
+            sketch.add(seconds)
+            self.duration_sketch = sketch.to_json()
+
+        if lag is not None:
+            seconds = lag.total_seconds()
+            self.lag_count += 1
+            self.lag_sum += seconds
+            self.lag_max = seconds if self.lag_max is None else max(self.lag_max, seconds)
+
+
+class DurationBaseline(models.Model):
+    """Rolling baseline of a command's successful run durations
+
+    Durations are compared on a log scale, where "twice as slow" is the same
+    distance for a 2 second and a 2 hour job. ``mean`` and ``variance`` are
+    exponentially weighted with ``DJANGO_JOBS_BASELINE_ALPHA`` (default 0.1),
+    so the baseline follows the last few dozen runs. ``long_mean`` moves ten
+    times slower; the ratio between the two (``trend``) exposes a job that
+    gets slower gradually, which per-run flags miss because the baseline
+    drifts along with it.
+    """
+    # A spread below 10% is treated as 10%, so very steady jobs are not flagged for noise
+    MIN_STDDEV = math.log(1.1)
+
+    command_name = models.CharField(max_length=255, unique=True)
+    runs = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0, help_text='Weighted mean of the log duration in seconds')
+    variance = models.FloatField(default=0, help_text='Weighted variance of the log duration')
+    long_mean = models.FloatField(default=0, help_text='Slow moving mean of the log duration')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Duration Baseline"
+        verbose_name_plural = "Duration Baselines"
+        ordering = ['command_name']
+
+    def __str__(self):
+        return self.command_name
+
+    @property
+    def typical_duration(self):
+        """Typical duration in seconds (the geometric mean of recent runs)"""
+        return math.exp(self.mean) if self.runs else None
+
+    @property
+    def trend(self):
+        """Recent typical duration divided by the long-term one"""
+        return math.exp(self.mean - self.long_mean) if self.runs else None
+
+    @property
+    def regressed(self):
+        threshold = getattr(settings, 'DJANGO_JOBS_REGRESSION_RATIO', 1.5)
+        return self.runs >= self._min_runs() and self.trend >= threshold
+
+    @staticmethod
+    def _min_runs():
+        return getattr(settings, 'DJANGO_JOBS_BASELINE_MIN_RUNS', 10)
+
+    def score(self, seconds):
+        """Distance of a duration from the baseline in standard deviations, or None while warming up"""
+        if self.runs < self._min_runs():
+            return None
+        stddev = max(math.sqrt(self.variance), self.MIN_STDDEV)
+        return (math.log(max(seconds, 0.001)) - self.mean) / stddev
+
+    def add(self, seconds):
+        """Fold a duration into the baseline"""
+        value = math.log(max(seconds, 0.001))
+        self.runs += 1
+        if self.runs == 1:
+            self.mean = self.long_mean = value
+            self.variance = 0
+            return
+        # Plain averages until there are enough runs for the weights to make sense
+        alpha = max(getattr(settings, 'DJANGO_JOBS_BASELINE_ALPHA', 0.1), 1 / self.runs)
+        long_alpha = max(alpha / 10, 1 / self.runs)
+        diff = value - self.mean
+        self.mean += alpha * diff
+        self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+        self.long_mean += long_alpha * (value - self.long_mean)
+
+    @classmethod
+    def observe(cls, log):
+        """Flag a finished run that is unusually slow or fast and update the baseline
+
+        Only successful runs are used; failures often stop early. Shards are
+        left out, their parent run is measured instead. Sets
+        ``duration_anomaly`` and ``duration_score`` on ``log`` without saving it.
+        """
+        if log.status != CommandLog.STATUS_SUCCESS or log.parent_id or log.duration is None:
+            return
+
+        seconds = log.duration.total_seconds()
+        with transaction.atomic():
+            baseline, _ = cls.objects.select_for_update().get_or_create(command_name=log.command_name)
+            score = baseline.score(seconds)
+            baseline.add(seconds)
+            baseline.save()
+
+        log.duration_score = score
+        threshold = getattr(settings, 'DJANGO_JOBS_ANOMALY_THRESHOLD', 3.0)
+        if score is not None and abs(score) >= threshold:
+            log.duration_anomaly = 'slow' if score > 0 else 'fast'
+            metrics.duration_anomalies_total.inc(log.command_name, log.duration_anomaly)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every baseline from the successful runs still in ``CommandLog``"""
+        baselines = {}
+        for command_name, duration in CommandLog.objects.filter(
+            status=CommandLog.STATUS_SUCCESS, parent__isnull=True, duration__isnull=False,
+        ).order_by('started_at').values_list('command_name', 'duration').iterator():
+            baseline = baselines.setdefault(command_name, cls(command_name=command_name))
+            baseline.add(duration.total_seconds())
+
+        with transaction.atomic():
+            cls.objects.filter(command_name__in=list(baselines)).delete()
+            cls.objects.bulk_create(baselines.values())
+        return len(baselines)
+
+
+class JobTrigger(models.Model):
+    """Starts a schedule's command when something happens instead of on a clock
+
+    Events are coalesced: the first event creates a pending run due after the
+    debounce window, and every event until that run starts is folded into it.
+    A burst of thousands of events therefore yields a single run.
+    """
+    KIND_MODEL = 'model'
+    KIND_FILE = 'file'
+    KIND_HTTP = 'http'
+
+    KIND_CHOICES = (
+        (KIND_MODEL, 'Model saved or deleted'),
+        (KIND_FILE, 'File appears in a directory'),
+        (KIND_HTTP, 'HTTP ping'),
+    )
+
+    # Pending run each schedule's events are currently folded into, per process,
+    # as {schedule id: (log id, scheduled_for)}. Saves a query per event in a burst.
+    _armed = {}
+
+    schedule = models.ForeignKey(CommandSchedule, on_delete=models.CASCADE, related_name='triggers')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    active = models.BooleanField(default=True)
+    debounce_seconds = models.PositiveIntegerField(
+        default=10, help_text='Wait this long after the first event before running, folding later events into the same run')
+    model = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text='Model as "app_label.ModelName"; runs when an instance is saved or deleted')
+    path = models.CharField(
+        max_length=1024, blank=True, default='', help_text='Directory watched by run_jobs for new or changed files')
+    pattern = models.CharField(
+        max_length=255, blank=True, default='*', help_text='Only files matching this pattern count, e.g. *.csv')
+    seen_files = models.JSONField(
+        default=dict, blank=True, editable=False,
+        help_text='Modification time of each matching file already handled, by name')
+    token = models.CharField(
+        max_length=64, blank=True, default='', editable=False,
+        help_text='Secret part of the HTTP ping URL')
+
+    class Meta:
+        verbose_name = "Job Trigger"
+        verbose_name_plural = "Job Triggers"
+
+    def __str__(self):
+        return f"{self.schedule.command_name}: {self.get_kind_display()}"
+
+    def clean(self):
+        super().clean()
+        if self.kind == self.KIND_MODEL:
+            from django.apps import apps
+            try:
+                apps.get_model(self.model)
+            except (LookupError, ValueError):
+                raise ValidationError({'model': 'Enter an installed model as "app_label.ModelName"'})
+        if self.kind == self.KIND_FILE and not self.path:
+            raise ValidationError({'path': 'Enter the directory to watch'})
+
+    def save(self, *args, **kwargs):
+        if self.kind == self.KIND_HTTP and not self.token:
+            self.token = secrets.token_urlsafe(32)
+        super().save(*args, **kwargs)
+
+    def fire(self, now=None):
+        """Record an event and return the id of the pending run that will handle it
+
+        Returns None if the schedule is gone or inactive.
+        """
+        now = now or timezone.now()
+        armed = self._armed.get(self.schedule_id)
+        if armed and armed[1] > now:
+            # That run has not started yet, so it will see whatever caused this event
+            return armed[0]
+
+        with transaction.atomic():
+            # Serialize events for the schedule so concurrent bursts create one run
+            schedule = CommandSchedule.objects.select_for_update().filter(pk=self.schedule_id, active=True).first()
+            if schedule is None:
+                return None
+            log = CommandLog.objects.filter(
+                command_name=schedule.command_name,
+                status=CommandLog.STATUS_PENDING,
+                triggered_by__isnull=False,
+            ).order_by('scheduled_for').first()
+            if log is None:
+                log = CommandLog.objects.create(
+                    command_name=schedule.command_name,
+                    app_name=schedule.app_name,
+                    arguments=schedule.arguments,
+                    scheduled_for=now + timedelta(seconds=self.debounce_seconds),
+                    trigger=CommandLog.TRIGGER_EVENT,
+                    triggered_by=self,
+                )
+
+        self._armed[self.schedule_id] = (log.pk, log.scheduled_for)
+        return log.pk
+
+
+class Checkpoint(models.Model):
+    """A value a command saved to resume from if its run fails (see checkpoints.py)
+
+    There is one row per schedule and key. ``run`` is the first attempt of
+    the run that saved it; only attempts of that run read the value, and
+    the next run overwrites it.
+    """
+    schedule = models.ForeignKey(CommandSchedule, on_delete=models.CASCADE, related_name='checkpoints')
+    key = models.CharField(max_length=255)
+    value = models.JSONField(null=True, blank=True)
+    run = models.ForeignKey(
+        CommandLog, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+        help_text='First attempt of the run that saved the checkpoint')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Checkpoint"
+        verbose_name_plural = "Checkpoints"
+        ordering = ['schedule', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'key'], name='django_jobs_checkpoint_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.schedule.command_name}: {self.key}"
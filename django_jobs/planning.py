@@ -0,0 +1,270 @@
+"""Capacity planning helpers based on the run history in ``CommandLog``.
+
+The forecaster expands schedules over a precomputed grid of minutes. Each
+value of each cron field (minute 0-59, hour 0-23, ...) is turned into a
+bitmask over the grid once, so expanding a schedule is a handful of integer
+OR/AND operations instead of iterating croniter minute by minute. That keeps
+forecasting thousands of schedules in the millisecond range.
+"""
+import math
+from datetime import timedelta
+from statistics import median
+
+from croniter import croniter
+from django.utils import timezone
+
+from .models import CommandLog
+
+MINUTES_PER_HOUR = 60
+HOURS_PER_DAY = 24
+MINUTES_PER_DAY = HOURS_PER_DAY * MINUTES_PER_HOUR
+
+
+def median_durations(command_names, days=14):
+    """Return ``{command_name: median duration in seconds}`` over recent successful runs
+
+    Commands without history are left out.
+    """
+    since = timezone.now() - timedelta(days=days)
+    durations = {}
+    for command_name, duration in CommandLog.objects.filter(
+        command_name__in=list(command_names),
+        status=CommandLog.STATUS_SUCCESS,
+        started_at__gte=since,
+        duration__isnull=False,
+        parent__isnull=True,
+    ).values_list('command_name', 'duration').iterator():
+        durations.setdefault(command_name, []).append(duration.total_seconds())
+
+    return {name: median(values) for name, values in durations.items()}
+
+
+def run_minutes(duration_seconds):
+    """Number of whole minutes a run of the given duration overlaps"""
+    return max(1, math.ceil(duration_seconds / 60))
+
+
+def minutes_occupied(duration_seconds):
+    """``run_minutes`` capped at an hour, for placing runs within the hour"""
+    return min(MINUTES_PER_HOUR, run_minutes(duration_seconds))
+
+
+def spread_minutes(movable, fixed_load=None):
+    """Assign start minutes that keep the peak number of concurrent jobs low
+
+    ``movable`` is a list of ``(key, current_minute, duration_seconds, hours)``
+    where ``hours`` are the hours of the day the job starts in, or None for
+    every hour. ``fixed_load`` is a list with the number of jobs that already
+    run in each minute of the day (``hour * 60 + minute``) and cannot be moved.
+    Jobs only compete if they run in the same hour.
+
+    Longest jobs are placed first (greedy bin-packing), each in the window of
+    minutes where the busiest minute is least busy. Ties go to the window with
+    the least total load, then to the minute closest to the current one.
+
+    Returns ``(assignments, load)`` where ``assignments`` maps each key to its
+    new minute and ``load`` is the resulting per-minute load over the day.
+    """
+    load = list(fixed_load) if fixed_load else [0] * MINUTES_PER_DAY
+    assignments = {}
+
+    for key, current_minute, duration, hours in sorted(movable, key=lambda job: -job[2]):
+        span = minutes_occupied(duration)
+        hour_starts = [hour * MINUTES_PER_HOUR for hour in sorted(set(
+            range(HOURS_PER_DAY) if hours is None else hours))]
+
+        def occupied(start):
+            return [(hour_start + start + offset) % MINUTES_PER_DAY
+                    for hour_start in hour_starts for offset in range(span)]
+
+        def cost(start):
+            window = [load[index] for index in occupied(start)]
+            distance = min((start - current_minute) % MINUTES_PER_HOUR,
+                           (current_minute - start) % MINUTES_PER_HOUR)
+            return max(window), sum(window), distance
+
+        best = min(range(MINUTES_PER_HOUR), key=cost)
+        for index in occupied(best):
+            load[index] += 1
+        assignments[key] = best
+
+    return assignments, load
+
+
+class MinuteGrid:
+    """Bitmask index over every minute in a forecast window"""
+
+    # croniter field positions: minute, hour, day, month, day of week
+    FIELDS = ('minute', 'hour', 'day', 'month', 'day_of_week')
+
+    def __init__(self, start, minutes):
+        self.start = start.replace(second=0, microsecond=0)
+        self.size = minutes
+        self.all = (1 << minutes) - 1
+        self.masks = {field: {} for field in self.FIELDS}
+        self.epoch_minutes = []
+
+        for index in range(minutes):
+            moment = self.start + timedelta(minutes=index)
+            values = (moment.minute, moment.hour, moment.day, moment.month,
+                      # cron counts days of the week from Sunday = 0
+                      (moment.weekday() + 1) % 7)
+            bit = 1 << index
+            for field, value in zip(self.FIELDS, values):
+                self.masks[field][value] = self.masks[field].get(value, 0) | bit
+            self.epoch_minutes.append(int(moment.timestamp()) // 60)
+
+        self._cache = {}
+
+    def field_mask(self, field, values):
+        """Mask of the minutes where ``field`` takes any of ``values`` (``['*']`` for all)"""
+        if values == ['*']:
+            return self.all
+        key = (field, tuple(values))
+        if key not in self._cache:
+            mask = 0
+            for value in values:
+                if field == 'day_of_week' and value == 7:
+                    value = 0
+                mask |= self.masks[field].get(value, 0)
+            self._cache[key] = mask
+        return self._cache[key]
+
+    def indexes(self, mask):
+        """Yield the grid positions set in ``mask``"""
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def time_at(self, index):
+        return self.start + timedelta(minutes=index)
+
+
+def schedule_mask(schedule, grid):
+    """Return ``(mask, runs_per_minute)`` for the minutes a schedule fires in"""
+    if schedule.interval_seconds:
+        interval = schedule.interval_seconds
+        if interval < 60:
+            return grid.all, 60 // interval
+        mask = 0
+        for index, epoch_minute in enumerate(grid.epoch_minutes):
+            if (epoch_minute * 60) % interval < 60:
+                mask |= 1 << index
+        return mask, 1
+
+    expanded = croniter(schedule.get_cron_expression()).expanded
+    if any(not isinstance(value, int) for field in expanded[:5] for value in field if value != '*'):
+        # Special values such as "L" are rare; let croniter walk those
+        return _iterate_mask(schedule, grid), 1
+
+    minute, hour, day, month, day_of_week = (
+        grid.field_mask(field, values) for field, values in zip(MinuteGrid.FIELDS, expanded[:5]))
+    if expanded[2] != ['*'] and expanded[4] != ['*']:
+        # Cron runs when either the day of month or the day of week matches
+        days = day | day_of_week
+    else:
+        days = day & day_of_week
+
+    runs_per_minute = 1
+    if len(expanded) > 5 and schedule.schedule_second:
+        runs_per_minute = 60 if expanded[5] == ['*'] else len(expanded[5])
+    return minute & hour & days & month, runs_per_minute
+
+
+def _iterate_mask(schedule, grid):
+    mask = 0
+    cron = croniter(schedule.get_cron_expression(), grid.start - timedelta(seconds=1))
+    end = grid.time_at(grid.size)
+    while True:
+        fire_time = cron.get_next(ret_type=type(grid.start))
+        if fire_time >= end:
+            return mask
+        mask |= 1 << int((fire_time - grid.start).total_seconds() // 60)
+
+
+def forecast(schedules, start, hours, durations=None, default_duration=60):
+    """Project fire times and concurrency of ``schedules`` over the next ``hours``
+
+    ``durations`` maps command names to expected run time in seconds (see
+    ``median_durations``). Returns a dict with:
+
+    - ``commands``: per command the number of runs, expected duration and
+      first fire time
+    - ``load``: per minute of the window, the projected number of running jobs
+    - ``peaks``: the busiest minutes with the commands running in them
+    """
+    durations = durations or {}
+    grid = MinuteGrid(start, hours * 60)
+    # Runs starting at each minute, summed into the load once all schedules are in
+    starts = [0] * (grid.size + 1)
+    expanded = {}
+    placed = []
+    commands = []
+
+    for schedule in schedules:
+        # Fleets reuse a small set of expressions, so parse each one once
+        key = schedule.interval_seconds or schedule.get_cron_expression()
+        if key not in expanded:
+            expanded[key] = schedule_mask(schedule, grid)
+        mask, runs_per_minute = expanded[key]
+
+        duration = durations.get(schedule.command_name, default_duration)
+        span = run_minutes(duration)
+        # Runs started in the same minute overlap only if they outlast the gap between them
+        concurrent = runs_per_minute if runs_per_minute == 1 else min(
+            runs_per_minute, max(1, math.ceil(duration / (60 / runs_per_minute))))
+
+        fires = list(grid.indexes(mask))
+        placed.append((schedule.command_name, mask, span, fires, concurrent))
+
+        commands.append({
+            'command_name': schedule.command_name,
+            'runs': len(fires) * runs_per_minute,
+            'duration': duration,
+            'first_run': grid.time_at(fires[0]) if fires else None,
+        })
+
+    # Sized from the longest run, which may go on for hours past the window
+    ends = [0] * (grid.size + max((span for _, _, span, _, _ in placed), default=0) + 1)
+    for _, _, span, fires, concurrent in placed:
+        for index in fires:
+            starts[index] += concurrent
+            ends[index + span] += concurrent
+
+    load = []
+    current = 0
+    for index in range(grid.size):
+        current += starts[index] - ends[index]
+        load.append(current)
+
+    busiest = sorted(range(grid.size), key=lambda index: (-load[index], index))[:10]
+    peaks = []
+    for index in busiest:
+        if not load[index]:
+            break
+        # A schedule is running at ``index`` if it fired within its span before it
+        running = sorted({
+            name for name, mask, span, _, _ in placed
+            if (mask >> max(0, index - span + 1)) & ((1 << min(span, index + 1)) - 1)
+        })
+        peaks.append({'time': grid.time_at(index), 'load': load[index], 'commands': running})
+
+    return {
+        'start': grid.start,
+        'hours': hours,
+        'commands': sorted(commands, key=lambda item: -item['runs']),
+        'load': load,
+        'peaks': peaks,
+    }
+
+
+def hourly_summary(result):
+    """Summarise a forecast per hour as ``[(hour start, peak load, average load)]``"""
+    load = result['load']
+    return [
+        (result['start'] + timedelta(hours=hour),
+         max(load[hour * 60:(hour + 1) * 60]),
+         sum(load[hour * 60:(hour + 1) * 60]) / 60)
+        for hour in range(len(load) // 60)
+    ]
@@ -0,0 +1,152 @@
+"""Structured progress reporting from a running command to its runner.
+
+The runner gives every job the write end of a pipe and puts its file
+descriptor in ``DJANGO_JOBS_PROGRESS_FD``. ``report_progress`` writes one
+small JSON line per update to it; the runner keeps the latest update and
+stores it on the ``CommandLog`` together with the regular output update, so
+progress costs no extra database writes.
+
+Usage in a management command::
+
+    from django_jobs.progress import report_progress
+
+    for i, item in enumerate(items, 1):
+        process(item)
+        report_progress(i, len(items), f"Processed {item}")
+
+Outside of django-jobs (e.g. when the command is run by hand) the helper
+does nothing. Updates are throttled and never block: if the runner is slow
+to read, intermediate updates are dropped.
+"""
+import json
+import os
+import time
+
+ENV_VAR = 'DJANGO_JOBS_PROGRESS_FD'
+# Writes up to PIPE_BUF bytes are atomic, so lines never interleave
+MAX_MESSAGE_LENGTH = 200
+MIN_INTERVAL = 0.2
+# Largest value of the PositiveBigIntegerField progress columns
+MAX_COUNT = 2 ** 63 - 1
+
+_fd = None
+_last_sent = 0.0
+
+
+def _get_fd():
+    global _fd
+    if _fd is None:
+        # Removed from the environment so processes started by the command
+        # do not write to whatever has the same descriptor number there
+        value = os.environ.pop(ENV_VAR, None)
+        try:
+            _fd = int(value)
+            os.set_blocking(_fd, False)
+        except (TypeError, ValueError, OSError):
+            _fd = -1
+    return _fd
+
+
+def connected():
+    """Whether this process was started by the django-jobs runner"""
+    return _get_fd() >= 0
+
+
+def send(payload):
+    """Send one message to the runner; returns True if it was written"""
+    fd = _get_fd()
+    if fd < 0:
+        return False
+    try:
+        os.write(fd, (json.dumps(payload) + '\n').encode('utf-8'))
+    except OSError:
+        return False
+    return True
+
+
+def report_progress(done, total=None, message=''):
+    """Report that ``done`` out of ``total`` units of work are finished
+
+    Returns True if the update was sent to the runner.
+    """
+    global _last_sent
+    if not connected():
+        return False
+
+    now = time.monotonic()
+    finished = total is not None and done >= total
+    if not finished and now - _last_sent < MIN_INTERVAL:
+        return False
+
+    if not send({'done': done, 'total': total, 'message': str(message)[:MAX_MESSAGE_LENGTH]}):
+        return False
+    _last_sent = now
+    return True
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= MAX_COUNT
+
+
+class ProgressReader:
+    """Runner side of the channel: collects the latest update from the pipe"""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.latest = None
+        # Set once the command has installed its stack dump handler (see debugging.py)
+        self.stack_dumps = False
+        # {name: (start ns, end ns)} of spans timed in the command (see tracing.py)
+        self.spans = {}
+        self._buffer = b''
+
+    def child_env(self):
+        """Environment for the child process, which inherits ``write_fd``"""
+        return dict(os.environ, **{ENV_VAR: str(self.write_fd)})
+
+    def started(self):
+        """Close the parent's copy of the write end once the child has it"""
+        os.close(self.write_fd)
+
+    def poll(self):
+        """Read pending updates; returns the latest one or None if nothing new arrived"""
+        updated = False
+        while True:
+            try:
+                chunk = os.read(self.read_fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            self._buffer += chunk
+
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            try:
+                update = json.loads(line)
+                if update.get('stack_dumps'):
+                    self.stack_dumps = True
+                    continue
+                if 'span' in update:
+                    self.spans[update['span']] = (int(update['start']), int(update['end']))
+                    continue
+                done, total, message = update['done'], update.get('total'), update.get('message') or ''
+                # The command may send anything; invalid updates would fail the log update
+                if not _is_count(done) or not (total is None or _is_count(total)) or not isinstance(message, str):
+                    continue
+                self.latest = (done, total, message[:MAX_MESSAGE_LENGTH])
+                updated = True
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+        return self.latest if updated else None
+
+    def close(self):
+        os.close(self.read_fd)
+
+    def fields(self):
+        """``CommandLog`` field values for the latest update"""
+        if self.latest is None:
+            return {}
+        done, total, message = self.latest
+        return {'progress_done': done, 'progress_total': total, 'progress_message': message}
@@ -0,0 +1,132 @@
+"""Resource accounting for job subprocesses.
+
+The runner reaps its child with ``os.wait4`` so the kernel's rusage figures
+for that one child (CPU time, peak RSS, block I/O, context switches) are
+available without the cross-talk of ``RUSAGE_CHILDREN``. While the child is
+running, RSS and CPU time are sampled from ``/proc/<pid>`` into a compact
+time series of ``[elapsed_seconds, rss_kb, cpu_seconds]`` rows.
+"""
+import os
+import sys
+import time
+
+from django.conf import settings
+
+DEFAULT_SAMPLE_INTERVAL = 5.0
+MAX_SAMPLES = 240
+
+
+def _clock_ticks():
+    try:
+        return os.sysconf('SC_CLK_TCK')
+    except (AttributeError, ValueError, OSError):
+        return 100
+
+
+def read_proc_sample(pid):
+    """Return ``(rss_kb, cpu_seconds)`` for a running process, or None
+
+    Only available on systems with a Linux-style ``/proc`` filesystem.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read().decode('utf-8', 'replace')
+        with open(f'/proc/{pid}/status', 'rb') as f:
+            status = f.read().decode('utf-8', 'replace')
+    except OSError:
+        return None
+
+    # The command name may contain spaces, so split after its closing paren
+    fields = stat[stat.rfind(')') + 2:].split()
+    try:
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / _clock_ticks()
+    except (IndexError, ValueError):
+        return None
+
+    rss_kb = 0
+    for line in status.splitlines():
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+            break
+
+    return rss_kb, cpu_seconds
+
+
+def _exit_code(status):
+    """Convert a wait status to a Popen-style return code"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class ResourceMonitor:
+    """Reap a subprocess with ``os.wait4`` and sample its usage while it runs"""
+
+    def __init__(self, process, sample_interval=None):
+        if sample_interval is None:
+            sample_interval = getattr(settings, 'DJANGO_JOBS_RESOURCE_SAMPLE_INTERVAL',
+                                      DEFAULT_SAMPLE_INTERVAL)
+        self.process = process
+        self.sample_interval = sample_interval
+        self.started = time.monotonic()
+        self.last_sample = None
+        self.samples = []
+        self.rusage = None
+
+    def poll(self):
+        """Drop-in replacement for ``process.poll()`` that also collects usage"""
+        if self.process.returncode is not None:
+            return self.process.returncode
+
+        try:
+            pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+        except ChildProcessError:
+            # Already reaped elsewhere; fall back to Popen's bookkeeping
+            return self.process.poll()
+
+        if pid == 0:
+            self._maybe_sample()
+            return None
+
+        self.rusage = rusage
+        self.process.returncode = _exit_code(status)
+        return self.process.returncode
+
+    def _maybe_sample(self):
+        now = time.monotonic()
+        if self.last_sample is not None and now - self.last_sample < self.sample_interval:
+            return
+        self.last_sample = now
+
+        sample = read_proc_sample(self.process.pid)
+        if sample is None:
+            return
+
+        rss_kb, cpu_seconds = sample
+        self.samples.append([round(now - self.started, 1), rss_kb, round(cpu_seconds, 2)])
+        if len(self.samples) > MAX_SAMPLES:
+            # Halve the resolution instead of growing without bound, always
+            # keeping the most recent sample
+            self.samples = self.samples[-2::-2][::-1] + self.samples[-1:]
+
+    def usage_fields(self):
+        """Return the final figures as ``CommandLog`` field values"""
+        fields = {'resource_samples': self.samples}
+        if self.rusage is None:
+            return fields
+
+        max_rss = self.rusage.ru_maxrss
+        if sys.platform == 'darwin':
+            # macOS reports bytes, Linux reports kilobytes
+            max_rss //= 1024
+
+        fields.update({
+            'cpu_user_time': self.rusage.ru_utime,
+            'cpu_system_time': self.rusage.ru_stime,
+            'max_rss_kb': max_rss,
+            'io_read_blocks': self.rusage.ru_inblock,
+            'io_write_blocks': self.rusage.ru_oublock,
+            'voluntary_ctx_switches': self.rusage.ru_nvcsw,
+            'involuntary_ctx_switches': self.rusage.ru_nivcsw,
+        })
+        return fields
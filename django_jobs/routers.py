@@ -0,0 +1,97 @@
+"""Send the admin's log browsing to a read replica.
+
+Add the router and name the replica's database alias:
+
+    DATABASE_ROUTERS = ['django_jobs.routers.ReadReplicaRouter']
+    DJANGO_JOBS_READ_DB = 'replica'
+
+Only reads inside ``replica_reads`` go to the replica. The admin uses it for
+GET requests to the command log list and detail pages, the statistics page
+and the job status endpoint. Everything else stays on the primary, including
+the scheduler, the runner and admin actions. A replica can lag behind, so a
+session that has just started a job is pinned to the primary for
+``DJANGO_JOBS_READ_PIN_SECONDS``. That way its status page finds the new log.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_SESSION_KEY = 'django_jobs_primary_until'
+
+_read_db = ContextVar('django_jobs_read_db', default=None)
+
+
+def get_read_db():
+    """Return the alias of the replica, or None if there is none"""
+    return getattr(settings, 'DJANGO_JOBS_READ_DB', None)
+
+
+def pin_to_primary(request):
+    """Read from the primary in this session for a while, to see its own writes"""
+    session = getattr(request, 'session', None)
+    if session is not None and get_read_db():
+        session[PIN_SESSION_KEY] = time.time() + getattr(settings, 'DJANGO_JOBS_READ_PIN_SECONDS', 10)
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Read django_jobs models from the replica inside the block
+
+    Does nothing without ``DJANGO_JOBS_READ_DB`` or when ``request``'s session is pinned.
+    """
+    alias = get_read_db()
+    if not alias or (request is not None and is_pinned(request)):
+        yield
+        return
+    token = _read_db.set(alias)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def read_from_replica(view):
+    """Run a ModelAdmin view method's GET requests with ``replica_reads``"""
+    @wraps(view)
+    def wrapper(model_admin, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(model_admin, request, *args, **kwargs)
+        with replica_reads(request):
+            response = view(model_admin, request, *args, **kwargs)
+            # Template responses query while rendering, which must happen inside the block
+            if callable(getattr(response, 'render', None)) and not response.is_rendered:
+                response.render()
+        return response
+    return wrapper
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_jobs':
+            return _read_db.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an object read from the replica would write to it
+        instance = hints.get('instance')
+        if (model._meta.app_label == 'django_jobs' and instance is not None
+                and instance._state.db is not None and instance._state.db == get_read_db()):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        read_db = get_read_db()
+        aliases = {DEFAULT_DB_ALIAS, read_db}
+        if read_db and obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
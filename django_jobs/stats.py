@@ -0,0 +1,172 @@
+"""Per-command statistics kept in the ``CommandStats`` rollup table.
+
+Every finished run adds itself to the row of its command and hour when it
+ends, so statistics never scan ``CommandLog`` and stay available after
+``delete_logs`` has removed the runs they were built from.
+
+Durations are kept in a ``DurationSketch``: a histogram with logarithmic
+buckets (as in DDSketch), so any percentile is accurate to within
+``RELATIVE_ACCURACY`` of the true value. Sketches of different hours add up
+by summing their buckets.
+"""
+import math
+
+from django.db import transaction
+
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+# Durations below a millisecond share the lowest bucket
+MIN_DURATION = 0.001
+
+
+class DurationSketch:
+    """Mergeable quantile sketch of durations in seconds"""
+
+    def __init__(self, buckets=None):
+        # JSON object keys are strings, so buckets are stored as {"index": count}
+        self.buckets = {int(index): count for index, count in (buckets or {}).items()}
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def add(self, seconds, count=1):
+        index = math.ceil(math.log(max(seconds, MIN_DURATION)) / LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q):
+        """Return the ``q`` quantile (0 to 1), or None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        # Midpoint of the bucket in relative terms
+        return 2 * GAMMA ** index / (GAMMA + 1)
+
+    def to_json(self):
+        return {str(index): count for index, count in sorted(self.buckets.items())}
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_run(log):
+    """Add a finished run to the rollup of its command and hour"""
+    record_runs([log])
+
+
+def record_runs(logs):
+    """Add finished runs to the rollup, with one row update per command and hour
+
+    Shards are left out; their parent run is counted instead.
+    """
+    from .models import CommandLog, CommandStats
+
+    groups = {}
+    for log in logs:
+        if not log.parent_id:
+            groups.setdefault((log.command_name, hour_bucket(log.started_at)), []).append(log)
+
+    for (command_name, hour), group in groups.items():
+        with transaction.atomic():
+            # The row is locked so runs finishing at the same time on other nodes add up
+            row, _ = CommandStats.objects.select_for_update().get_or_create(command_name=command_name, hour=hour)
+            for log in group:
+                row.add_run(log.status, log.duration if log.status in CommandLog.TIMED_STATUSES else None, log.lag)
+            row.save()
+
+
+def summarize(since, until=None):
+    """Aggregate the rollup rows from ``since`` per command
+
+    Returns a list of dicts sorted by command name with the run counts,
+    failure rate, duration percentiles and start delay.
+    """
+    from .models import CommandStats
+
+    rows = CommandStats.objects.filter(hour__gte=hour_bucket(since))
+    if until is not None:
+        rows = rows.filter(hour__lt=until)
+
+    summaries = {}
+    for row in rows.order_by('command_name', 'hour').iterator():
+        summary = summaries.get(row.command_name)
+        if summary is None:
+            summary = summaries[row.command_name] = {
+                'command_name': row.command_name,
+                'sketch': DurationSketch(),
+                'duration_max': None,
+                'lag_max': None,
+                **{field: 0 for field in CommandStats.COUNTER_FIELDS},
+            }
+        for field in CommandStats.COUNTER_FIELDS:
+            summary[field] += getattr(row, field)
+        summary['sketch'].merge(DurationSketch(row.duration_sketch))
+        summary['duration_max'] = _max(summary['duration_max'], row.duration_max)
+        summary['lag_max'] = _max(summary['lag_max'], row.lag_max)
+
+    result = []
+    for summary in summaries.values():
+        sketch = summary.pop('sketch')
+        runs = sum(summary[field] for field in CommandStats.STATUS_FIELDS.values())
+        failed = summary['failure_count'] + summary['timeout_count'] + summary['lost_count']
+        summary.update({
+            'runs': runs,
+            'failed': failed,
+            'failure_rate': failed / runs if runs else 0,
+            'p50': sketch.quantile(0.5),
+            'p95': sketch.quantile(0.95),
+            'p99': sketch.quantile(0.99),
+            'duration_avg': summary['duration_sum'] / summary['duration_count'] if summary['duration_count'] else None,
+            'lag_avg': summary['lag_sum'] / summary['lag_count'] if summary['lag_count'] else None,
+        })
+        result.append(summary)
+    return sorted(result, key=lambda item: item['command_name'])
+
+
+def rebuild(since=None):
+    """Recompute the rollup from ``CommandLog``
+
+    Only the command/hour pairs that still have logs are rewritten, so hours
+    whose logs were deleted keep their statistics. Returns the number of rows
+    written.
+    """
+    from .models import CommandLog, CommandStats
+
+    logs = CommandLog.objects.filter(status__in=CommandLog.FINISHED_STATUSES, parent__isnull=True)
+    if since is not None:
+        logs = logs.filter(started_at__gte=hour_bucket(since))
+
+    rollup = {}
+    for log in logs.only('command_name', 'status', 'started_at', 'duration', 'scheduled_for').iterator():
+        key = (log.command_name, hour_bucket(log.started_at))
+        if key not in rollup:
+            rollup[key] = CommandStats(command_name=key[0], hour=key[1])
+        rollup[key].add_run(log.status, log.duration if log.status in CommandLog.TIMED_STATUSES else None, log.lag)
+
+    hours = {}
+    for command_name, hour in rollup:
+        hours.setdefault(command_name, []).append(hour)
+
+    with transaction.atomic():
+        for command_name, command_hours in hours.items():
+            CommandStats.objects.filter(command_name=command_name, hour__in=command_hours).delete()
+        CommandStats.objects.bulk_create(rollup.values(), batch_size=500)
+    return len(rollup)
+
+
+def _max(current, value):
+    if value is None:
+        return current
+    return value if current is None else max(current, value)
@@ -17,6 +17,10 @@ def status_color(status):
         'R': '#17a2b8',  # Running - blue
         'S': '#28a745',  # Success - green
         'F': '#dc3545',  # Failure - red
+        'T': '#fd7e14',  # Timed out - orange
+        'K': '#adb5bd',  # Skipped - light gray
+        'C': '#6f42c1',  # Cancelled - purple
+        'L': '#343a40',  # Lost - dark gray
     }
     return colors.get(status, '#6c757d')  # Default - gray
 
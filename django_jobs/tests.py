@@ -1,9 +1,19 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.core.management import call_command
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from croniter import croniter
-from .models import CommandSchedule, CommandLog
+from . import models
+from .models import CommandSchedule, CommandLog, ConcurrencyLimit, JobTrigger
+
+DATA_VERSION = {'value': 1}
+
+
+def data_version(schedule, arguments):
+    """Fingerprint function for SkipIfUnchangedTestCase"""
+    return DATA_VERSION['value']
 
 
 class CommandScheduleTestCase(TestCase):
@@ -15,6 +25,8 @@ class CommandScheduleTestCase(TestCase):
             schedule_minute='*',
             schedule_day='*'
         )
+        # Jobs queued on a mocked pool never leave it
+        self.addCleanup(models._pooled_logs.clear)
 
     def test_command_schedule_creation(self):
         self.assertEqual(self.schedule.command_name, 'help')
@@ -26,6 +38,100 @@ class CommandScheduleTestCase(TestCase):
         self.assertEqual(log.command_name, 'help')
         self.assertIn(log.status, ['S', 'F'])  # Should be Success or Failure
 
+    def test_run_job_records_resource_usage(self):
+        log = CommandLog.objects.get(pk=self.schedule.run_job())
+        self.assertIsNotNone(log.cpu_user_time)
+        self.assertIsNotNone(log.cpu_system_time)
+        self.assertGreater(log.max_rss_kb, 0)
+        self.assertIsInstance(log.resource_samples, list)
+
+    def test_run_job_timeout(self):
+        """A command exceeding its timeout is terminated and marked as timed out"""
+        schedule = CommandSchedule.objects.create(
+            command_name='shell',
+            arguments={'command': 'import time; time.sleep(30)'},
+            timeout=1,
+            kill_grace_period=1,
+        )
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_TIMEOUT)
+        self.assertTrue(log.is_finished)
+        self.assertLess(log.duration.total_seconds(), 10)
+
+    def test_run_job_resource_limits(self):
+        """The command runs with the schedule's rlimits"""
+        schedule = CommandSchedule.objects.create(
+            command_name='shell',
+            arguments={'command': 'import resource; print(resource.getrlimit(resource.RLIMIT_CPU), '
+                                  'resource.getrlimit(resource.RLIMIT_AS))'},
+            memory_limit_mb=4096,
+            cpu_time_limit=30,
+        )
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SUCCESS, log.output)
+        self.assertIn(f'(30, 31) ({4096 * 1024 * 1024}, {4096 * 1024 * 1024})', log.output)
+
+    def test_limit_command(self):
+        from .limits import limit_command
+
+        self.assertEqual(limit_command(['python', 'manage.py', 'help']), ['python', 'manage.py', 'help'])
+        self.assertEqual(limit_command(['python', 'manage.py'], cpu_time_limit=5)[-4:], ['0', '5', 'python', 'manage.py'])
+
+    def test_enqueue_jobs_bulk_creates_logs(self):
+        """All logs are created up front and each job is queued on the pool"""
+        other = CommandSchedule.objects.create(command_name='check', arguments={'deploy': True})
+        with mock.patch('django_jobs.executor.submit') as submit:
+            with self.assertNumQueries(1):
+                log_ids = CommandSchedule.enqueue_jobs([self.schedule, other])
+
+        self.assertEqual(len(log_ids), 2)
+        self.assertEqual(submit.call_count, 2)
+        logs = CommandLog.objects.in_bulk(log_ids)
+        self.assertEqual(logs[log_ids[0]].command_name, 'help')
+        self.assertEqual(logs[log_ids[1]].arguments, {'deploy': True})
+        self.assertTrue(all(log.status == CommandLog.STATUS_PENDING for log in logs.values()))
+
+    def test_enqueue_jobs_argument_override(self):
+        with mock.patch('django_jobs.executor.submit') as submit:
+            log_ids = CommandSchedule.enqueue_jobs([self.schedule], arguments={'verbosity': 2})
+
+        self.assertEqual(CommandLog.objects.get(pk=log_ids[0]).arguments, {'verbosity': 2})
+        self.assertEqual(submit.call_args[0][1], 'python manage.py help --verbosity=2')
+
+    def test_pooled_jobs_are_left_to_the_pool(self):
+        """run_jobs only picks up a queued job once its pool stops renewing it"""
+        from datetime import timedelta
+
+        with mock.patch('django_jobs.executor.submit'):
+            log_id = CommandSchedule.enqueue_jobs([self.schedule])[0]
+        self.assertEqual(CommandSchedule.get_due_pending(), [])
+
+        stale = timezone.now() - timedelta(seconds=120)
+        CommandLog.objects.filter(pk=log_id).update(heartbeat_at=stale)
+        models._pooled_refreshed_at = 0
+        models._refresh_pooled_logs()
+        self.assertEqual(CommandSchedule.get_due_pending(), [])
+
+        # The process died: nothing renews it any more
+        models._pooled_logs.clear()
+        CommandLog.objects.filter(pk=log_id).update(heartbeat_at=stale)
+        self.assertEqual([log.pk for _, log in CommandSchedule.get_due_pending()], [log_id])
+
+    def test_pool_releases_queued_jobs_to_run_jobs(self):
+        """A pooled job that is queued behind a limit is handed over to run_jobs"""
+        CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+        self.schedule.max_instances = 1
+        self.schedule.on_limit = CommandSchedule.ON_LIMIT_QUEUE
+        self.schedule.save()
+        with mock.patch('django_jobs.executor.submit', side_effect=lambda fn, *args: fn(*args)):
+            log_id = CommandSchedule.enqueue_jobs([self.schedule])[0]
+
+        log = CommandLog.objects.get(pk=log_id)
+        self.assertEqual(log.status, CommandLog.STATUS_PENDING)
+        self.assertIsNone(log.heartbeat_at)
+        self.assertNotIn(log_id, models._pooled_logs)
+        self.assertEqual([log.pk for _, log in CommandSchedule.get_due_pending()], [log_id])
+
     def test_get_available_arguments(self):
         args = self.schedule.get_available_arguments()
         self.assertIsInstance(args, list)
@@ -83,6 +189,35 @@ class CommandScheduleTestCase(TestCase):
         next_run = cron.get_next()
         self.assertIsNotNone(next_run)
     
+    def test_full_cron_expression(self):
+        schedule = CommandSchedule(
+            command_name='help', schedule_minute='0', schedule_hour='2',
+            schedule_month='1-6', schedule_day_of_week='mon-fri')
+        self.assertEqual(schedule.get_cron_expression(), '0 2 * 1-6 mon-fri')
+        schedule.clean()
+
+        schedule.schedule_second = '*/15'
+        self.assertEqual(schedule.get_cron_expression(), '0 2 * 1-6 mon-fri */15')
+        schedule.clean()
+
+        schedule.schedule_second = '75'
+        with self.assertRaises(ValidationError):
+            schedule.clean()
+
+    def test_prev_fire_time(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        now = datetime(2024, 5, 6, 10, 30, 47, tzinfo=dt_timezone.utc)
+        every_15s = CommandSchedule(command_name='help', schedule_second='*/15')
+        self.assertEqual(every_15s.get_prev_fire_time(now), now.replace(second=45))
+
+        interval = CommandSchedule(command_name='help', interval_seconds=20)
+        self.assertEqual(interval.get_prev_fire_time(now), now.replace(second=40))
+
+        weekdays = CommandSchedule(command_name='help', schedule_minute='0', schedule_hour='9',
+                                   schedule_day_of_week='sat')
+        self.assertEqual(weekdays.get_prev_fire_time(now), datetime(2024, 5, 4, 9, 0, tzinfo=dt_timezone.utc))
+
     def test_run_jobs_command(self):
         """Test that run_jobs command works without errors"""
         from django.core.management import call_command
@@ -102,8 +237,1171 @@ class CommandScheduleTestCase(TestCase):
         call_command('run_jobs', stdout=out)
         # Command should complete without error
 
+    def test_cron_run_records_scheduled_time_and_lag(self):
+        from io import StringIO
+
+        call_command('run_jobs', stdout=StringIO())
+        log = CommandLog.objects.get(command_name='help')
+        self.assertEqual(log.trigger, CommandLog.TRIGGER_CRON)
+        # The minute the cron fields were due, not the moment the run was created
+        self.assertEqual((log.scheduled_for.second, log.scheduled_for.microsecond), (0, 0))
+        self.assertEqual(log.lag, log.started_at - log.scheduled_for)
+        self.assertLess(log.lag.total_seconds(), 60)
+
+        manual = CommandLog.objects.get(pk=self.schedule.run_job())
+        self.assertEqual(manual.trigger, CommandLog.TRIGGER_MANUAL)
+        self.assertIsNotNone(manual.lag)
+
+
+class RetryTestCase(TestCase):
+    def test_failed_run_schedules_retry(self):
+        schedule = CommandSchedule.objects.create(
+            command_name='help', arguments={'_positional': ['no_such_command']},
+            max_retries=2, retry_delay=10, retry_backoff=3, retry_jitter=0)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_FAILURE)
+        self.assertNotEqual(log.exit_code, 0)
+
+        retry = log.retries.get()
+        self.assertEqual(retry.status, CommandLog.STATUS_PENDING)
+        self.assertEqual(retry.attempt, 2)
+        self.assertEqual(retry.trigger, CommandLog.TRIGGER_RETRY)
+        self.assertEqual(retry.arguments, log.arguments)
+        delay = (retry.scheduled_for - timezone.now()).total_seconds()
+        self.assertTrue(5 < delay <= 10)
+
+        # The retry runs once due and schedules the last attempt, linked to the first run
+        CommandSchedule.run_pending_jobs(now=retry.scheduled_for)
+        retry.refresh_from_db()
+        self.assertEqual(retry.status, CommandLog.STATUS_FAILURE)
+        last = CommandLog.objects.get(retry_of=log, attempt=3)
+
+        CommandSchedule.run_pending_jobs(now=last.scheduled_for)
+        self.assertEqual(log.retries.count(), 2)
+
+    def test_retry_delay_backoff_and_jitter(self):
+        schedule = CommandSchedule(retry_delay=10, retry_backoff=2, retry_jitter=0.5)
+        for attempt, base in ((1, 10), (2, 20), (3, 40)):
+            delay = schedule.get_retry_delay(attempt)
+            self.assertTrue(base * 0.5 <= delay <= base * 1.5)
+
+    def test_retry_only_on_listed_exit_codes(self):
+        schedule = CommandSchedule(command_name='help', max_retries=3, retry_on_exit_codes='75')
+        log = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_FAILURE, exit_code=1)
+        self.assertIsNone(schedule._schedule_retry(log))
+        log.exit_code = 75
+        self.assertIsNotNone(schedule._schedule_retry(log))
+
+
+class WorkflowTestCase(TestCase):
+    def setUp(self):
+        # extract -> (transform, report) -> publish
+        self.extract = CommandSchedule.objects.create(command_name='help', active=True)
+        self.transform = CommandSchedule.objects.create(command_name='check', active=True)
+        self.report = CommandSchedule.objects.create(command_name='diffsettings', active=True)
+        self.publish = CommandSchedule.objects.create(command_name='showmigrations', active=True)
+        self.transform.depends_on.add(self.extract)
+        self.report.depends_on.add(self.extract)
+        self.publish.depends_on.add(self.transform, self.report)
+        self.addCleanup(models._pooled_logs.clear)
+
+    def test_dependents_run_after_upstreams_succeed(self):
+        # Run pool jobs inline so the whole workflow completes in this test
+        with mock.patch('django_jobs.executor.submit', side_effect=lambda fn, *args: fn(*args)) as submit:
+            root = CommandLog.objects.get(pk=self.extract.run_job())
+
+        self.assertEqual(root.status, CommandLog.STATUS_SUCCESS)
+        self.assertEqual(submit.call_count, 3)
+        runs = {log.command_name: log for log in root.pipeline_runs.all()}
+        self.assertEqual(set(runs), {'check', 'diffsettings', 'showmigrations'})
+        self.assertTrue(all(log.status == CommandLog.STATUS_SUCCESS for log in runs.values()))
+        self.assertGreaterEqual(runs['showmigrations'].started_at, runs['diffsettings'].ended_at)
+
+    def test_fan_in_waits_for_all_upstreams(self):
+        root = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_SUCCESS)
+        transform_log = CommandLog.objects.create(
+            command_name='check', status=CommandLog.STATUS_SUCCESS, pipeline_root=root)
+        with mock.patch('django_jobs.executor.submit') as submit:
+            self.assertEqual(self.transform._trigger_dependents(transform_log), [])
+            CommandLog.objects.create(
+                command_name='diffsettings', status=CommandLog.STATUS_SUCCESS, pipeline_root=root)
+            started = self.transform._trigger_dependents(transform_log)
+            # A second upstream finishing does not start it twice
+            self.assertEqual(self.report._trigger_dependents(transform_log), [])
+
+        self.assertEqual([log.command_name for log in started], ['showmigrations'])
+        self.assertEqual(submit.call_count, 1)
+
+    def test_inactive_dependents_are_not_started(self):
+        self.report.active = False
+        self.report.save()
+        with mock.patch('django_jobs.executor.submit', side_effect=lambda fn, *args: fn(*args)):
+            root = CommandLog.objects.get(pk=self.extract.run_job())
+
+        # publish also waits for report, so the workflow stops after transform
+        self.assertEqual([log.command_name for log in root.pipeline_runs.all()], ['check'])
+
+    def test_cycle_detection(self):
+        self.assertTrue(self.extract.would_create_cycle([self.publish]))
+        self.assertTrue(self.extract.would_create_cycle([self.extract]))
+        self.assertFalse(self.publish.would_create_cycle([self.extract]))
+
+    def test_run_jobs_skips_commands_with_dependencies(self):
+        from io import StringIO
+
+        with mock.patch.object(CommandSchedule, 'run_job', autospec=True, return_value=1) as run_job:
+            call_command('run_jobs', stdout=StringIO())
+        self.assertEqual([call[0][0] for call in run_job.call_args_list], [self.extract])
+
+
+class ShardingTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(models._pooled_logs.clear)
+
+    def test_run_as_shards(self):
+        schedule = CommandSchedule.objects.create(
+            command_name='cleanup_old_data', arguments={'dry_run': True}, shard_count=3)
+        with mock.patch('django_jobs.executor.submit',
+                        side_effect=lambda fn, *args, **kwargs: fn(*args, **kwargs)) as submit:
+            parent = CommandLog.objects.get(pk=schedule.run_job())
+
+        self.assertEqual(submit.call_count, 3)
+        self.assertEqual(parent.status, CommandLog.STATUS_SUCCESS)
+        self.assertIn('3/3 shards succeeded', parent.output)
+
+        shards = list(parent.shards.order_by('shard_index'))
+        self.assertEqual([shard.shard_index for shard in shards], [0, 1, 2])
+        self.assertEqual(shards[1].arguments, {'dry_run': True, 'shard_index': 1, 'shard_count': 3})
+        self.assertIn('--shard-index=1 --shard-count=3', submit.call_args_list[1][0][1])
+        self.assertIn('Shard: 2/3', shards[1].output)
+
+    def test_shards_get_ids_without_bulk_insert_returning(self):
+        from django.db import connection
+
+        schedule = CommandSchedule.objects.create(command_name='help', shard_count=2)
+        parent = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch('django_jobs.executor.submit') as submit:
+            schedule._fan_out(parent.pk)
+        self.assertEqual({call[0][2] for call in submit.call_args_list},
+                         set(parent.shards.values_list('pk', flat=True)))
+
+    def test_parent_fails_when_a_shard_fails(self):
+        schedule = CommandSchedule(command_name='help')
+        parent = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+        CommandLog.objects.create(
+            command_name='help', parent=parent, shard_index=0, status=CommandLog.STATUS_SUCCESS)
+        failed = CommandLog.objects.create(
+            command_name='help', parent=parent, shard_index=1, status=CommandLog.STATUS_RUNNING)
+
+        schedule._finish_shard(failed)
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, CommandLog.STATUS_RUNNING)
+
+        failed.set_failure('boom')
+        schedule._finish_shard(failed)
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, CommandLog.STATUS_FAILURE)
+        self.assertIn('Failed shards: 1', parent.output)
+
+
+class LoadSpreadingTestCase(TestCase):
+    def test_spread_minutes_flattens_peak(self):
+        from .planning import spread_minutes
+
+        jobs = [(name, 0, 120, None) for name in 'abcdef']
+        assignments, load = spread_minutes(jobs)
+        self.assertEqual(max(load), 1)
+        self.assertEqual(len(set(assignments.values())), 6)
+
+        # Fixed load is avoided
+        fixed = [1] * 24 * 60
+        for hour in range(24):
+            fixed[hour * 60 + 30] = 0
+        assignments, load = spread_minutes([('a', 0, 30, None)], fixed)
+        self.assertEqual(assignments, {'a': 30})
+
+    def test_spread_minutes_by_hour(self):
+        from .planning import spread_minutes
+
+        # Jobs in different hours keep their minute; an hourly job avoids the nightly one
+        jobs = [('nightly', 0, 600, [2]), ('afternoon', 0, 300, [14]), ('hourly', 0, 120, None)]
+        assignments, load = spread_minutes(jobs)
+        self.assertEqual(assignments['nightly'], 0)
+        self.assertEqual(assignments['afternoon'], 0)
+        self.assertNotEqual(assignments['hourly'], 0)
+        self.assertEqual(max(load), 1)
+
+    def test_spread_schedules_command(self):
+        from io import StringIO
+        from datetime import timedelta
+
+        for name in ('help', 'check', 'diffsettings'):
+            CommandSchedule.objects.create(command_name=name, active=True, schedule_minute='0')
+            CommandLog.objects.create(command_name=name, status=CommandLog.STATUS_SUCCESS,
+                                      duration=timedelta(minutes=5))
+        CommandSchedule.objects.create(command_name='showmigrations', active=True, schedule_minute='*/15')
+
+        out = StringIO()
+        call_command('spread_schedules', stdout=out)
+        self.assertIn('DRY RUN', out.getvalue())
+        self.assertEqual(CommandSchedule.objects.filter(schedule_minute='0').count(), 3)
+
+        call_command('spread_schedules', '--apply', stdout=out)
+        minutes = sorted(int(m) for m in CommandSchedule.objects.exclude(
+            command_name='showmigrations').values_list('schedule_minute', flat=True))
+        self.assertEqual(len(set(minutes)), 3)
+        self.assertTrue(all(b - a >= 5 for a, b in zip(minutes, minutes[1:])))
+        self.assertEqual(CommandSchedule.objects.get(command_name='showmigrations').schedule_minute, '*/15')
+
+    def test_spread_schedules_ignores_jobs_in_other_hours(self):
+        from io import StringIO
+
+        CommandSchedule.objects.create(command_name='help', active=True, schedule_minute='0', schedule_hour='2')
+        CommandSchedule.objects.create(command_name='check', active=True, schedule_minute='0', schedule_hour='14')
+
+        out = StringIO()
+        call_command('spread_schedules', '--apply', stdout=out)
+        self.assertIn('Moved 0 schedule(s)', out.getvalue())
+        self.assertIn('Peak concurrency: 1 before, 1 after', out.getvalue())
+
+    def test_jitter_defers_run(self):
+        from io import StringIO
+
+        schedule = CommandSchedule.objects.create(command_name='help', active=True, jitter_seconds=600)
+        with mock.patch.object(CommandSchedule, 'run_pending_jobs', return_value=0):
+            call_command('run_jobs', stdout=StringIO())
+
+        log = CommandLog.objects.get(command_name='help')
+        self.assertEqual(log.status, CommandLog.STATUS_PENDING)
+        fire_time = schedule.get_prev_fire_time(log.started_at)
+        self.assertTrue(fire_time <= log.scheduled_for <= fire_time + timezone.timedelta(seconds=600))
+
+    def test_forecast_matches_croniter(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .planning import forecast
+
+        start = datetime(2024, 3, 1, 0, 0, tzinfo=dt_timezone.utc)
+        hourly = CommandSchedule(command_name='help', schedule_minute='15', schedule_hour='*')
+        # Day of month and day of week are OR'ed like in cron: the 1st or any Monday
+        weekly = CommandSchedule(command_name='check', schedule_minute='0', schedule_hour='2',
+                                 schedule_day='1', schedule_day_of_week='1')
+        interval = CommandSchedule(command_name='diffsettings', interval_seconds=300)
+        result = forecast([hourly, weekly, interval], start, 24 * 7,
+                          durations={'help': 600, 'check': 30})
+
+        runs = {item['command_name']: item for item in result['commands']}
+        for schedule in (hourly, weekly):
+            cron = croniter(schedule.get_cron_expression(), start - timezone.timedelta(seconds=1))
+            expected = 0
+            while cron.get_next(datetime) < start + timezone.timedelta(days=7):
+                expected += 1
+            self.assertEqual(runs[schedule.command_name]['runs'], expected)
+        self.assertEqual(runs['check']['runs'], 2)  # Fri 1 March, Mon 4 March
+        self.assertEqual(runs['diffsettings']['runs'], 7 * 24 * 12)
+        self.assertEqual(runs['help']['first_run'], start.replace(minute=15))
+
+        # At 02:00 on the 1st "check" runs next to a 5-minute interval run;
+        # "help" runs from :15 to :25 and overlaps another interval run
+        self.assertEqual(result['load'][2 * 60], 2)
+        self.assertEqual(result['load'][15], 2)
+        self.assertEqual(result['peaks'][0]['load'], 2)
+
+    def test_forecast_runs_longer_than_an_hour(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .planning import forecast
+
+        start = datetime(2024, 3, 1, 0, 0, tzinfo=dt_timezone.utc)
+        nightly = CommandSchedule(command_name='check', schedule_minute='0', schedule_hour='2')
+        backup = CommandSchedule(command_name='help', schedule_minute='0', schedule_hour='5')
+        result = forecast([nightly, backup], start, 24, durations={'check': 4 * 3600, 'help': 600})
+
+        load = result['load']
+        self.assertEqual(sum(load[2 * 60:6 * 60]), 240 + 10)
+        self.assertEqual(load[2 * 60 + 239], 1)
+        self.assertEqual(load[6 * 60], 0)
+        # The 4-hour run is still going when the 05:00 run starts
+        self.assertEqual(load[5 * 60], 2)
+        self.assertEqual(result['peaks'][0]['commands'], ['check', 'help'])
+
+    def test_jobs_forecast_command(self):
+        from io import StringIO
+
+        CommandSchedule.objects.create(command_name='help', active=True, schedule_minute='*/10')
+        out = StringIO()
+        call_command('jobs_forecast', '--hours', '2', stdout=out)
+        self.assertIn('help: 12 run(s)', out.getvalue())
+        self.assertIn('Busiest minutes', out.getvalue())
+
+
+class TriggerTestCase(TestCase):
+    def setUp(self):
+        from . import triggers
+
+        triggers.get_model_triggers(reload=True)
+        self.addCleanup(triggers.get_model_triggers, reload=True)
+        JobTrigger._armed.clear()
+        self.schedule = CommandSchedule.objects.create(command_name='help', active=True, cron_enabled=False)
+
+    def test_receivers_are_only_connected_to_watched_models(self):
+        from django.contrib.auth.models import Group, Permission
+        from django.db import connection
+        from django.db.models.signals import post_save
+        from django.test.utils import CaptureQueriesContext
+
+        self.assertFalse(post_save.has_listeners(Group))
+        trigger = JobTrigger.objects.create(schedule=self.schedule, kind=JobTrigger.KIND_MODEL, model='auth.Group')
+        self.assertTrue(post_save.has_listeners(Group))
+        self.assertFalse(post_save.has_listeners(Permission))
+
+        # Saving a model nobody watches never looks at the triggers, even when they are due a reload
+        with self.settings(DJANGO_JOBS_TRIGGER_CACHE_SECONDS=0), CaptureQueriesContext(connection) as queries:
+            Permission.objects.first().save()
+        self.assertFalse([query for query in queries if 'django_jobs' in query['sql']])
+
+        trigger.delete()
+        self.assertFalse(post_save.has_listeners(Group))
+
+    def test_failing_reload_keeps_the_loaded_triggers(self):
+        from django.db import DatabaseError
+        from . import triggers
+
+        JobTrigger.objects.create(schedule=self.schedule, kind=JobTrigger.KIND_MODEL, model='auth.Group')
+        with mock.patch.object(JobTrigger.objects, 'filter', side_effect=DatabaseError('no such table')):
+            self.assertEqual(list(triggers.get_model_triggers(reload=True)), ['auth.group'])
+
+    def test_model_events_are_coalesced(self):
+        from django.contrib.auth.models import Group
+
+        JobTrigger.objects.create(schedule=self.schedule, kind=JobTrigger.KIND_MODEL,
+                                  model='auth.Group', debounce_seconds=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(50):
+                Group.objects.create(name=f'group {i}')
+
+        log = CommandLog.objects.get(command_name='help')
+        self.assertEqual(log.status, CommandLog.STATUS_PENDING)
+        self.assertIsNotNone(log.triggered_by)
+        self.assertGreater(log.scheduled_for, timezone.now() + timezone.timedelta(seconds=20))
+
+        # Other processes without the in-memory shortcut fold into the same run
+        JobTrigger._armed.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.all().delete()
+        self.assertEqual(CommandLog.objects.filter(command_name='help').count(), 1)
+
+    def test_http_ping(self):
+        from django.urls import reverse
+
+        trigger = JobTrigger.objects.create(schedule=self.schedule, kind=JobTrigger.KIND_HTTP)
+        self.assertTrue(trigger.token)
+
+        response = self.client.post(reverse('django_jobs:trigger_job', args=[trigger.pk, 'wrong']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CommandLog.objects.exists())
+
+        url = reverse('django_jobs:trigger_job', args=[trigger.pk, trigger.token])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['log_id'], CommandLog.objects.get().pk)
+
+    def test_file_trigger_fires_on_new_files(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from .triggers import poll_file_triggers
+
+        with tempfile.TemporaryDirectory() as directory:
+            trigger = JobTrigger.objects.create(schedule=self.schedule, kind=JobTrigger.KIND_FILE,
+                                                path=directory, pattern='*.csv', debounce_seconds=0)
+            open(os.path.join(directory, 'notes.txt'), 'w').close()
+            self.assertEqual(poll_file_triggers(), [])
+
+            open(os.path.join(directory, 'data.csv'), 'w').close()
+            self.assertEqual(poll_file_triggers(), [trigger])
+            self.assertEqual(poll_file_triggers(), [])
+
+            # A copy that keeps an older modification time (cp -p, rsync, tar) is new as well
+            path = os.path.join(directory, 'archive.csv')
+            open(path, 'w').close()
+            os.utime(path, (0, 0))
+            self.assertEqual(poll_file_triggers(), [trigger])
+            self.assertEqual(poll_file_triggers(), [])
+
+            # Removing a file does not fire
+            os.remove(path)
+            self.assertEqual(poll_file_triggers(), [])
+
+        # The pending run is picked up by run_jobs, which skips cron for this schedule
+        call_command('run_jobs', stdout=StringIO())
+        log = CommandLog.objects.get(command_name='help')
+        self.assertIn(log.status, [CommandLog.STATUS_SUCCESS, CommandLog.STATUS_FAILURE])
+
+
+class MetricsTestCase(TestCase):
+    def test_runner_records_metrics(self):
+        from . import metrics
+
+        schedule = CommandSchedule.objects.create(command_name='help', active=True)
+        runs = metrics.runs_total.value('help', 'success')
+        writes = metrics.runner_db_writes_total.value()
+        output = metrics.output_bytes_total.value('help')
+
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SUCCESS)
+        self.assertEqual(metrics.runs_total.value('help', 'success'), runs + 1)
+        self.assertGreater(metrics.runner_db_writes_total.value(), writes)
+        self.assertGreater(metrics.output_bytes_total.value('help'), output)
+
+    def test_histogram_render(self):
+        from .metrics import Histogram
+
+        histogram = Histogram('test_seconds', 'Test', ('command',), buckets=(1, 10))
+        for value in (0.5, 5, 50):
+            histogram.observe(value, 'help')
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{command="help",le="1"} 1', lines)
+        self.assertIn('test_seconds_bucket{command="help",le="10"} 2', lines)
+        self.assertIn('test_seconds_bucket{command="help",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{command="help"} 55.5', lines)
+        self.assertIn('test_seconds_count{command="help"} 3', lines)
+
+    def test_metrics_view(self):
+        from django.test import override_settings
+        from django.urls import reverse
+
+        url = reverse('django_jobs:metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_PENDING,
+                                  scheduled_for=timezone.now() - timezone.timedelta(seconds=90))
+        CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+        with override_settings(DJANGO_JOBS_METRICS_ENABLED=True):
+            body = self.client.get(url).content.decode()
+        self.assertIn('django_jobs_pending_runs{state="due"} 1', body)
+        self.assertIn('django_jobs_running_runs{command="help"} 1', body)
+        self.assertIn('# TYPE django_jobs_run_duration_seconds histogram', body)
+
+        with override_settings(DJANGO_JOBS_METRICS_ENABLED=True, DJANGO_JOBS_METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(url).status_code, 401)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_metrics_server_listens_on_localhost(self):
+        from urllib.request import urlopen
+        from . import metrics
+
+        server = metrics.serve(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        address, port = server.server_address
+        self.assertEqual(address, '127.0.0.1')
+        with urlopen(f'http://127.0.0.1:{port}/metrics', timeout=10) as response:
+            self.assertIn(b'django_jobs_runs_total', response.read())
+
+
+class StatsTestCase(TestCase):
+    def test_sketch_quantiles(self):
+        from .stats import DurationSketch
+
+        sketch = DurationSketch()
+        for seconds in range(1, 1001):
+            sketch.add(seconds)
+        # Round-trips through JSON and stays within the relative accuracy
+        sketch = DurationSketch(sketch.to_json())
+        self.assertAlmostEqual(sketch.quantile(0.5), 500, delta=500 * 0.03)
+        self.assertAlmostEqual(sketch.quantile(0.99), 990, delta=990 * 0.03)
+
+        other = DurationSketch()
+        other.add(5000, count=1000)
+        sketch.merge(other)
+        self.assertEqual(sketch.count, 2000)
+        self.assertAlmostEqual(sketch.quantile(0.75), 5000, delta=5000 * 0.03)
+
+    def test_rollup_survives_delete_logs(self):
+        from io import StringIO
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+        from .models import CommandStats
+        from .stats import summarize
+
+        schedule = CommandSchedule.objects.create(command_name='help')
+        schedule.run_job()
+        schedule.run_job()
+        failing = CommandSchedule.objects.create(command_name='check', arguments={'_positional': ['no_such_app']})
+        failing.run_job()
+
+        row = CommandStats.objects.get(command_name='help')
+        self.assertEqual((row.success_count, row.duration_count, row.lag_count), (2, 2, 2))
+        self.assertTrue(0 < row.duration_min <= row.duration_max)
+
+        call_command('delete_logs', '--days', '0', stdout=StringIO())
+        self.assertFalse(CommandLog.objects.exists())
+
+        summaries = {item['command_name']: item for item in summarize(timezone.now() - timezone.timedelta(hours=1))}
+        self.assertEqual(summaries['help']['runs'], 2)
+        self.assertEqual(summaries['check']['failure_rate'], 1)
+        self.assertIsNotNone(summaries['help']['p95'])
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('admin:django_jobs_commandlog_stats'), {'hours': '168'})
+        self.assertContains(response, 'help')
+
+    def test_rebuild_from_logs(self):
+        from .models import CommandStats
+        from .stats import rebuild
+
+        now = timezone.now()
+        for seconds, status in ((10, CommandLog.STATUS_SUCCESS), (30, CommandLog.STATUS_FAILURE),
+                                (0, CommandLog.STATUS_SKIPPED)):
+            CommandLog.objects.create(command_name='help', status=status, started_at=now,
+                                      duration=timezone.timedelta(seconds=seconds))
+        CommandStats.objects.create(command_name='help', hour=now - timezone.timedelta(days=60), success_count=5)
+
+        self.assertEqual(rebuild(), 1)
+        row = CommandStats.objects.get(command_name='help', hour=now.replace(minute=0, second=0, microsecond=0))
+        self.assertEqual((row.success_count, row.failure_count, row.skipped_count), (1, 1, 1))
+        self.assertEqual((row.duration_count, row.duration_sum, row.duration_max), (2, 40, 30))
+        # Hours without logs keep their statistics
+        self.assertEqual(CommandStats.objects.count(), 2)
+
+
+class DurationBaselineTestCase(TestCase):
+    def make_log(self, seconds):
+        now = timezone.now()
+        return CommandLog(command_name='help', status=CommandLog.STATUS_SUCCESS,
+                          started_at=now - timezone.timedelta(seconds=seconds),
+                          duration=timezone.timedelta(seconds=seconds))
+
+    def test_flags_slow_and_fast_runs(self):
+        from .models import DurationBaseline
+
+        for i in range(20):
+            DurationBaseline.observe(self.make_log(10 + i % 3))
+
+        normal = self.make_log(11.5)
+        DurationBaseline.observe(normal)
+        self.assertEqual(normal.duration_anomaly, '')
+        self.assertLess(abs(normal.duration_score), 3)
+
+        slow = self.make_log(40)
+        DurationBaseline.observe(slow)
+        self.assertEqual(slow.duration_anomaly, 'slow')
+
+        fast = self.make_log(2)
+        DurationBaseline.observe(fast)
+        self.assertEqual(fast.duration_anomaly, 'fast')
+
+        # Failed runs do not count
+        failed = self.make_log(500)
+        failed.status = CommandLog.STATUS_FAILURE
+        DurationBaseline.observe(failed)
+        self.assertEqual(failed.duration_anomaly, '')
+        self.assertEqual(DurationBaseline.objects.get(command_name='help').runs, 23)
+
+    def test_gradual_slowdown_shows_in_trend(self):
+        from .models import DurationBaseline
+
+        baseline = DurationBaseline(command_name='help')
+        for i in range(100):
+            baseline.add(10)
+        self.assertFalse(baseline.regressed)
+
+        # Three times slower over a week of hourly runs: no single run stands out
+        flagged = 0
+        for i in range(168):
+            seconds = 10 * 3 ** (i / 167)
+            flagged += abs(baseline.score(seconds)) >= 3
+            baseline.add(seconds)
+        self.assertEqual(flagged, 0)
+        self.assertTrue(baseline.regressed)
+        self.assertGreater(baseline.trend, 1.5)
+
+    def test_runs_update_baseline_and_rebuild(self):
+        from .models import DurationBaseline
+
+        schedule = CommandSchedule.objects.create(command_name='help')
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertIsNone(log.duration_score)  # Still warming up
+        self.assertEqual(DurationBaseline.objects.get(command_name='help').runs, 1)
+
+        DurationBaseline.objects.all().delete()
+        self.assertEqual(DurationBaseline.rebuild(), 1)
+        baseline = DurationBaseline.objects.get(command_name='help')
+        self.assertAlmostEqual(baseline.typical_duration, log.duration.total_seconds(), places=3)
+
+
+class ProgressTestCase(TestCase):
+    def test_progress_reaches_runner(self):
+        import os
+        import subprocess
+        import sys
+        from .progress import ProgressReader
+
+        reader = ProgressReader()
+        script = (
+            'from django_jobs.progress import report_progress\n'
+            'report_progress(1, 4, "first")\n'
+            'report_progress(2, 4, "throttled")\n'
+            'report_progress(4, 4, "done")\n'
+        )
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(reader.child_env(), PYTHONPATH=path)
+        try:
+            process = subprocess.Popen([sys.executable, '-c', script], pass_fds=(reader.write_fd,), env=env)
+        finally:
+            reader.started()
+        process.wait(timeout=10)
+        self.assertEqual(reader.poll(), (4, 4, 'done'))
+        self.assertEqual(reader.fields(), {'progress_done': 4, 'progress_total': 4, 'progress_message': 'done'})
+        self.assertIsNone(reader.poll())
+        reader.close()
+
+    def test_invalid_updates_are_dropped(self):
+        import json
+        import os
+        from .progress import ProgressReader
+
+        reader = ProgressReader()
+        updates = [
+            {'done': 1, 'total': 4, 'message': 'first'},
+            {'done': -1, 'total': 4},
+            {'done': 2, 'total': 'four'},
+            {'done': True, 'total': 4},
+            {'done': 2.5, 'total': 4},
+            {'done': 2 ** 64, 'total': None},
+            {'done': 2, 'total': 4, 'message': ['not', 'text']},
+        ]
+        os.write(reader.write_fd, ''.join(json.dumps(update) + '\n' for update in updates).encode())
+        reader.started()
+        self.assertEqual(reader.poll(), (1, 4, 'first'))
+        reader.close()
+
+    def test_progress_pipe_is_closed_if_spawning_fails(self):
+        import os
+
+        schedule = CommandSchedule.objects.create(command_name='help')
+        with mock.patch('subprocess.Popen', side_effect=OSError('no such command')), \
+                mock.patch('django_jobs.models.ProgressReader.close', autospec=True,
+                           side_effect=lambda reader: os.close(reader.read_fd)) as close:
+            log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_FAILURE)
+        self.assertEqual(close.call_count, 1)
+
+    def test_report_progress_outside_runner_is_a_no_op(self):
+        from . import progress
+
+        with mock.patch.dict('os.environ', {}, clear=True), mock.patch.object(progress, '_fd', None):
+            self.assertFalse(progress.report_progress(1, 2))
+
+    def test_estimate_remaining(self):
+        from datetime import timedelta
+        from .models import DurationBaseline
+
+        now = timezone.now()
+        log = CommandLog(command_name='help', status=CommandLog.STATUS_RUNNING, started_at=now - timedelta(seconds=30))
+        # Falls back to past durations before any progress is reported
+        self.assertIsNone(log.estimate_remaining(now=now))
+        baseline = DurationBaseline(command_name='help')
+        baseline.add(100)
+        baseline.save()
+        self.assertAlmostEqual(log.estimate_remaining(now=now).total_seconds(), 70)
+
+        log.progress_done, log.progress_total = 3, 4
+        self.assertEqual(log.progress_percent, 75)
+        self.assertEqual(log.estimate_remaining(now=now), timedelta(seconds=10))
+
+        log.status = CommandLog.STATUS_SUCCESS
+        self.assertIsNone(log.estimate_remaining(now=now))
+
+
+class DebuggingTestCase(TestCase):
+    def test_stack_dump_of_child(self):
+        import os
+        import subprocess
+        import sys
+        import time
+        from . import debugging
+        from .progress import ProgressReader
+
+        reader = ProgressReader()
+        script = (
+            'from django_jobs.debugging import install_child_hooks\n'
+            'install_child_hooks()\n'
+            'import time\n'
+            'time.sleep(30)\n'
+        )
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            process = subprocess.Popen([sys.executable, '-c', script], pass_fds=(reader.write_fd,),
+                                       env=dict(reader.child_env(), PYTHONPATH=path), stderr=subprocess.PIPE)
+        finally:
+            reader.started()
+        # Not signalled before the handler is installed
+        self.assertIn('not available', debugging.request_stack_dump(process, reader))
+
+        deadline = time.monotonic() + 10
+        while not reader.stack_dumps and time.monotonic() < deadline:
+            reader.poll()
+            time.sleep(0.05)
+        self.assertIn('requested', debugging.request_stack_dump(process, reader))
+        time.sleep(0.5)
+        process.kill()
+        _, stderr = process.communicate(timeout=10)
+        reader.close()
+        self.assertIn(b'most recent call first', stderr)
+
+    def test_profile_next_run(self):
+        schedule = CommandSchedule.objects.create(command_name='help', profile_next_run=True)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SUCCESS)
+        self.assertIn('function calls', log.profile)
+        schedule.refresh_from_db()
+        self.assertFalse(schedule.profile_next_run)
+
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.profile, '')
+
+    def test_dump_stacks_action_flags_running_runs_and_shards(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+
+        parent = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+        shard = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING, parent=parent)
+        done = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_SUCCESS)
+
+        model_admin = site._registry[CommandLog]
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.dump_stacks(RequestFactory().post('/'), CommandLog.objects.filter(pk__in=[parent.pk, done.pk]))
+        flagged = set(CommandLog.objects.filter(stack_dump_requested=True).values_list('pk', flat=True))
+        self.assertEqual(flagged, {parent.pk, shard.pk})
+
+
+class SkipIfUnchangedTestCase(TestCase):
+    def setUp(self):
+        DATA_VERSION['value'] = 1
+        self.schedule = CommandSchedule.objects.create(
+            command_name='check', skip_if_unchanged=True, fingerprint='django_jobs.tests.data_version')
+
+    def pending_run(self, arguments=None, trigger=CommandLog.TRIGGER_CRON):
+        return CommandLog.objects.create(command_name='check', arguments=arguments or {}, trigger=trigger).pk
+
+    def test_unchanged_run_is_skipped_without_starting_a_process(self):
+        first = CommandLog.objects.get(pk=self.schedule.run_job(trigger=CommandLog.TRIGGER_CRON))
+        self.assertEqual(first.status, CommandLog.STATUS_SUCCESS)
+        self.assertEqual(first.memo_key, self.schedule.memo_key({}))
+
+        with mock.patch('django_jobs.models.subprocess.Popen') as popen:
+            second = CommandLog.objects.get(pk=self.schedule.run_job(trigger=CommandLog.TRIGGER_CRON))
+        popen.assert_not_called()
+        self.assertEqual(second.status, CommandLog.STATUS_SKIPPED)
+        self.assertIn(f'unchanged since run {first.pk}', second.output)
+
+    def test_unchanged_run_does_not_replace_a_running_instance(self):
+        running = CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_RUNNING)
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS,
+                                  memo_key=self.schedule.memo_key({}))
+        self.schedule.max_instances = 1
+        self.schedule.on_limit = CommandSchedule.ON_LIMIT_REPLACE
+        self.schedule.save()
+
+        log = CommandLog.objects.get(pk=self.schedule.run_job(trigger=CommandLog.TRIGGER_CRON))
+        self.assertEqual(log.status, CommandLog.STATUS_SKIPPED)
+        running.refresh_from_db()
+        self.assertFalse(running.cancel_requested)
+
+    def test_run_picked_up_elsewhere_is_not_skipped(self):
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS,
+                                  memo_key=self.schedule.memo_key({}))
+        log_id = self.pending_run()
+        CommandLog.objects.filter(pk=log_id).update(status=CommandLog.STATUS_RUNNING)
+        self.assertIsNone(self.schedule._skip_if_unchanged(log_id))
+        self.assertEqual(CommandLog.objects.get(pk=log_id).status, CommandLog.STATUS_RUNNING)
+
+    def test_changed_inputs_run(self):
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS,
+                                  memo_key=self.schedule.memo_key({}))
+
+        self.assertIsNone(self.schedule._skip_if_unchanged(self.pending_run({'tag': ['models']})))
+        self.assertIsNone(self.schedule._skip_if_unchanged(self.pending_run(trigger=CommandLog.TRIGGER_MANUAL)))
+        DATA_VERSION['value'] = 2
+        log_id = self.pending_run()
+        self.assertIsNone(self.schedule._skip_if_unchanged(log_id))
+        self.assertEqual(CommandLog.objects.get(pk=log_id).memo_key, self.schedule.memo_key({}))
+
+    def test_only_the_last_success_within_the_ttl_counts(self):
+        from datetime import timedelta
+
+        last = CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS,
+                                         memo_key=self.schedule.memo_key({}))
+        self.assertIsNotNone(self.schedule._skip_if_unchanged(self.pending_run()))
+
+        self.schedule.unchanged_ttl = 3600
+        CommandLog.objects.filter(pk=last.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(self.schedule._skip_if_unchanged(self.pending_run()))
+
+        # A failure does not reset the result, but a newer success with other inputs does
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_FAILURE,
+                                  memo_key=self.schedule.memo_key({}))
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS, memo_key='other')
+        self.assertIsNone(self.schedule._skip_if_unchanged(self.pending_run()))
+
+    def test_failing_fingerprint_runs_the_command(self):
+        CommandLog.objects.create(command_name='check', status=CommandLog.STATUS_SUCCESS,
+                                  memo_key=self.schedule.memo_key({}))
+        with mock.patch('django_jobs.tests.data_version', side_effect=RuntimeError('database down')):
+            self.assertIsNone(self.schedule._skip_if_unchanged(self.pending_run()))
+
+    def test_fingerprint_must_be_importable(self):
+        self.schedule.fingerprint = 'django_jobs.tests.missing'
+        with self.assertRaises(ValidationError):
+            self.schedule.full_clean()
+
+
+class CheckpointTestCase(TestCase):
+    def setUp(self):
+        from . import checkpoints
+
+        self.schedule = CommandSchedule.objects.create(command_name='check')
+        self.first = CommandLog.objects.create(command_name='check')
+        self.addCleanup(setattr, checkpoints, '_scope', None)
+
+    def run_as(self, log):
+        """Make this process look like the command of ``log``"""
+        import os
+        from . import checkpoints
+
+        checkpoints._scope = None
+        return mock.patch.dict(os.environ, checkpoints.child_env(self.schedule, log))
+
+    def test_child_env(self):
+        from .checkpoints import child_env
+
+        retry = CommandLog.objects.create(command_name='check', attempt=2, retry_of=self.first)
+        shard = CommandLog.objects.create(command_name='check', parent=retry, shard_index=0)
+        run = f'{self.schedule.pk}:{self.first.pk}'
+        self.assertEqual(child_env(self.schedule, self.first), {'DJANGO_JOBS_CHECKPOINT': run})
+        self.assertEqual(child_env(self.schedule, retry), {'DJANGO_JOBS_CHECKPOINT': run, 'DJANGO_JOBS_RESUME': '1'})
+        self.assertEqual(child_env(self.schedule, shard), {'DJANGO_JOBS_CHECKPOINT': run, 'DJANGO_JOBS_RESUME': '1'})
+        self.assertEqual(child_env(CommandSchedule(command_name='check'), self.first), {})
+
+    def test_retry_resumes_from_checkpoint_of_failed_attempt(self):
+        from .checkpoints import load_checkpoint, resuming, save_checkpoint
+        from .models import Checkpoint
+
+        self.assertFalse(save_checkpoint('last_id', 1))
+        self.assertEqual(load_checkpoint('last_id', 0), 0)
+
+        with self.run_as(self.first):
+            self.assertFalse(resuming())
+            self.assertEqual(load_checkpoint('last_id', 0), 0)
+            self.assertTrue(save_checkpoint('last_id', 1))
+            self.assertTrue(save_checkpoint('last_id', 170))
+
+        retry = CommandLog.objects.create(command_name='check', attempt=2, retry_of=self.first)
+        with self.run_as(retry):
+            self.assertTrue(resuming())
+            self.assertEqual(load_checkpoint('last_id', 0), 170)
+
+        # The next run starts over and takes the key over
+        with self.run_as(CommandLog.objects.create(command_name='check')):
+            self.assertFalse(resuming())
+            self.assertEqual(load_checkpoint('last_id', 0), 0)
+            save_checkpoint('last_id', 5)
+        self.assertEqual(Checkpoint.objects.get(schedule=self.schedule, key='last_id').value, 5)
+
+    def test_runner_passes_checkpoint_scope(self):
+        schedule = CommandSchedule.objects.create(
+            command_name='shell', arguments={'command': 'import os; print(os.environ["DJANGO_JOBS_CHECKPOINT"])'})
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SUCCESS, log.output)
+        self.assertIn(f'{schedule.pk}:{log.pk}', log.output)
+
+    def test_delete_logs_keeps_checkpoints(self):
+        from datetime import timedelta
+        from .management.commands.delete_logs import delete_logs
+        from .models import Checkpoint
+
+        checkpoint = Checkpoint.objects.create(schedule=self.schedule, key='last_id', value=1, run=self.first)
+        delete_logs(timezone.now() + timedelta(seconds=1))
+        checkpoint.refresh_from_db()
+        self.assertIsNone(checkpoint.run)
+
+
+class TracingTestCase(TestCase):
+    def test_run_is_traced_by_phase(self):
+        from django.test import override_settings
+
+        payloads = []
+        # Not 'help', which never reaches BaseCommand.execute
+        schedule = CommandSchedule.objects.create(command_name='check')
+        with override_settings(DJANGO_JOBS_TRACE_EXPORTER=payloads.append):
+            log_id = schedule.run_job()
+
+        self.assertEqual(len(payloads), 1)
+        spans = {span['name']: span for span in payloads[0]['resourceSpans'][0]['scopeSpans'][0]['spans']}
+        self.assertEqual(set(spans), {'run', 'queue_wait', 'claim', 'spawn', 'process', 'django_setup', 'handle',
+                                      'output_flush', 'final_db_write', 'follow_up'})
+        root = spans['run']
+        self.assertNotIn('parentSpanId', root)
+        self.assertEqual(spans['handle']['parentSpanId'], spans['process']['spanId'])
+        self.assertEqual(spans['claim']['parentSpanId'], root['spanId'])
+        self.assertEqual(len({span['traceId'] for span in spans.values()}), 1)
+        for span in spans.values():
+            self.assertLessEqual(int(span['startTimeUnixNano']), int(span['endTimeUnixNano']))
+            self.assertGreaterEqual(int(span['startTimeUnixNano']), int(root['startTimeUnixNano']))
+        attributes = {item['key']: item['value'] for item in root['attributes']}
+        self.assertEqual(attributes['django_jobs.log_id'], {'intValue': str(log_id)})
+        self.assertEqual(attributes['django_jobs.status'], {'stringValue': 'Success'})
+
+    def test_file_exporter_writes_one_line_per_trace(self):
+        import json
+        import os
+        import tempfile
+        from django.test import override_settings
+        from . import tracing
+
+        trace = tracing.Trace(**{'django_jobs.command': 'help'})
+        with trace.span('claim'):
+            pass
+        trace.finish()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces.jsonl')
+            with override_settings(DJANGO_JOBS_TRACE_FILE=path):
+                tracing.export(trace)
+                tracing.export(trace)
+            with open(path) as trace_file:
+                lines = trace_file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        spans = json.loads(lines[0])['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual([span['name'] for span in spans], ['run', 'claim'])
+
+    def test_bad_exporter_path_does_not_fail_the_run(self):
+        from django.test import override_settings
+
+        schedule = CommandSchedule.objects.create(command_name='help')
+        with override_settings(DJANGO_JOBS_TRACE_EXPORTER='django_jobs.tracing.missing_exporter'), \
+                mock.patch('builtins.print') as print_:
+            log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SUCCESS)
+        self.assertTrue(any('Error exporting trace' in str(call) for call in print_.call_args_list))
+
+
+class ReaperTestCase(TestCase):
+    def test_reap_stale_running_logs(self):
+        from datetime import timedelta
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import CommandStats
+
+        old = timezone.now() - timedelta(minutes=10)
+        stale = CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=old, heartbeat_at=old)
+        legacy = CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=old)
+        alive = CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=old, heartbeat_at=timezone.now())
+
+        with CaptureQueriesContext(connection) as queries:
+            reaped = CommandLog.reap_stale(stale_after=60)
+        # Find, mark and reload the stale runs, however many there are
+        self.assertEqual(len([query for query in queries if 'django_jobs_commandlog' in query['sql']]), 3)
+        self.assertEqual(CommandStats.objects.get(command_name='help').lost_count, 2)
+
+        self.assertEqual({log.pk for log in reaped}, {stale.pk, legacy.pk})
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, CommandLog.STATUS_LOST)
+        self.assertGreater(stale.duration.total_seconds(), 0)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, CommandLog.STATUS_RUNNING)
+
+    def test_reaper_only_kills_the_process_the_run_started(self):
+        import signal
+        import socket
+        import subprocess
+        import sys
+        from datetime import timedelta
+
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'], start_new_session=True)
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        old = timezone.now() - timedelta(minutes=10)
+        hostname = socket.gethostname()
+        # The same pid, once as the run's own process and once as a reused pid of an older run
+        own = CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=timezone.now() - timedelta(seconds=1),
+            heartbeat_at=old, hostname=hostname, pid=process.pid)
+        CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=old,
+            heartbeat_at=old, hostname=hostname, pid=process.pid)
+
+        with mock.patch('django_jobs.models.kill_group') as kill_group:
+            CommandLog.reap_stale(stale_after=60)
+        kill_group.assert_called_once_with(process.pid, signal.SIGKILL)
+        own.refresh_from_db()
+        self.assertEqual(own.status, CommandLog.STATUS_LOST)
+
+    def test_reaper_skips_runs_that_came_back(self):
+        from datetime import timedelta
+        from .models import CommandStats
+
+        old = timezone.now() - timedelta(minutes=10)
+        log = CommandLog.objects.create(
+            command_name='help', status=CommandLog.STATUS_RUNNING, started_at=old, heartbeat_at=old)
+        stale = CommandLog.objects.filter
+
+        # The runner sends a heartbeat between the search and the update
+        def filter_then_heartbeat(*args, **kwargs):
+            queryset = stale(*args, **kwargs)
+            if 'pk__in' in kwargs and 'status' in kwargs and kwargs['status'] == CommandLog.STATUS_RUNNING:
+                stale(pk=log.pk).update(heartbeat_at=timezone.now())
+            return queryset
+
+        with mock.patch.object(CommandLog.objects, 'filter', side_effect=filter_then_heartbeat):
+            self.assertEqual(CommandLog.reap_stale(stale_after=60), [])
+        log.refresh_from_db()
+        self.assertEqual(log.status, CommandLog.STATUS_RUNNING)
+        self.assertFalse(CommandStats.objects.filter(command_name='help').exists())
+
+    def test_run_job_writes_heartbeat(self):
+        schedule = CommandSchedule.objects.create(command_name='help')
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertTrue(log.hostname)
+        self.assertIsNotNone(log.pid)
+        self.assertIsNotNone(log.heartbeat_at)
+
+
+class ConcurrencyTestCase(TestCase):
+    def setUp(self):
+        self.running = CommandLog.objects.create(command_name='help', status=CommandLog.STATUS_RUNNING)
+
+    def test_max_instances_skip(self):
+        schedule = CommandSchedule.objects.create(command_name='help', max_instances=1)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SKIPPED)
+
+    def test_max_instances_queue(self):
+        schedule = CommandSchedule.objects.create(
+            command_name='help', max_instances=1, on_limit=CommandSchedule.ON_LIMIT_QUEUE)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_PENDING)
+        self.assertIsNotNone(log.scheduled_for)
+
+        # Still blocked: stays queued
+        self.assertEqual(CommandSchedule.run_pending_jobs(), 1)
+        self.assertEqual(CommandLog.objects.get(pk=log.pk).status, CommandLog.STATUS_PENDING)
+
+        # Slot freed: the queued run is picked up
+        self.running.set_success('done')
+        CommandSchedule.run_pending_jobs()
+        self.assertTrue(CommandLog.objects.get(pk=log.pk).is_finished)
+
+    def test_max_instances_replace(self):
+        schedule = CommandSchedule.objects.create(
+            command_name='help', max_instances=1, on_limit=CommandSchedule.ON_LIMIT_REPLACE)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertIn(log.status, [CommandLog.STATUS_SUCCESS, CommandLog.STATUS_FAILURE])
+        self.running.refresh_from_db()
+        self.assertTrue(self.running.cancel_requested)
+
+    def test_shared_concurrency_key(self):
+        limit = ConcurrencyLimit.objects.create(key='external-api', max_concurrent=1)
+        CommandLog.objects.create(
+            command_name='check', status=CommandLog.STATUS_RUNNING, concurrency_key='external-api')
+        schedule = CommandSchedule.objects.create(command_name='help', concurrency_limit=limit)
+        log = CommandLog.objects.get(pk=schedule.run_job())
+        self.assertEqual(log.status, CommandLog.STATUS_SKIPPED)
+
+    def test_admin_running_count(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+
+        ConcurrencyLimit.objects.create(key='external-api', max_concurrent=2)
+        ConcurrencyLimit.objects.create(key='idle', max_concurrent=2)
+        for status in (CommandLog.STATUS_RUNNING, CommandLog.STATUS_RUNNING, CommandLog.STATUS_SUCCESS):
+            CommandLog.objects.create(command_name='check', status=status, concurrency_key='external-api')
+
+        model_admin = site._registry[ConcurrencyLimit]
+        limits = {limit.key: limit for limit in model_admin.get_queryset(RequestFactory().get('/'))}
+        self.assertEqual(model_admin.running_count(limits['external-api']), 2)
+        self.assertEqual(model_admin.running_count(limits['idle']), 0)
+
+    def test_log_is_claimed_once(self):
+        schedule = CommandSchedule.objects.create(command_name='help')
+        log = CommandLog.objects.create(command_name='help')
+        self.assertTrue(schedule._claim_run(log.pk))
+        self.assertFalse(schedule._claim_run(log.pk))
+
+
+class ResourceMonitorTestCase(TestCase):
+    def test_monitor_reaps_and_samples(self):
+        import subprocess
+        import sys
+        import time
+        from .resources import ResourceMonitor
+
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(0.3)'])
+        monitor = ResourceMonitor(process, sample_interval=0)
+        while monitor.poll() is None:
+            time.sleep(0.05)
+
+        self.assertEqual(process.returncode, 0)
+        fields = monitor.usage_fields()
+        self.assertGreater(fields['max_rss_kb'], 0)
+        self.assertGreaterEqual(fields['cpu_user_time'], 0)
+        if sys.platform.startswith('linux'):
+            self.assertTrue(fields['resource_samples'])
+            self.assertEqual(len(fields['resource_samples'][0]), 3)
+
+
+class ExecutorTestCase(TestCase):
+    def test_worker_connections_are_released(self):
+        """Connections opened by a job are counted while held and closed afterwards"""
+        from django.db import connection
+        from . import executor
+
+        def job():
+            connection.ensure_connection()
+            return executor.held_connections()
+
+        held_during_job = executor.submit(job).result(timeout=10)
+        self.assertEqual(held_during_job, 1)
+        self.assertEqual(executor.held_connections(), 0)
+
 
 class CommandLogTestCase(TestCase):
+    def test_create_all_sets_primary_keys_without_bulk_insert_returning(self):
+        from django.db import connection
+
+        for can_return in (True, False):
+            with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', can_return):
+                logs = CommandLog.create_all([CommandLog(command_name='help'), CommandLog(command_name='check')])
+            self.assertTrue(all(log.pk for log in logs))
+            self.assertEqual(CommandLog.objects.get(pk=logs[1].pk).command_name, 'check')
+
+    def test_delete_logs_unlinks_references_to_deleted_shards(self):
+        from datetime import timedelta
+        from io import StringIO
+        from .models import Checkpoint
+
+        old = timezone.now() - timedelta(days=60)
+        parent = CommandLog.objects.create(command_name='help', started_at=old)
+        # Started after the cutoff, but deleted with its parent
+        shard = CommandLog.objects.create(command_name='help', parent=parent, started_at=timezone.now())
+        retry = CommandLog.objects.create(command_name='help', retry_of=shard, pipeline_root=shard)
+        schedule = CommandSchedule.objects.create(command_name='help')
+        checkpoint = Checkpoint.objects.create(schedule=schedule, key='last_id', value=1, run=shard)
+
+        out = StringIO()
+        call_command('delete_logs', days=30, stdout=out)
+        self.assertIn('Deleted 2 logs', out.getvalue())
+        self.assertEqual(list(CommandLog.objects.values_list('pk', flat=True)), [retry.pk])
+        retry.refresh_from_db()
+        self.assertIsNone(retry.retry_of_id)
+        self.assertIsNone(retry.pipeline_root_id)
+        checkpoint.refresh_from_db()
+        self.assertIsNone(checkpoint.run_id)
+
     def test_command_log_creation(self):
         log = CommandLog.objects.create(
             command_name='test_command',
@@ -131,4 +1429,249 @@ class CommandLogTestCase(TestCase):
         self.assertEqual(log.status, CommandLog.STATUS_FAILURE)
         self.assertEqual(log.output, 'Error output')
         self.assertIsNotNone(log.ended_at)
-        self.assertIsNotNone(log.duration)
\ No newline at end of file
+        self.assertIsNotNone(log.duration)
+
+class RunAgainTestCase(TestCase):
+    def test_run_again_prefills_arguments_without_changing_the_schedule(self):
+        from django.contrib.admin.sites import site
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+
+        schedule = CommandSchedule.objects.create(command_name='check', arguments={'deploy': True})
+        log = CommandLog.objects.create(command_name='check', arguments={'tag': ['models']})
+
+        button = site._registry[CommandLog].display_run_again_button(log)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.arguments, {'deploy': True})
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        url = reverse('admin:django_jobs_commandschedule_run_with_args')
+        self.assertIn(f'{url}?id={schedule.pk}&amp;log={log.pk}', button)
+        response = self.client.get(url, {'id': schedule.pk, 'log': log.pk})
+        self.assertEqual(response.context['form'].initial, {'arguments': {'tag': ['models']}})
+
+
+class ReadReplicaTestCase(TestCase):
+    def read_dbs(self, request):
+        """Aliases the router picked for CommandLog reads during ``request()``"""
+        from .routers import ReadReplicaRouter
+
+        picked = []
+        original = ReadReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = original(router, model, **hints)
+            if model is CommandLog:
+                picked.append(alias)
+            return alias
+
+        with mock.patch.object(ReadReplicaRouter, 'db_for_read', spy):
+            request()
+        return picked
+
+    def test_router(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from .routers import ReadReplicaRouter, replica_reads
+
+        router = ReadReplicaRouter()
+        with override_settings(DJANGO_JOBS_READ_DB='replica'):
+            self.assertIsNone(router.db_for_read(CommandLog))
+            with replica_reads():
+                self.assertEqual(router.db_for_read(CommandLog), 'replica')
+                self.assertIsNone(router.db_for_read(User))
+            self.assertIsNone(router.db_for_read(CommandLog))
+
+            log = CommandLog(command_name='check')
+            log._state.db = 'replica'
+            self.assertEqual(router.db_for_write(CommandLog, instance=log), 'default')
+            self.assertIsNone(router.db_for_write(CommandLog))
+
+        with replica_reads():
+            self.assertIsNone(router.db_for_read(CommandLog))
+
+    def test_admin_reads_replica_until_session_starts_a_job(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from django.urls import reverse
+
+        schedule = CommandSchedule.objects.create(command_name='check')
+        log = CommandLog.objects.create(command_name='check')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        changelist = reverse('admin:django_jobs_commandlog_changelist')
+        status = reverse('admin:job_status', args=[log.pk])
+
+        # The test database stands in for the replica
+        with override_settings(DATABASE_ROUTERS=['django_jobs.routers.ReadReplicaRouter'],
+                               DJANGO_JOBS_READ_DB='default'):
+            for url in (changelist, reverse('admin:django_jobs_commandlog_change', args=[log.pk]), status):
+                picked = self.read_dbs(lambda: self.assertEqual(self.client.get(url).status_code, 200))
+                self.assertTrue(picked)
+                self.assertEqual(set(picked), {'default'}, url)
+
+            with mock.patch.object(CommandSchedule, 'enqueue_jobs', return_value=[log.pk]):
+                self.client.post(reverse('admin:django_jobs_commandschedule_run_with_args'),
+                                 {'apply': '1', '_selected_action': [schedule.pk], 'arguments': ''})
+            picked = self.read_dbs(lambda: self.client.get(status))
+            self.assertEqual(set(picked), {None})
+
+        picked = self.read_dbs(lambda: self.client.get(changelist))
+        self.assertEqual(set(picked), set())
+
+
+class QueryBudgetTestCase(TestCase):
+    """Hot paths must issue the same number of queries for 10 rows as for 1000"""
+    SMALL = 10
+    LARGE = 1000
+
+    def count_queries(self, setup, action, size):
+        """Queries issued by ``action`` after ``setup(size)``
+
+        A bulk insert that the database splits into batches (SQLite allows
+        999 parameters per statement) counts as one query.
+        """
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        # Every measurement starts from the same database
+        with transaction.atomic():
+            setup(size)
+            with CaptureQueriesContext(connection) as queries:
+                action()
+            transaction.set_rollback(True)
+
+        count = 0
+        previous = None
+        for query in queries:
+            statement = query['sql'].split(' VALUES ')[0] if query['sql'].startswith('INSERT') else None
+            if statement is None or statement != previous:
+                count += 1
+            previous = statement
+        return count
+
+    def assertConstantQueries(self, setup, action, budget):
+        small = self.count_queries(setup, action, self.SMALL)
+        large = self.count_queries(setup, action, self.LARGE)
+        self.assertEqual(small, large, f"{small} queries for {self.SMALL} rows but {large} for {self.LARGE}")
+        self.assertLessEqual(large, budget)
+
+    def create_schedules(self, size, **fields):
+        CommandSchedule.objects.bulk_create([
+            CommandSchedule(command_name=f'command_{index}', active=True, **fields) for index in range(size)])
+
+    def create_logs(self, size, **fields):
+        CommandLog.objects.bulk_create([
+            CommandLog(command_name=f'command_{index % 50}', status=CommandLog.STATUS_SUCCESS,
+                       arguments={'index': index}, **fields)
+            for index in range(size)])
+
+    def admin_client(self):
+        from django.contrib.auth.models import User
+        from django.test import Client
+
+        client = Client()
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        return client
+
+    def test_run_jobs_tick(self):
+        from io import StringIO
+        from .management.commands.run_jobs import Command
+
+        def setup(size):
+            # All due this minute; half of them already ran
+            self.create_schedules(size, schedule_minute='*', schedule_hour='*', schedule_day='*')
+            self.create_logs(size // 2)
+
+        with mock.patch.object(CommandSchedule, 'run_job', return_value=0):
+            self.assertConstantQueries(setup, lambda: Command(stdout=StringIO()).tick(timezone.now()), budget=5)
+
+    def test_sync_jobs(self):
+        from io import StringIO
+        from django.test import override_settings
+
+        def setup(size):
+            self.create_schedules(size // 2)
+            self.commands = {f'command_{index}': 'app' for index in range(size)}
+
+        def action():
+            with mock.patch('django_jobs.management.commands.sync_jobs.get_commands', return_value=self.commands), \
+                    override_settings(DJANGO_JOBS_INCLUDE_APPS=None, DJANGO_JOBS_EXCLUDE_COMMANDS=[]):
+                call_command('sync_jobs', create_missing=True, stdout=StringIO())
+            self.assertEqual(CommandSchedule.objects.count(), len(self.commands))
+
+        self.assertConstantQueries(setup, action, budget=3)
+
+    def test_delete_logs(self):
+        from io import StringIO
+
+        def setup(size):
+            self.create_logs(size, started_at=timezone.now() - timezone.timedelta(days=60))
+            first, second = CommandLog.objects.order_by('pk')[:2]
+            # A retry and a workflow step that reference an old run but are kept
+            CommandLog.objects.create(command_name='retry', retry_of=first, pipeline_root=second)
+            CommandLog.objects.create(command_name='shard', parent=first)
+
+        def action():
+            call_command('delete_logs', days=30, stdout=StringIO())
+            self.assertEqual(set(CommandLog.objects.values_list('command_name', flat=True)), {'retry'})
+            self.assertEqual(CommandLog.objects.filter(retry_of__isnull=True, pipeline_root__isnull=True).count(), 1)
+
+        # Includes unlinking checkpoints from the deleted runs and deleting shards separately
+        self.assertConstantQueries(setup, action, budget=10)
+
+    def test_job_status(self):
+        from django.urls import reverse
+
+        client = self.admin_client()
+
+        def setup(size):
+            self.create_logs(size)
+            self.log = CommandLog.objects.create(command_name='command_1', status=CommandLog.STATUS_RUNNING,
+                                                 output='x' * size)
+
+        def action():
+            response = client.get(reverse('admin:job_status', args=[self.log.pk]))
+            self.assertEqual(response.status_code, 200)
+
+        self.assertConstantQueries(setup, action, budget=5)
+
+    def test_admin_changelists(self):
+        from django.urls import reverse
+        from .models import DurationBaseline
+
+        client = self.admin_client()
+
+        def setup(size):
+            self.create_schedules(size)
+            self.create_logs(size)
+            # Running logs show the time left, estimated from their baseline
+            CommandLog.objects.bulk_create([
+                CommandLog(command_name=f'command_{index % 50}', status=CommandLog.STATUS_RUNNING)
+                for index in range(size)])
+            DurationBaseline.objects.bulk_create([
+                DurationBaseline(command_name=f'command_{index}', runs=5, mean=3.0) for index in range(25)])
+            ConcurrencyLimit.objects.bulk_create([
+                ConcurrencyLimit(key=f'key_{index}', max_concurrent=2) for index in range(size)])
+            CommandLog.objects.filter(status=CommandLog.STATUS_RUNNING).update(concurrency_key='key_1')
+
+        for name in ('commandlog', 'commandschedule', 'concurrencylimit'):
+            url = reverse(f'admin:django_jobs_{name}_changelist')
+            with self.subTest(name):
+                self.assertConstantQueries(setup, lambda: self.assertEqual(client.get(url).status_code, 200),
+                                           budget=10)
+
+    def test_run_jobs_manually_action(self):
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+
+        def setup(size):
+            # Half of the commands have no schedule yet
+            self.create_schedules(size // 2)
+            CommandLog.objects.bulk_create([
+                CommandLog(command_name=f'command_{index}', app_name='app') for index in range(size)])
+
+        def action():
+            response = site._registry[CommandLog].run_jobs_manually(RequestFactory().post('/'), CommandLog.objects.all())
+            self.assertEqual(response.url.count('id='), CommandLog.objects.count())
+
+        self.assertConstantQueries(setup, action, budget=5)
@@ -0,0 +1,186 @@
+"""Trace spans for the phases of each run.
+
+The runner records a ``Trace`` for every run it claims:
+
+    run
+    ├── queue_wait      from when the run was due until the runner picked it up
+    ├── claim           concurrency checks and the status update to running
+    ├── spawn           starting the command's process
+    ├── process         until the process exited
+    │   ├── django_setup    interpreter start, Django setup and system checks
+    │   └── handle          the command's handle()
+    ├── output_flush    reading the rest of the output after the exit
+    ├── final_db_write  saving the final status, statistics and baselines
+    └── follow_up       retries, dependents or the parent of a shard
+
+``django_setup`` and ``handle`` are measured in the command's process by
+``install_child_hooks`` and sent over the progress channel, so they are only
+there for commands that load django_jobs.
+
+Finished traces are passed to an exporter in the OTLP/JSON format
+(``{"resourceSpans": [...]}``), which OpenTelemetry collectors and most trace
+viewers read. ``DJANGO_JOBS_TRACE_FILE`` appends one trace per line to a
+file; ``DJANGO_JOBS_TRACE_EXPORTER`` is the dotted path of any other callable
+taking that dict. Without either, runs are not traced.
+"""
+import json
+import os
+import secrets
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import progress
+
+_file_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name, start, end=None, parent=None, attributes=None):
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.start = start
+        self.end = end
+        self.parent = parent
+        self.attributes = attributes or {}
+
+    @property
+    def duration(self):
+        """Seconds, or None while the span is open"""
+        return (self.end - self.start) / 1e9 if self.end is not None else None
+
+
+class Trace:
+    """Spans of one run, with times in nanoseconds since the epoch"""
+
+    def __init__(self, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span('run', time.time_ns(), attributes=attributes)
+        self.spans = [self.root]
+
+    def add(self, name, start, end, parent=None, **attributes):
+        span = Span(name, start, end, parent or self.root, attributes)
+        self.spans.append(span)
+        # The root covers everything, including time before the trace was created
+        self.root.start = min(self.root.start, start)
+        return span
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        span = self.add(name, time.time_ns(), None, parent, **attributes)
+        try:
+            yield span
+        finally:
+            span.end = time.time_ns()
+
+    def get(self, name):
+        return next((span for span in self.spans if span.name == name), None)
+
+    def finish(self, **attributes):
+        self.root.end = time.time_ns()
+        self.root.attributes.update(attributes)
+
+    def to_otlp(self):
+        """The trace as an OTLP/JSON ``ExportTraceServiceRequest``"""
+        return {'resourceSpans': [{
+            'resource': {'attributes': _attributes({
+                'service.name': getattr(settings, 'DJANGO_JOBS_TRACE_SERVICE_NAME', 'django-jobs'),
+                'host.name': socket.gethostname(),
+                'process.pid': os.getpid(),
+            })},
+            'scopeSpans': [{
+                'scope': {'name': 'django_jobs'},
+                'spans': [self._span_json(span) for span in self.spans if span.end is not None],
+            }],
+        }]}
+
+    def _span_json(self, span):
+        data = {
+            'traceId': self.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span.start),
+            'endTimeUnixNano': str(span.end),
+            'attributes': _attributes(span.attributes),
+        }
+        if span.parent is not None:
+            data['parentSpanId'] = span.parent.span_id
+        return data
+
+
+def _attributes(values):
+    attributes = []
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        attributes.append({'key': key, 'value': typed})
+    return attributes
+
+
+def file_exporter(payload):
+    """Append the trace as one line of JSON to ``DJANGO_JOBS_TRACE_FILE``"""
+    line = json.dumps(payload, separators=(',', ':')) + '\n'
+    with _file_lock, open(settings.DJANGO_JOBS_TRACE_FILE, 'a') as trace_file:
+        trace_file.write(line)
+
+
+def get_exporter():
+    """Return the configured exporter, or None if tracing is off"""
+    exporter = getattr(settings, 'DJANGO_JOBS_TRACE_EXPORTER', None)
+    if exporter:
+        return import_string(exporter) if isinstance(exporter, str) else exporter
+    if getattr(settings, 'DJANGO_JOBS_TRACE_FILE', None):
+        return file_exporter
+    return None
+
+
+def export(trace):
+    """Hand a finished trace to the exporter; errors are printed, never raised"""
+    try:
+        # A bad DJANGO_JOBS_TRACE_EXPORTER path fails here
+        exporter = get_exporter()
+        if exporter is None:
+            return
+        exporter(trace.to_otlp())
+    except Exception as e:
+        print(f"Error exporting trace {trace.trace_id}: {str(e)}")
+
+
+def install_child_hooks():
+    """Time the command's ``handle()`` and send it to the runner (commands started by the runner only)"""
+    if not progress.connected():
+        return
+    from django.core.management.base import BaseCommand
+
+    execute = BaseCommand.execute
+
+    # ``self`` keeps the name of the original so it cannot clash with a command option
+    def traced_execute(self, *args, **options):
+        # Only the command the runner started is timed, not ones it calls
+        BaseCommand.execute = execute
+        handle = self.handle
+
+        def traced_handle(*handle_args, **handle_options):
+            start = time.time_ns()
+            try:
+                return handle(*handle_args, **handle_options)
+            finally:
+                progress.send({'span': 'handle', 'start': start, 'end': time.time_ns()})
+
+        self.handle = traced_handle
+        return execute(self, *args, **options)
+
+    BaseCommand.execute = traced_execute
@@ -0,0 +1,136 @@
+"""Event sources for ``JobTrigger``: model signals and watched directories.
+
+Model triggers connect ``post_save``/``post_delete`` receivers only to the
+models that active triggers watch, so saves of other models do no extra
+work. Each process loads the triggers when it first connects to the
+database and reloads them when a trigger changes in this process, or at
+the next request or watched save after ``DJANGO_JOBS_TRIGGER_CACHE_SECONDS``.
+If loading fails (e.g. before the migrations ran) the triggers loaded
+before are kept. Events are fired once the surrounding transaction commits,
+so the job sees the data that caused them.
+
+Directories are polled by ``run_jobs`` on every pass. HTTP pings are handled
+by ``django_jobs.views.trigger_job``.
+"""
+import fnmatch
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import JobTrigger
+
+_model_triggers = None
+_loaded_at = None
+# Labels of the models the receivers are connected to
+_connected = set()
+
+
+def get_model_triggers(reload=False):
+    """Return ``{model label: [triggers]}`` for the active model triggers
+
+    Loads them if they are older than ``DJANGO_JOBS_TRIGGER_CACHE_SECONDS``
+    or ``reload`` is set, and connects the receivers to the watched models.
+    """
+    global _model_triggers, _loaded_at
+    max_age = getattr(settings, 'DJANGO_JOBS_TRIGGER_CACHE_SECONDS', 30)
+    if not reload and _loaded_at is not None and time.monotonic() - _loaded_at <= max_age:
+        return _model_triggers or {}
+
+    # Set before loading, so a failing load is only retried after max_age
+    _loaded_at = time.monotonic()
+    try:
+        # A savepoint, so a failure does not break the caller's transaction
+        with transaction.atomic(using=router.db_for_read(JobTrigger)):
+            triggers = {}
+            for trigger in JobTrigger.objects.filter(
+                    kind=JobTrigger.KIND_MODEL, active=True, schedule__active=True).select_related('schedule'):
+                triggers.setdefault(trigger.model.lower(), []).append(trigger)
+    except DatabaseError as e:
+        # Failing before anything was loaded is expected until the table is migrated
+        if _model_triggers is not None:
+            print(f"Error reloading model triggers, keeping the previous ones: {str(e)}")
+        return _model_triggers or {}
+
+    _model_triggers = triggers
+    _connect_receivers(triggers)
+    return triggers
+
+
+def _connect_receivers(triggers):
+    for label in _connected - set(triggers):
+        model = apps.get_model(label)
+        post_save.disconnect(sender=model, dispatch_uid=f'django_jobs_trigger_save_{label}')
+        post_delete.disconnect(sender=model, dispatch_uid=f'django_jobs_trigger_delete_{label}')
+        _connected.discard(label)
+
+    for label in set(triggers) - _connected:
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError):
+            # The model's app was removed after the trigger was created
+            continue
+        if model._meta.app_label == 'django_jobs':
+            continue
+        post_save.connect(handle_model_event, sender=model, dispatch_uid=f'django_jobs_trigger_save_{label}')
+        post_delete.connect(handle_model_event, sender=model, dispatch_uid=f'django_jobs_trigger_delete_{label}')
+        _connected.add(label)
+
+
+def reload_triggers(**kwargs):
+    """Receiver for changes of ``JobTrigger`` in this process"""
+    get_model_triggers(reload=True)
+
+
+def load_triggers(sender=None, connection=None, **kwargs):
+    """``connection_created`` receiver loading the triggers once per process"""
+    if _loaded_at is None and connection.alias == router.db_for_read(JobTrigger):
+        get_model_triggers()
+
+
+def refresh_triggers(**kwargs):
+    """``request_started`` receiver keeping the triggers of long running processes current"""
+    get_model_triggers()
+
+
+def handle_model_event(sender, **kwargs):
+    """``post_save``/``post_delete`` receiver firing the triggers watching ``sender``"""
+    # Skip fixture loading
+    if kwargs.get('raw'):
+        return
+
+    for trigger in get_model_triggers().get(sender._meta.label_lower, ()):
+        transaction.on_commit(trigger.fire, using=kwargs.get('using'))
+
+
+def poll_file_triggers():
+    """Fire every file trigger whose directory has files it has not seen
+
+    A file counts as new if its name was not there on the last scan or its
+    modification time changed. Files copied with their original time (by
+    ``cp -p``, rsync or tar) are new too. Returns the list of fired triggers.
+    """
+    fired = []
+    for trigger in JobTrigger.objects.filter(
+            kind=JobTrigger.KIND_FILE, active=True, schedule__active=True).select_related('schedule'):
+        files = {}
+        try:
+            with os.scandir(trigger.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and fnmatch.fnmatch(entry.name, trigger.pattern or '*'):
+                        files[entry.name] = entry.stat().st_mtime
+        except OSError:
+            # The directory may not exist yet; it is checked again on the next pass
+            continue
+
+        if files == trigger.seen_files:
+            continue
+        # Removed files are forgotten, so a file that comes back fires again
+        if any(trigger.seen_files.get(name) != mtime for name, mtime in files.items()):
+            trigger.fire()
+            fired.append(trigger)
+        JobTrigger.objects.filter(pk=trigger.pk).update(seen_files=files)
+    return fired
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'django_jobs'
+
+urlpatterns = [
+    path('trigger/<int:trigger_id>/<str:token>/', views.trigger_job, name='trigger_job'),
+    path('metrics/', views.metrics_view, name='metrics'),
+]
@@ -1,4 +1,42 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-# Create your views here.
-# This file is intentionally left empty as this app primarily uses Django admin interface
\ No newline at end of file
+from . import metrics
+from .models import JobTrigger
+
+# Most of the app lives in the Django admin; this module only holds the endpoints
+# that external systems call.
+
+
+@csrf_exempt
+@require_POST
+def trigger_job(request, trigger_id, token):
+    """Fire an HTTP trigger; the pending run starts after the debounce window"""
+    trigger = get_object_or_404(JobTrigger, pk=trigger_id, kind=JobTrigger.KIND_HTTP, active=True)
+    # Compare in constant time so the token cannot be guessed byte by byte
+    if not trigger.token or not constant_time_compare(token, trigger.token):
+        raise Http404
+
+    log_id = trigger.fire()
+    if log_id is None:
+        raise Http404
+    return JsonResponse({'log_id': log_id}, status=202)
+
+
+def metrics_view(request):
+    """Prometheus metrics, served when ``DJANGO_JOBS_METRICS_ENABLED`` is set
+
+    If ``DJANGO_JOBS_METRICS_TOKEN`` is set, scrapers must send it as a bearer token.
+    """
+    if not getattr(settings, 'DJANGO_JOBS_METRICS_ENABLED', False):
+        raise Http404
+
+    token = getattr(settings, 'DJANGO_JOBS_METRICS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
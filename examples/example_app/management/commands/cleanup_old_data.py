@@ -25,23 +25,42 @@ class Command(BaseCommand):
             default=100,
             help='Number of records to process at once'
         )
+        parser.add_argument(
+            '--shard-index',
+            type=int,
+            default=0,
+            help='Index of the shard to process when running as several shards'
+        )
+        parser.add_argument(
+            '--shard-count',
+            type=int,
+            default=1,
+            help='Total number of shards the work is split into'
+        )
 
     def handle(self, *args, **options):
         days = options['days']
         dry_run = options['dry_run']
         batch_size = options['batch_size']
+        shard_index = options['shard_index']
+        shard_count = options['shard_count']
         
         cutoff_date = timezone.now() - timedelta(days=days)
         
         mode = "DRY RUN" if dry_run else "LIVE"
         self.stdout.write(f"\n[{mode}] Starting cleanup of data older than {days} days...")
         self.stdout.write(f"Cutoff date: {cutoff_date}")
-        self.stdout.write(f"Batch size: {batch_size}\n")
+        self.stdout.write(f"Batch size: {batch_size}")
+        self.stdout.write(f"Shard: {shard_index + 1}/{shard_count}\n")
         
         # Simulate finding and deleting old records
         total_deleted = 0
         
         for batch in range(3):  # Simulate 3 batches
+            # Each shard only handles its own share of the batches
+            if batch % shard_count != shard_index:
+                continue
+
             # Simulate random number of records in each batch
             records_in_batch = random.randint(50, 150)
             
@@ -2,6 +2,9 @@ import time
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
+from django_jobs.checkpoints import load_checkpoint, resuming, save_checkpoint
+from django_jobs.progress import report_progress
+
 
 class Command(BaseCommand):
     help = 'Generates a sample report with progress updates'
@@ -32,10 +35,17 @@ class Command(BaseCommand):
         
         self.stdout.write(f"Starting {report_type} report generation...")
         
+        # A retry of a failed run continues after the last finished step
+        start = load_checkpoint('step', 0)
+        if resuming() and start:
+            self.stdout.write(f"Resuming after step {start}/5")
+
         # Simulate some work with progress updates
-        for i in range(5):
+        for i in range(start, 5):
             time.sleep(1)
             self.stdout.write(f"Processing step {i+1}/5...")
+            report_progress(i + 1, 5, f"Step {i+1} of 5")
+            save_checkpoint('step', i + 1)
             
         self.stdout.write(self.style.SUCCESS(f"\n{report_type.capitalize()} Report Generated!"))
         self.stdout.write(f"Generated at: {timezone.now()}")
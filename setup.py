@@ -12,7 +12,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/berjan/django-jobs",
-    packages=find_packages(exclude=['examples', 'examples.*']),
+    packages=find_packages(exclude=['examples', 'examples.*', 'benchmarks', 'benchmarks.*']),
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",